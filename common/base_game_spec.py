@@ -2,6 +2,8 @@ import operator
 import random
 from functools import reduce
 
+from common.game_record import FLAG_CUSTOM_START, FLAG_ILLEGAL_MOVE
+
 
 class BaseGameSpec(object):
     def __init__(self):
@@ -37,6 +39,18 @@ class BaseGameSpec(object):
         """
         raise NotImplementedError()
 
+    def new_mutable_board(self, board_state=None):
+        """Optional, a board that moves can be made and taken back on in place, for search and simulation code that
+        does not want to allocate a new board for every move. See common.mutable_board.MutableBoard.
+
+        Args:
+            board_state: Optionally start from this position rather than a new board
+
+        Returns:
+            MutableBoard
+        """
+        raise NotImplementedError()
+
     def board_dimensions(self):
         """Returns the dimensions of the board for this game
 
@@ -77,8 +91,9 @@ class BaseGameSpec(object):
         if len(self.board_dimensions()) == 1:
             return move_index
 
-        board_x = self.board_dimensions()[0]
-        return int(move_index / board_x), move_index % board_x
+        # rows are laid out one after another, so the index steps through the columns of a row first
+        columns = self.board_dimensions()[1]
+        return move_index // columns, move_index % columns
 
     def tuple_move_to_flat(self, tuple_move):
         """Does the inverse operation to flat_move_to_tuple
@@ -92,9 +107,9 @@ class BaseGameSpec(object):
         if len(self.board_dimensions()) == 1:
             return tuple_move[0]
         else:
-            return tuple_move[0] * self.board_dimensions()[0] + tuple_move[1]
+            return tuple_move[0] * self.board_dimensions()[1] + tuple_move[1]
 
-    def play_game(self, plus_player_func, minus_player_func, log=False, board_state=None):
+    def play_game(self, plus_player_func, minus_player_func, log=False, board_state=None, recorder=None):
         """Run a single game of until the end, using the provided function args to determine the moves for each
         player.
 
@@ -105,12 +120,16 @@ class BaseGameSpec(object):
                 current board_state and side this player is playing, and returns the move the player wants to play.
             log (bool): If True progress is logged to console, defaults to False
             board_state: Optionally have the game start from this position, rather than from a new board
+            recorder ((moves [int], result (int), flags (int)) -> None): Optionally called when the game ends with the
+                flat index of every move made, e.g. GameRecordWriter.recorder to log the game, see common.game_record
 
         Returns:
             int: 1 if the plus_player_func won, -1 if the minus_player_func won and 0 for a draw
         """
+        flags = 0 if board_state is None else FLAG_CUSTOM_START
         board_state = board_state or self.new_board()
         player_turn = 1
+        moves = [] if recorder is not None else None
 
         while True:
             _available_moves = list(self.available_moves(board_state))
@@ -119,6 +138,8 @@ class BaseGameSpec(object):
                 # draw
                 if log:
                     print("no moves left, game ended a draw")
+                if recorder is not None:
+                    recorder(moves, 0, flags)
                 return 0.
             if player_turn > 0:
                 move = plus_player_func(board_state, 1)
@@ -130,9 +151,13 @@ class BaseGameSpec(object):
                 if log:
                     print("illegal move ", move)
                     print(-player_turn)
+                if recorder is not None:
+                    recorder(moves, -player_turn, flags | FLAG_ILLEGAL_MOVE)
                 return -player_turn
 
             board_state = self.apply_move(board_state, move, player_turn)
+            if moves is not None:
+                moves.append(self.tuple_move_to_flat(move))
             if log:
                 for i in board_state:
                     print(i)
@@ -143,6 +168,8 @@ class BaseGameSpec(object):
                 if log:
                     print("we have a winner, side: %s" % player_turn)
                     print(winner)
+                if recorder is not None:
+                    recorder(moves, winner, flags)
                 return winner
                 
             player_turn = -player_turn
@@ -0,0 +1,380 @@
+"""
+Compact binary log of played games, so they can be replayed, analysed or trained on again without playing them again.
+
+A game is stored as a byte holding it's result and flags, the id of it's pair of players, the number of moves and the
+flat index of every move made. Moves are packed into 4 bits each for games with at most 16 outputs, so a game of 3x3
+tic-tac-toe takes at most 3 bytes plus 5 bytes of moves. Board states are not stored, replay_game rebuilds them by
+playing the moves through the game spec.
+
+Files are only ever appended to. Player names are written once, the first time a player is used, and so is each pair
+of players that play a game together, so games refer to the pair by id. The reader streams a file a chunk at a time, so
+files far bigger than memory can be read.
+
+File layout, all little endian:
+    magic (7 bytes) b'TOEGAME'
+    version (uint8)
+    bits per move (uint8), 4 if the game has at most 16 outputs, 8 if it has at most 256 otherwise 16
+    then records, each starting with a byte that gives it's type:
+        RECORD_PLAYER: player id (uint16), name length (uint8), name (utf-8)
+        RECORD_PAIR: pair id (uint16), plus player id (uint16), minus player id (uint16)
+        a game, any value below RECORD_PLAYER: (result + 1) * 4 + flags, then the pair id and the number of moves,
+            each a varint of 1 byte if below 128 otherwise 2, then the moves. With 4 bit moves the first move is in the
+            high bits of the first byte and an odd number of moves leaves the low bits of the last byte empty.
+
+Examples:
+    with GameRecordWriter('games.log', game_spec) as writer:
+        game_spec.play_game(player_a, player_b, recorder=writer.recorder('a', 'b'))
+
+    for game in read_games('games.log'):
+        for board_state, side, move in replay_game(game_spec, game.moves):
+            ...
+"""
+import collections
+import os
+import struct
+
+MAGIC = b'TOEGAME'
+VERSION = 2
+
+RECORD_PLAYER = 0xfe
+RECORD_PAIR = 0xff
+
+# the last move of the game was illegal, so lost the game, it is not stored
+FLAG_ILLEGAL_MOVE = 1
+# the game started from a position passed to play_game rather than a new board, so it can't be replayed
+FLAG_CUSTOM_START = 2
+_MAX_FLAGS = 4
+
+_PREAMBLE = struct.Struct('<7sBB')
+_PLAYER_HEADER = struct.Struct('<BHB')
+_PAIR_RECORD = struct.Struct('<BHHH')
+_MAX_PLAYERS = 1 << 16
+_MAX_NAME_BYTES = 255
+# the most a 2 byte varint can hold, so the most pairs and the longest game
+_MAX_VARINT = 1 << 14
+
+# hex digit -> the value of the digit, a 4 bit move, and back
+_HEX_TO_MOVE = bytes.maketrans(b'0123456789abcdef', bytes(range(16)))
+_MOVE_TO_HEX = bytes.maketrans(bytes(range(16)), b'0123456789abcdef')
+
+GameRecord = collections.namedtuple('GameRecord', ['plus_player', 'minus_player', 'result', 'flags', 'moves'])
+GameRecord.__doc__ = """A game read from a log.
+
+    plus_player (str): Name of the player that went first
+    minus_player (str): Name of the player that went second
+    result (int): 1 if the plus player won, -1 if the minus player won and 0 for a draw
+    flags (int): FLAG_ILLEGAL_MOVE and FLAG_CUSTOM_START or'ed together
+    moves (sequence of int): The flat index of each move made, as bytes for games with at most 256 outputs
+"""
+
+
+def _bits_per_move(outputs):
+    return 4 if outputs <= 16 else 8 if outputs <= 256 else 16
+
+
+def _varint(value):
+    return bytes((value,)) if value < 0x80 else bytes((value & 0x7f | 0x80, value >> 7))
+
+
+def _pack_moves(moves, bits_per_move):
+    if bits_per_move == 4:
+        # the hex digit for each move, so bytes.fromhex packs 2 moves into each byte
+        digits = bytes(moves).translate(_MOVE_TO_HEX)
+        return bytes.fromhex((digits + b'0' if len(moves) % 2 else digits).decode('ascii'))
+    if bits_per_move == 8:
+        return bytes(moves)
+    return struct.pack('<%sH' % len(moves), *moves)
+
+
+class GameRecordWriter(object):
+    def __init__(self, file_path, game_spec):
+        """Appends games to the log at file_path, it is created if it does not exist. Appending to an existing log
+        reads through it first to find the players and pairs of players already in it.
+
+        Args:
+            file_path (str): path of the log
+            game_spec (BaseGameSpec): The game being recorded, it's number of outputs sets the size of a move
+        """
+        self.file_path = file_path
+        self.bits_per_move = _bits_per_move(game_spec.outputs())
+        self._max_move = (1 << self.bits_per_move) - 1
+        self._player_ids = {}
+        # (plus player id, minus player id) -> pair id
+        self._pair_ids = {}
+        self.games_written = 0
+
+        if os.path.isfile(file_path) and os.path.getsize(file_path) > 0:
+            reader = GameRecordReader(file_path)
+            if reader.bits_per_move != self.bits_per_move:
+                raise ValueError("%s has %s bit moves but this game needs %s bit moves"
+                                 % (file_path, reader.bits_per_move, self.bits_per_move))
+            for _ in reader:
+                pass
+            self._player_ids = {name: player_id for player_id, name in reader.players.items()}
+            self._pair_ids = {player_ids: pair_id for pair_id, player_ids in reader.pair_player_ids.items()}
+            self._file = open(file_path, mode='ab')
+            # drop any partly written record left by a writer that was killed, so new games follow the last whole one
+            self._file.truncate(reader.complete_size)
+        else:
+            self._file = open(file_path, mode='wb')
+            self._file.write(_PREAMBLE.pack(MAGIC, VERSION, self.bits_per_move))
+
+    def player_id(self, name):
+        """The id of the player name, the player is added to the log if they are new"""
+        player_id = self._player_ids.get(name)
+        if player_id is None:
+            encoded_name = name.encode('utf-8')
+            if len(encoded_name) > _MAX_NAME_BYTES:
+                raise ValueError("player name %r is longer than %s bytes" % (name, _MAX_NAME_BYTES))
+            if len(self._player_ids) >= _MAX_PLAYERS:
+                raise ValueError("%s already has the most players a log can hold" % self.file_path)
+            player_id = self._player_ids[name] = len(self._player_ids)
+            self._file.write(_PLAYER_HEADER.pack(RECORD_PLAYER, player_id, len(encoded_name)) + encoded_name)
+        return player_id
+
+    def pair_id(self, plus_player, minus_player):
+        """The id of the pair of players, the pair and the players are added to the log if they are new
+
+        Args:
+            plus_player (str): Name of the player that goes first
+            minus_player (str): Name of the player that goes second
+        """
+        player_ids = (self.player_id(plus_player), self.player_id(minus_player))
+        pair_id = self._pair_ids.get(player_ids)
+        if pair_id is None:
+            if len(self._pair_ids) >= _MAX_VARINT:
+                raise ValueError("%s already has the most pairs of players a log can hold" % self.file_path)
+            pair_id = self._pair_ids[player_ids] = len(self._pair_ids)
+            self._file.write(_PAIR_RECORD.pack(RECORD_PAIR, pair_id, *player_ids))
+        return pair_id
+
+    def write_game(self, moves, result, plus_player='plus', minus_player='minus', flags=0):
+        """Add a game to the log
+
+        Args:
+            moves ([int]): The flat index of each move made
+            result (int): 1 if the plus player won, -1 if the minus player won and 0 for a draw
+            plus_player (str): Name of the player that went first
+            minus_player (str): Name of the player that went second
+            flags (int): FLAG_ILLEGAL_MOVE and FLAG_CUSTOM_START or'ed together
+        """
+        self._write_game(self.pair_id(plus_player, minus_player), moves, result, flags)
+
+    def _write_game(self, pair_id, moves, result, flags):
+        if len(moves) >= _MAX_VARINT:
+            raise ValueError("a game of %s moves is too long for the log" % len(moves))
+        if not 0 <= flags < _MAX_FLAGS:
+            raise ValueError("unknown flags %s" % flags)
+        if moves and not 0 <= min(moves) <= max(moves) <= self._max_move:
+            raise ValueError("moves must be from 0 to %s" % self._max_move)
+        self._file.write(bytes(((int(result) + 1) * _MAX_FLAGS + flags,)) + _varint(pair_id) + _varint(len(moves)) +
+                         _pack_moves(moves, self.bits_per_move))
+        self.games_written += 1
+
+    def recorder(self, plus_player, minus_player):
+        """Get a recorder for BaseGameSpec.play_game that writes the game to this log
+
+        Args:
+            plus_player (str): Name of the player that goes first
+            minus_player (str): Name of the player that goes second
+
+        Returns:
+            (moves [int], result (int), flags (int)) -> None
+        """
+        pair_id = self.pair_id(plus_player, minus_player)
+
+        def record(moves, result, flags=0):
+            self._write_game(pair_id, moves, result, flags)
+
+        return record
+
+    def flush(self):
+        """Make sure every game written so far is in the file, e.g. so a reader can see them"""
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+class GameRecordReader(object):
+    def __init__(self, file_path, chunk_size=1 << 20):
+        """Streams the games in the log at file_path, iterate over it to get each game as a GameRecord.
+
+        Only chunk_size bytes of the file are read at a time. A partly written record at the end of the file, e.g. from
+        a writer that is still running or was killed, is left out. A writer appending to the log removes it.
+
+        Args:
+            file_path (str): path of the log
+            chunk_size (int): How many bytes to read from the file at a time
+        """
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+        # player id -> name and pair id -> (plus player id, minus player id), filled in as the log is read
+        self.players = {}
+        self.pair_player_ids = {}
+        # once the whole log has been read, the size of the file up to the end of the last complete record
+        self.complete_size = None
+        with open(file_path, mode='rb') as f:
+            self.bits_per_move = self._read_preamble(f)
+
+    def _read_preamble(self, f):
+        preamble = f.read(_PREAMBLE.size)
+        if len(preamble) < _PREAMBLE.size:
+            raise ValueError("%s is not a game log" % self.file_path)
+        magic, version, bits_per_move = _PREAMBLE.unpack(preamble)
+        if magic != MAGIC:
+            raise ValueError("%s is not a game log" % self.file_path)
+        if version != VERSION:
+            raise ValueError("%s is game log version %s, only version %s is supported"
+                             % (self.file_path, version, VERSION))
+        if bits_per_move not in (4, 8, 16):
+            raise ValueError("%s has an unsupported move size of %s bits" % (self.file_path, bits_per_move))
+        return bits_per_move
+
+    def __iter__(self):
+        players = self.players
+        pair_player_ids = self.pair_player_ids
+        # pair id -> (plus player name, minus player name)
+        pairs = {}
+        bits_per_move = self.bits_per_move
+
+        with open(self.file_path, mode='rb') as f:
+            self._read_preamble(f)
+            data = b''
+            # where data starts in the file
+            data_offset = _PREAMBLE.size
+            position = 0
+            while True:
+                chunk = f.read(self.chunk_size)
+                if not chunk:
+                    break
+                # carry over the start of a record that was cut off by the end of the last chunk
+                data = data[position:] + chunk
+                data_offset += position
+                position = 0
+                end = len(data)
+                while position < end:
+                    record_type = data[position]
+                    if record_type < RECORD_PLAYER:
+                        # the smallest a game header can be, the varints are checked for a second byte below
+                        moves_start = position + 3
+                        if moves_start > end:
+                            break
+                        pair_id = data[position + 1]
+                        if pair_id & 0x80:
+                            if moves_start + 1 > end:
+                                break
+                            pair_id = pair_id & 0x7f | data[position + 2] << 7
+                            length = data[position + 3]
+                            moves_start += 1
+                        else:
+                            length = data[position + 2]
+                        if length & 0x80:
+                            if moves_start + 1 > end:
+                                break
+                            length = length & 0x7f | data[moves_start] << 7
+                            moves_start += 1
+                        moves_end = moves_start + ((length + 1) // 2 if bits_per_move == 4 else
+                                                   length * (bits_per_move // 8))
+                        if moves_end > end:
+                            break
+                        if bits_per_move == 4:
+                            moves = data[moves_start:moves_end].hex()[:length].encode('ascii').translate(_HEX_TO_MOVE)
+                        elif bits_per_move == 8:
+                            moves = data[moves_start:moves_end]
+                        else:
+                            moves = struct.unpack_from('<%sH' % length, data, moves_start)
+                        plus_player, minus_player = pairs[pair_id]
+                        yield GameRecord(plus_player, minus_player, (record_type >> 2) - 1, record_type & 3, moves)
+                        position = moves_end
+                    elif record_type == RECORD_PLAYER:
+                        name_start = position + _PLAYER_HEADER.size
+                        if name_start > end:
+                            break
+                        _, player_id, name_length = _PLAYER_HEADER.unpack_from(data, position)
+                        if name_start + name_length > end:
+                            break
+                        players[player_id] = data[name_start:name_start + name_length].decode('utf-8')
+                        position = name_start + name_length
+                    else:
+                        if position + _PAIR_RECORD.size > end:
+                            break
+                        _, pair_id, plus_id, minus_id = _PAIR_RECORD.unpack_from(data, position)
+                        pair_player_ids[pair_id] = (plus_id, minus_id)
+                        pairs[pair_id] = (players[plus_id], players[minus_id])
+                        position += _PAIR_RECORD.size
+        self.complete_size = data_offset + position
+
+
+def read_games(file_path, chunk_size=1 << 20):
+    """Stream every game in the log at file_path, see GameRecordReader
+
+    Args:
+        file_path (str): path of the log
+        chunk_size (int): How many bytes to read from the file at a time
+
+    Returns:
+        generator of GameRecord
+    """
+    return iter(GameRecordReader(file_path, chunk_size))
+
+
+def replay_game(game_spec, moves):
+    """Play the moves of a recorded game from a new board, to get back the position before each move
+
+    Args:
+        game_spec (BaseGameSpec): The game that was recorded
+        moves (sequence of int): The flat index of each move, e.g. GameRecord.moves
+
+    Returns:
+        generator of (board_state, side (int), move (int)): The board before each move, the side that made it and the
+            flat index of the move
+    """
+    board_state = game_spec.new_board()
+    side = 1
+    for move in moves:
+        yield board_state, side, move
+        board_state = game_spec.apply_move(board_state, game_spec.flat_move_to_tuple(move), side)
+        side = -side
+
+
+if __name__ == '__main__':
+    # check games of every game spec come back out of a log as they were played
+    import tempfile
+
+    from games.connect_four import ConnectFourGameSpec
+    from games.tic_tac_toe import TicTacToeGameSpec
+    from games.tic_tac_toe_bitboard import TicTacToeBitboardGameSpec
+    from games.tic_tac_toe_for_train import TicTacToeGameSpec as TrainTicTacToeGameSpec
+    from games.tic_tac_toe_x import TicTacToeXGameSpec
+
+    for game_spec in (TicTacToeGameSpec(), TrainTicTacToeGameSpec(), TicTacToeBitboardGameSpec(),
+                      TicTacToeXGameSpec(15, 5), ConnectFourGameSpec()):
+        random_player = game_spec.get_random_player_func()
+        played = []
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'games.log')
+            with GameRecordWriter(file_path, game_spec) as writer:
+                record = writer.recorder('random', 'random')
+
+                def recorder(moves, result, flags):
+                    played.append((list(moves), result))
+                    record(moves, result, flags)
+
+                for _ in range(100):
+                    game_spec.play_game(random_player, random_player, recorder=recorder)
+            games = list(read_games(file_path))
+
+        assert [(list(game.moves), game.result) for game in games] == played
+        for game in games:
+            for board_state, side, move in replay_game(game_spec, game.moves):
+                pass
+            board_state = game_spec.apply_move(board_state, game_spec.flat_move_to_tuple(move), side)
+            assert game_spec.has_winner(board_state) == game.result
+        print("%s: %s games round trip" % (type(game_spec).__module__, len(games)))
@@ -0,0 +1,316 @@
+"""
+Opt in timers and counters for training runs, to find out where the time goes.
+
+The training loops and network helpers take an optional instrumentation argument. When it is None, the default,
+NULL_INSTRUMENTATION is used in it's place, which does nothing, so each measured point has a single code path and the
+only cost is a call to an empty method. When it is set, every measured stage (playing a game, the
+opponent's move, the network's session.run, sampling the move, building the mini batch, the train step) is timed, and
+every emit_every_seconds a summary is written with the count, total, mean and 50th/90th/99th percentile time of each
+stage and the rate per second of each counter (games, moves, updates).
+
+Summaries are written as JSON lines, or as CSV rows of time, episode, name, value if the output path ends in .csv.
+A window of episodes can also be profiled with cProfile, and the train steps in that window traced with the TensorFlow
+timeline, which can be viewed in chrome://tracing.
+
+Examples:
+    instrumentation = Instrumentation('training_stats.jsonl', profile_start_episode=1000, profile_episodes=100)
+    train_policy_gradients(game_spec, create_network_func, 'current_network.p', instrumentation=instrumentation)
+    instrumentation.close()
+"""
+import cProfile
+import csv
+import json
+import random
+import time
+
+import numpy as np
+
+PERCENTILES = (50, 90, 99)
+
+
+class _Timer(object):
+    __slots__ = ('instrumentation', 'name', 'start')
+
+    def __init__(self, instrumentation, name):
+        self.instrumentation = instrumentation
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        self.instrumentation.add_time(self.name, time.perf_counter() - self.start)
+
+
+class _NullTimer(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class NullInstrumentation(object):
+    """Has the same methods as Instrumentation but measures nothing, for when instrumentation is turned off"""
+    episode = 0
+    last_summary = None
+
+    def timer(self, name):
+        return _NULL_TIMER
+
+    def add_time(self, name, seconds):
+        pass
+
+    def count(self, name, amount=1):
+        pass
+
+    def wrap(self, name, func):
+        return func
+
+    def profiling(self):
+        return False
+
+    def run_session(self, session, fetches, feed_dict, name, trace=False):
+        return session.run(fetches, feed_dict=feed_dict)
+
+    def episode_finished(self, episodes=1):
+        pass
+
+    def summary(self):
+        return None
+
+    def emit(self):
+        return None
+
+    def close(self):
+        pass
+
+
+NULL_INSTRUMENTATION = NullInstrumentation()
+
+
+class Instrumentation(object):
+    def __init__(self, output_path=None, emit_every_seconds=10., profile_start_episode=None, profile_episodes=100,
+                 profile_path='profile.prof', tf_timeline_path=None, max_samples=100000, log=False):
+        """
+        Args:
+            output_path (str): Where to write the summaries, as CSV if it ends in .csv otherwise as JSON lines. If None
+                summaries are only kept in last_summary
+            emit_every_seconds (float): How often to write a summary, checked at the end of each episode
+            profile_start_episode (int): If set, run cProfile from this episode for profile_episodes episodes
+            profile_episodes (int): How many episodes to profile
+            profile_path (str): Where to save the cProfile stats, read them with pstats or snakeviz
+            tf_timeline_path (str): If set, train steps in the profiling window are traced and the last one is saved to
+                this path as a chrome trace when the window ends
+            max_samples (int): Most times kept per stage between summaries for the percentiles, once there are more
+                a random sample of this many is kept
+            log (bool): If True also print each summary
+        """
+        self.output_path = output_path
+        self.emit_every_seconds = emit_every_seconds
+        self.profile_start_episode = profile_start_episode
+        self.profile_episodes = profile_episodes
+        self.profile_path = profile_path
+        self.tf_timeline_path = tf_timeline_path
+        self.max_samples = max_samples
+        self.log = log
+
+        self.episode = 0
+        self.last_summary = None
+        self._start_time = time.perf_counter()
+        self._last_emit_time = self._start_time
+        self._counters = {}
+        self._times = {}
+        self._time_totals = {}
+        self._time_counts = {}
+        self._profiler = None
+        # step stats of the last traced session.run in the profiling window
+        self._step_stats = None
+        self._output_file = None
+        self._csv_writer = None
+
+        if output_path is not None:
+            self._output_file = open(output_path, mode='w', newline='')
+            if output_path.endswith('.csv'):
+                self._csv_writer = csv.writer(self._output_file)
+                self._csv_writer.writerow(('time', 'episode', 'name', 'value'))
+
+    def timer(self, name):
+        """Context manager that adds the time spent inside it to the stage name
+
+        Examples:
+            with instrumentation.timer('train_step'):
+                session.run(train_step, feed_dict=feed_dict)
+        """
+        return _Timer(self, name)
+
+    def add_time(self, name, seconds):
+        """Add a time to the stage name"""
+        times = self._times.get(name)
+        if times is None:
+            times = self._times[name] = []
+            self._time_totals[name] = 0.
+            self._time_counts[name] = 0
+        self._time_totals[name] += seconds
+        self._time_counts[name] += 1
+        if len(times) < self.max_samples:
+            times.append(seconds)
+        else:
+            # reservoir sampling, so the percentiles are from a uniform sample of all the times
+            index = random.randrange(self._time_counts[name])
+            if index < self.max_samples:
+                times[index] = seconds
+
+    def count(self, name, amount=1):
+        """Add to the counter name"""
+        self._counters[name] = self._counters.get(name, 0) + amount
+
+    def wrap(self, name, func):
+        """Get a version of func that adds the time of each call to the stage name, e.g. for a player func"""
+        def timed_func(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add_time(name, time.perf_counter() - start)
+
+        return timed_func
+
+    def profiling(self):
+        """True while in the profiling window"""
+        return self._profiler is not None
+
+    def run_session(self, session, fetches, feed_dict, name, trace=False):
+        """session.run timed as the stage name. If trace is True and tf_timeline_path is set, in the profiling window
+        the run is also traced, and the last traced run is saved when the window ends. Only pass trace for runs worth
+        the cost of a full trace, e.g. the train step rather than the network's move in every game.
+
+        Returns:
+            The result of session.run
+        """
+        start = time.perf_counter()
+        if trace and self._profiler is not None and self.tf_timeline_path is not None:
+            import tensorflow as tf
+
+            run_metadata = tf.RunMetadata()
+            result = session.run(fetches, feed_dict=feed_dict,
+                                 options=tf.RunOptions(trace_level=tf.RunOptions.FULL_TRACE),
+                                 run_metadata=run_metadata)
+            self._step_stats = run_metadata.step_stats
+        else:
+            result = session.run(fetches, feed_dict=feed_dict)
+        self.add_time(name, time.perf_counter() - start)
+        return result
+
+    def episode_finished(self, episodes=1):
+        """Call at the end of each episode, or batch of episodes, to count them, start and stop profiling and write
+        summaries when they are due"""
+        self.episode += episodes
+        self.count('games', episodes)
+
+        if self.profile_start_episode is not None:
+            if self._profiler is None and self.profile_start_episode <= self.episode < \
+                    self.profile_start_episode + self.profile_episodes:
+                self._profiler = cProfile.Profile()
+                self._profiler.enable()
+            elif self._profiler is not None and self.episode >= self.profile_start_episode + self.profile_episodes:
+                self._stop_profiling()
+
+        if time.perf_counter() - self._last_emit_time >= self.emit_every_seconds:
+            self.emit()
+
+    def _stop_profiling(self):
+        self._profiler.disable()
+        self._profiler.dump_stats(self.profile_path)
+        self._profiler = None
+        # only profile once
+        self.profile_start_episode = None
+        if self.log:
+            print("saved profile of %s episodes to %s" % (self.profile_episodes, self.profile_path))
+
+        if self._step_stats is not None:
+            from tensorflow.python.client import timeline
+
+            with open(self.tf_timeline_path, mode='w') as f:
+                f.write(timeline.Timeline(self._step_stats).generate_chrome_trace_format())
+            self._step_stats = None
+            if self.log:
+                print("saved timeline of a train step to %s" % self.tf_timeline_path)
+
+    def summary(self):
+        """The stats since the last summary
+
+        Returns:
+            dict: with the episode, seconds since the last summary, the count and rate per second of each counter and
+                the count, total, mean and percentiles in seconds of each stage
+        """
+        now = time.perf_counter()
+        seconds = now - self._last_emit_time
+        timers = {}
+        for name, times in self._times.items():
+            if not self._time_counts[name]:
+                continue
+            stats = {'count': self._time_counts[name],
+                     'total': self._time_totals[name],
+                     'mean': self._time_totals[name] / self._time_counts[name]}
+            for percentile, value in zip(PERCENTILES, np.percentile(times, PERCENTILES)):
+                stats['p%s' % percentile] = float(value)
+            timers[name] = stats
+
+        return {
+            'time': time.time(),
+            'elapsed': now - self._start_time,
+            'episode': self.episode,
+            'seconds': seconds,
+            'counters': dict(self._counters),
+            'rates': {'%s_per_sec' % name: count / seconds if seconds > 0 else 0.
+                      for name, count in self._counters.items()},
+            'timers': timers,
+        }
+
+    def emit(self):
+        """Write a summary of the stats since the last one and reset them"""
+        summary = self.summary()
+        self.last_summary = summary
+
+        if self._csv_writer is not None:
+            rows = [('seconds', summary['seconds'])]
+            rows += sorted(summary['counters'].items()) + sorted(summary['rates'].items())
+            for name, stats in sorted(summary['timers'].items()):
+                rows += [('%s_%s' % (name, stat), value) for stat, value in sorted(stats.items())]
+            for name, value in rows:
+                self._csv_writer.writerow((summary['time'], summary['episode'], name, value))
+            self._output_file.flush()
+        elif self._output_file is not None:
+            self._output_file.write(json.dumps(summary, sort_keys=True) + '\n')
+            self._output_file.flush()
+
+        if self.log:
+            print("episode %s: %s" % (summary['episode'], ', '.join(
+                ['%s %.1f' % item for item in sorted(summary['rates'].items())] +
+                ['%s p50 %.3fms p99 %.3fms' % (name, stats['p50'] * 1e3, stats['p99'] * 1e3)
+                 for name, stats in sorted(summary['timers'].items())])))
+
+        self._last_emit_time = time.perf_counter()
+        self._counters.clear()
+        for name in self._times:
+            del self._times[name][:]
+            self._time_totals[name] = 0.
+            self._time_counts[name] = 0
+        return summary
+
+    def close(self):
+        """Stop profiling if it is still running, write a final summary and close the output file"""
+        if self._profiler is not None:
+            self._stop_profiling()
+        if self._counters or any(self._time_counts.values()):
+            self.emit()
+        if self._output_file is not None:
+            self._output_file.close()
+            self._output_file = None
@@ -0,0 +1,435 @@
+"""
+Local move server, so many frontends and evaluation scripts on one machine can share a single loaded network rather
+than each loading their own.
+
+The server listens on a TCP port or a Unix socket and speaks JSON lines, one request per line and one response per
+line, tagged with the id from the request so a client can have many requests in flight on one connection:
+    {"id": 1, "board": [[0, 0, 0], [0, 1, 0], [0, 0, 0]], "side": -1, "engine": "network"}
+    {"id": 1, "move": [0, 2]}
+    {"id": 2, "command": "stats"}
+    {"id": 2, "stats": {...}}
+A request that can't be answered gets {"id": ..., "error": "..."} instead.
+
+Requests for a network engine that arrive within max_delay_ms of each other are put together, up to max_batch_size, and
+answered with a single forward pass of the network. While one batch is running more requests queue up, so under load
+the batches get bigger rather than the queue getting longer. Search engines (minmax, deepening, mcts, ...) are run one
+request at a time on a thread pool, with the budget from the request as their depth, milliseconds or simulations.
+
+Counters for requests, batches and latency are kept in a common.instrumentation.Instrumentation and can be fetched with
+the stats command, or written to a file every few seconds.
+
+Examples:
+    python -m common.move_server --network current_network.p --port 5599
+
+    with MoveClient(port=5599) as client:
+        move = client.move(board_state, side)
+        game_spec.play_game(client.player_func('network'), client.player_func('minmax', 4))
+"""
+import argparse
+import asyncio
+import json
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from common.instrumentation import Instrumentation
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 5599
+DEFAULT_NETWORK_HIDDEN_NODES = (100, 100, 100)
+
+# the default budget of each search engine, and what it means
+SEARCH_ENGINES = {
+    'random': None,
+    'simple': None,
+    'perfect': None,
+    'minmax': 3,  # depth
+    'deepening': 100,  # milliseconds per move
+    'mcts': 1000,  # simulations per move
+}
+
+
+def network_batch_move_func(game_spec, network, deterministic=False):
+    """Get a function choosing legal moves for a batch of boards with one forward pass of a PolicyNetwork.
+
+    Args:
+        game_spec (BaseGameSpec): The game being played
+        network (common.policy_network.PolicyNetwork): The network
+        deterministic (bool): If True play the highest scoring legal move, otherwise sample from the legal moves
+
+    Returns:
+        (board_states, sides) -> list of moves
+    """
+    def batch_move_func(board_states, sides):
+        np_board_states = np.array(board_states, dtype=np.float32).reshape(len(board_states), -1)
+        probabilities = network.probabilities(np_board_states * np.reshape(sides, (-1, 1))).astype(np.float64)
+
+        if game_spec.outputs() == game_spec.board_squares():
+            masks = np_board_states == 0
+        else:
+            masks = np.zeros(probabilities.shape, dtype=bool)
+            for i, board_state in enumerate(board_states):
+                masks[i, [game_spec.tuple_move_to_flat(move) for move in game_spec.available_moves(board_state)]] = True
+
+        if deterministic:
+            flat_moves = np.where(masks, probabilities, -np.inf).argmax(axis=1)
+        else:
+            probabilities *= masks
+            # boards where the network gives no probability to any legal move choose uniformly from the legal moves
+            no_valid_probability = probabilities.sum(axis=1) == 0.
+            probabilities[no_valid_probability] = masks[no_valid_probability]
+            cumulative = np.cumsum(probabilities, axis=1)
+            thresholds = np.random.random(len(cumulative)) * cumulative[:, -1]
+            flat_moves = np.minimum((cumulative <= thresholds[:, None]).sum(axis=1), cumulative.shape[1] - 1)
+        return [game_spec.flat_move_to_tuple(move) for move in flat_moves]
+
+    return batch_move_func
+
+
+class _MoveBatcher(object):
+    def __init__(self, name, batch_move_func, max_batch_size, max_delay_ms, instrumentation):
+        """Collects requests for one batched engine and runs them together on it's own thread"""
+        self.name = name
+        self.batch_move_func = batch_move_func
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay_ms / 1000.
+        self.instrumentation = instrumentation
+        self._pending = []
+        self._timer = None
+        self._running = False
+        # one thread, so only one batch runs at a time and the rest wait to be part of the next one
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def move(self, board_state, side):
+        """Queue a board, returns an asyncio future for it's move"""
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        self._pending.append((board_state, side, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None and not self._running:
+            self._timer = loop.call_later(self.max_delay, self._flush)
+        return future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._running or not self._pending:
+            # anything pending goes in the next batch, as soon as the running one finishes
+            return
+
+        batch = self._pending[:self.max_batch_size]
+        del self._pending[:self.max_batch_size]
+        self._running = True
+        loop = asyncio.get_event_loop()
+        future = loop.run_in_executor(self._executor, self._run_batch, [board_state for board_state, _, _ in batch],
+                                      [side for _, side, _ in batch])
+        future.add_done_callback(lambda result: self._deliver(batch, result))
+
+    def _run_batch(self, board_states, sides):
+        start = time.perf_counter()
+        moves = self.batch_move_func(board_states, sides)
+        # the instrumentation is only touched from the event loop, so the time is added by _deliver
+        return moves, time.perf_counter() - start
+
+    def _deliver(self, batch, result):
+        self._running = False
+        self.instrumentation.count('batches')
+        self.instrumentation.count('batched_requests', len(batch))
+        error = result.exception()
+        if error is None:
+            moves, seconds = result.result()
+            self.instrumentation.add_time('forward_pass', seconds)
+        for i, (_, _, future) in enumerate(batch):
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(moves[i])
+        if self._pending:
+            self._flush()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class MoveServer(object):
+    def __init__(self, game_spec, network=None, batch_engines=None, max_batch_size=64, max_delay_ms=2.,
+                 search_workers=2, instrumentation=None):
+        """
+        Args:
+            game_spec (BaseGameSpec): The game the server chooses moves for
+            network (common.policy_network.PolicyNetwork): If set, served as the network and deterministic_network
+                engines
+            batch_engines (dict of str -> (board_states, sides) -> moves): Other engines that choose moves for a batch
+                of boards at once, e.g. {'tf_network': policy_engine.moves} for a common.policy_engine.PolicyEngine
+            max_batch_size (int): The most requests answered by one batch
+            max_delay_ms (float): How long the first request of a batch waits for others to join it
+            search_workers (int): Threads for running the search engines
+            instrumentation (Instrumentation): Where to keep the counters, if None a new one is made
+        """
+        self.game_spec = game_spec
+        self.instrumentation = instrumentation or Instrumentation()
+        batch_engines = dict(batch_engines or {})
+        if network is not None:
+            batch_engines['network'] = network_batch_move_func(game_spec, network)
+            batch_engines['deterministic_network'] = network_batch_move_func(game_spec, network, deterministic=True)
+        self._batchers = {name: _MoveBatcher(name, func, max_batch_size, max_delay_ms, self.instrumentation)
+                          for name, func in batch_engines.items()}
+        self._search_executor = ThreadPoolExecutor(max_workers=search_workers)
+        # player funcs for the search engines, by (engine, budget)
+        self._search_players = {}
+        self._server = None
+
+    def engines(self):
+        """The names of the engines that can be asked for moves"""
+        return sorted(self._batchers) + sorted(SEARCH_ENGINES)
+
+    def _search_player(self, engine, budget):
+        from techniques import tournament
+
+        if budget is None:
+            budget = SEARCH_ENGINES[engine]
+        key = (engine, budget)
+        if key not in self._search_players:
+            if engine == 'mcts':
+                # a tree search player keeps state between moves, so each request gets a new one
+                return tournament.mcts_player_factory(int(budget))(self.game_spec)
+            factories = {
+                'random': lambda: tournament.random_player_factory,
+                'simple': lambda: tournament.simple_ai_player_factory,
+                'perfect': lambda: tournament.perfect_player_factory,
+                'minmax': lambda: tournament.min_max_player_factory(int(budget)),
+                'deepening': lambda: tournament.iterative_deepening_player_factory(float(budget)),
+            }
+            self._search_players[key] = factories[engine]()(self.game_spec)
+        return self._search_players[key]
+
+    async def move(self, board_state, side, engine='network', budget=None):
+        """Choose a move
+
+        Args:
+            board_state: The board, as a tuple of rows
+            side (int): The side to move, 1 or -1
+            engine (str): One of engines()
+            budget: For search engines their depth, milliseconds or simulations, see SEARCH_ENGINES
+
+        Returns:
+            The move in board coordinates, always a legal move
+        """
+        if side not in (1, -1):
+            raise ValueError("side must be 1 or -1, got %r" % (side,))
+        available_moves = list(self.game_spec.available_moves(board_state))
+        if not available_moves or self.game_spec.has_winner(board_state) != 0:
+            raise ValueError("the game is already over")
+
+        start = time.perf_counter()
+        self.instrumentation.count('requests')
+        if engine in self._batchers:
+            move = await self._batchers[engine].move(board_state, side)
+        elif engine in SEARCH_ENGINES:
+            player_func = self._search_player(engine, budget)
+            move = await asyncio.get_event_loop().run_in_executor(self._search_executor, player_func, board_state,
+                                                                  side)
+        else:
+            raise ValueError("unknown engine %r, expected one of %s" % (engine, ', '.join(self.engines())))
+        latency = time.perf_counter() - start
+        self.instrumentation.add_time('latency', latency)
+        self.instrumentation.add_time('latency_' + engine, latency)
+        return move
+
+    def stats(self):
+        """The counters since the last time they were written out, plus the average batch size"""
+        summary = self.instrumentation.summary()
+        counters = summary['counters']
+        summary['mean_batch_size'] = counters.get('batched_requests', 0) / float(counters.get('batches', 0) or 1)
+        return summary
+
+    async def _handle_request(self, line, writer):
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            if request.get('command') == 'stats':
+                response = {'id': request_id, 'stats': self.stats()}
+            elif request.get('command') == 'engines':
+                response = {'id': request_id, 'engines': self.engines()}
+            else:
+                board_state = tuple(tuple(row) for row in request['board'])
+                move = await self.move(board_state, request['side'], request.get('engine', 'network'),
+                                       request.get('budget'))
+                response = {'id': request_id,
+                            'move': [int(i) for i in move] if isinstance(move, tuple) else int(move)}
+            line = json.dumps(response)
+        except Exception as ex:
+            self.instrumentation.count('errors')
+            line = json.dumps({'id': request_id, 'error': '%s: %s' % (type(ex).__name__, ex)})
+        writer.write((line + '\n').encode())
+
+    async def _handle_connection(self, reader, writer):
+        self.instrumentation.count('connections')
+        requests = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                # each request runs on it's own, so a slow search doesn't hold up the other requests on the connection
+                request = asyncio.ensure_future(self._handle_request(line, writer))
+                requests.add(request)
+                request.add_done_callback(requests.discard)
+                await writer.drain()
+            if requests:
+                await asyncio.wait(requests)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None):
+        """Start listening, on unix_path if it is set otherwise on host and port"""
+        if unix_path is not None:
+            self._server = await asyncio.start_unix_server(self._handle_connection, path=unix_path)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server
+
+    async def serve_forever(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None, stats_every_seconds=None):
+        """Start listening and serve until cancelled, writing the stats every stats_every_seconds if set"""
+        await self.start(host, port, unix_path)
+        try:
+            while True:
+                await asyncio.sleep(stats_every_seconds or 3600.)
+                if stats_every_seconds:
+                    self.instrumentation.emit()
+        finally:
+            self.close()
+
+    def close(self):
+        """Stop listening and release the threads"""
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        for batcher in self._batchers.values():
+            batcher.close()
+        self._search_executor.shutdown(wait=False)
+
+
+class MoveClient(object):
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None, timeout=None):
+        """Blocking client for a MoveServer, one request at a time. For many requests at once use one client per
+        thread, the server batches them together.
+
+        Args:
+            host (str): The server's host, if not using unix_path
+            port (int): The server's port, if not using unix_path
+            unix_path (str): Path of the server's Unix socket
+            timeout (float): Seconds to wait for a response before raising socket.timeout, None to wait forever
+        """
+        if unix_path is not None:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.settimeout(timeout)
+            self._socket.connect(unix_path)
+        else:
+            self._socket = socket.create_connection((host, port), timeout=timeout)
+            self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._file = self._socket.makefile('rwb')
+        self._next_id = 0
+
+    def _request(self, request):
+        self._next_id += 1
+        request['id'] = self._next_id
+        self._file.write((json.dumps(request) + '\n').encode())
+        self._file.flush()
+        while True:
+            line = self._file.readline()
+            if not line:
+                raise ConnectionError("move server closed the connection")
+            response = json.loads(line)
+            if response.get('id') == self._next_id:
+                break
+        if 'error' in response:
+            raise ValueError(response['error'])
+        return response
+
+    def move(self, board_state, side, engine='network', budget=None):
+        """Ask the server for a move, see MoveServer.move
+
+        Returns:
+            The move in board coordinates
+        """
+        request = {'board': [[int(square) for square in row] for row in board_state], 'side': int(side),
+                   'engine': engine}
+        if budget is not None:
+            request['budget'] = budget
+        move = self._request(request)['move']
+        return tuple(move) if isinstance(move, list) else move
+
+    def stats(self):
+        """The server's counters, see MoveServer.stats"""
+        return self._request({'command': 'stats'})['stats']
+
+    def engines(self):
+        """The names of the engines the server has"""
+        return self._request({'command': 'engines'})['engines']
+
+    def player_func(self, engine='network', budget=None):
+        """A player func for play_game that gets it's moves from the server"""
+        return lambda board_state, side: self.move(board_state, side, engine, budget)
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+def main(argv=None):
+    import os
+
+    from common.policy_network import PolicyNetwork
+    from games.tic_tac_toe_for_train import TicTacToeGameSpec
+
+    parser = argparse.ArgumentParser(description="Serve moves from one network to many local clients")
+    parser.add_argument('--network', default='current_network.p', help="saved network to serve, a random network "
+                                                                       "is used if the file does not exist")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--unix', help="listen on this Unix socket path rather than TCP")
+    parser.add_argument('--max-batch-size', type=int, default=64, help="most requests in one forward pass")
+    parser.add_argument('--max-delay-ms', type=float, default=2., help="how long a request waits for a batch")
+    parser.add_argument('--stats', help="write the counters to this file, JSON lines or .csv")
+    parser.add_argument('--stats-every', type=float, default=10., help="seconds between writing the counters")
+    args = parser.parse_args(argv)
+
+    game_spec = TicTacToeGameSpec()
+    if os.path.isfile(args.network):
+        print("loading pre-existing network")
+        network = PolicyNetwork.load(args.network)
+    else:
+        network = PolicyNetwork.create(game_spec.board_squares(), DEFAULT_NETWORK_HIDDEN_NODES)
+
+    instrumentation = Instrumentation(args.stats, emit_every_seconds=args.stats_every, log=args.stats is not None)
+    server = MoveServer(game_spec, network, max_batch_size=args.max_batch_size, max_delay_ms=args.max_delay_ms,
+                        instrumentation=instrumentation)
+    print("serving %s on %s" % (', '.join(server.engines()), args.unix or '%s:%s' % (args.host, args.port)))
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port, args.unix,
+                                         args.stats_every if args.stats else None))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        instrumentation.close()
+
+
+if __name__ == '__main__':
+    main()
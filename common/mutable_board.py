@@ -0,0 +1,202 @@
+"""
+Mutable board for k in a row games (tic-tac-toe, gomoku), for search and simulation code that makes and unmakes moves
+millions of times and does not want to allocate a new board for each one.
+
+Moves are made with push and taken back with pop, in last in first out order. Everything else about the position is kept
+up to date as moves are made rather than worked out from the board:
+    available, the flat indexes of the empty squares. A move is removed by swapping the last entry into it's place, and
+        pop puts it back exactly where it was, so the list is in the same order after a push and pop.
+    winner, found by only checking the lines through the square just played.
+    hash, a Zobrist hash of the position, updated with one xor per move.
+
+Boards can be indexed and iterated like the tuple of rows of ints used everywhere else, board[x][y] gives 1, -1 or 0,
+so evaluation functions and networks can be given a MutableBoard directly. Get one from a game spec with
+game_spec.new_mutable_board(board_state).
+"""
+import random
+
+_DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+# per board size, random 64 bit numbers for each square for each side, always made from the same seed so a position has
+# the same hash in every process
+_zobrist_keys = {}
+
+# per (rows, columns, winning_length), for each square the squares that need checking for a win in each direction
+_line_squares = {}
+
+
+def _get_zobrist_keys(board_squares):
+    if board_squares not in _zobrist_keys:
+        rng = random.Random(board_squares)
+        _zobrist_keys[board_squares] = (tuple(rng.getrandbits(64) for _ in range(board_squares)),
+                                        tuple(rng.getrandbits(64) for _ in range(board_squares)))
+    return _zobrist_keys[board_squares]
+
+
+def _get_line_squares(rows, columns, winning_length):
+    key = (rows, columns, winning_length)
+    if key not in _line_squares:
+        all_squares = []
+        for x in range(rows):
+            for y in range(columns):
+                directions = []
+                for dx, dy in _DIRECTIONS:
+                    forward_and_backward = []
+                    for sign in (1, -1):
+                        squares = []
+                        for i in range(1, winning_length):
+                            line_x, line_y = x + dx * sign * i, y + dy * sign * i
+                            if not (0 <= line_x < rows and 0 <= line_y < columns):
+                                break
+                            squares.append(line_x * columns + line_y)
+                        forward_and_backward.append(tuple(squares))
+                    directions.append(tuple(forward_and_backward))
+                all_squares.append(tuple(directions))
+        _line_squares[key] = tuple(all_squares)
+    return _line_squares[key]
+
+
+class MutableBoard(object):
+    def __init__(self, board_dimensions, winning_length, board_state=None):
+        """
+        Args:
+            board_dimensions ((int, int)): The number of rows and columns of the board
+            winning_length (int): How many in a row is needed to win
+            board_state: Optionally start from this position, a tuple of rows of ints or anything indexed the same way
+        """
+        rows, columns = board_dimensions
+        board_squares = rows * columns
+        self.rows = rows
+        self.columns = columns
+        self.winning_length = winning_length
+        self.squares = [0] * board_squares
+        self.available = list(range(board_squares))
+        self.hash = 0
+        self.winner = 0
+
+        self._positions = list(range(board_squares))
+        self._plus_keys, self._minus_keys = _get_zobrist_keys(board_squares)
+        self._line_squares = _get_line_squares(rows, columns, winning_length)
+        self._moves = tuple((i // columns, i % columns) for i in range(board_squares))
+        # what each push changed, so pop can undo it
+        self._pushed_squares = []
+        self._pushed_positions = []
+        self._pushed_winners = []
+
+        if board_state is not None:
+            for x in range(rows):
+                row = board_state[x]
+                for y in range(columns):
+                    if row[y] != 0:
+                        self.push_square(x * columns + y, row[y])
+            # the starting position can't be popped
+            del self._pushed_squares[:]
+            del self._pushed_positions[:]
+            del self._pushed_winners[:]
+
+    def push(self, move, side):
+        """Make a move
+
+        Args:
+            move ((int, int)): The square to play on, it must be empty
+            side (int): The side making the move, 1 or -1
+        """
+        self.push_square(move[0] * self.columns + move[1], side)
+
+    def push_square(self, square, side):
+        """Make a move given as a flat index, see push"""
+        position = self._positions[square]
+        available = self.available
+        last_square = available.pop()
+        if last_square != square:
+            available[position] = last_square
+            self._positions[last_square] = position
+
+        self._pushed_squares.append(square)
+        self._pushed_positions.append(position)
+        self._pushed_winners.append(self.winner)
+
+        self.squares[square] = side
+        self.hash ^= self._plus_keys[square] if side > 0 else self._minus_keys[square]
+        if self.winner == 0 and self._is_winning_square(square, side):
+            self.winner = side
+
+    def pop(self):
+        """Take back the last move pushed
+
+        Returns:
+            (int, int): The move taken back
+        """
+        square = self._pushed_squares.pop()
+        position = self._pushed_positions.pop()
+        self.winner = self._pushed_winners.pop()
+
+        side = self.squares[square]
+        self.squares[square] = 0
+        self.hash ^= self._plus_keys[square] if side > 0 else self._minus_keys[square]
+
+        available = self.available
+        if position == len(available):
+            available.append(square)
+        else:
+            moved_square = available[position]
+            self._positions[moved_square] = len(available)
+            available.append(moved_square)
+            available[position] = square
+        self._positions[square] = position
+        return self._moves[square]
+
+    def _is_winning_square(self, square, side):
+        squares = self.squares
+        winning_length = self.winning_length
+        for forward, backward in self._line_squares[square]:
+            count = 1
+            for line_square in forward:
+                if squares[line_square] != side:
+                    break
+                count += 1
+            for line_square in backward:
+                if squares[line_square] != side:
+                    break
+                count += 1
+            if count >= winning_length:
+                return True
+        return False
+
+    def move_for_square(self, square):
+        """The (x, y) move for a flat index"""
+        return self._moves[square]
+
+    def available_moves(self):
+        """The empty squares as (x, y) moves
+
+        Returns:
+            list of (int, int)
+        """
+        moves = self._moves
+        return [moves[square] for square in self.available]
+
+    def is_over(self):
+        return self.winner != 0 or not self.available
+
+    def to_tuple(self):
+        """The position as a tuple of rows of ints, as used by the game specs"""
+        columns = self.columns
+        return tuple(tuple(self.squares[x * columns:(x + 1) * columns]) for x in range(self.rows))
+
+    def __getitem__(self, x):
+        if x < 0:
+            x += self.rows
+        if not 0 <= x < self.rows:
+            raise IndexError('board row index out of range')
+        return tuple(self.squares[x * self.columns:(x + 1) * self.columns])
+
+    def __len__(self):
+        return self.rows
+
+    def __iter__(self):
+        for x in range(self.rows):
+            yield tuple(self.squares[x * self.columns:(x + 1) * self.columns])
+
+    def __repr__(self):
+        return 'MutableBoard(%r)' % (self.to_tuple(),)
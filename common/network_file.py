@@ -0,0 +1,143 @@
+"""
+File format for network weights, used by network_helpers.save_network/load_network and PolicyNetwork.load.
+
+A file starts with a header describing every array, followed by all the values as one contiguous little endian float32
+payload, so the weights can be memory mapped and used without copying them or unpickling anything.
+
+Header layout, all little endian:
+    magic (6 bytes) b'TOENET'
+    version (uint16)
+    number of arrays (uint32)
+    payload offset (uint32) from the start of the file, always a multiple of 64
+    for each array: number of dimensions (uint8), dtype code (uint8), then each dimension (uint32)
+
+Files written by older versions of save_network, a pickled list of arrays, can still be read with read_weights.
+"""
+import os
+import pickle
+import struct
+
+import numpy as np
+
+MAGIC = b'TOENET'
+VERSION = 1
+
+_PREAMBLE = struct.Struct('<6sHII')
+_ARRAY_HEADER = struct.Struct('<BB')
+_DIMENSION = struct.Struct('<I')
+_PAYLOAD_ALIGNMENT = 64
+_DTYPES = {1: np.dtype('<f4')}
+_DTYPE_CODES = {dtype: code for code, dtype in _DTYPES.items()}
+
+
+def is_network_file(file_path):
+    """Check if the file at file_path is in this format rather than an old pickled network
+
+    Args:
+        file_path (str): path of the file to check
+
+    Returns:
+        bool
+    """
+    with open(file_path, mode='rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def write_network_file(file_path, arrays):
+    """Write a list of arrays to file_path, the arrays are stored as float32.
+
+    Args:
+        file_path (str): path of the file we want to save to.
+        arrays ([np.array]): the values to save, e.g. the weights and biases of every layer of a network
+    """
+    arrays = [np.ascontiguousarray(array, dtype=_DTYPES[1]) for array in arrays]
+
+    array_headers = b''.join(_ARRAY_HEADER.pack(array.ndim, _DTYPE_CODES[array.dtype]) +
+                             b''.join(_DIMENSION.pack(dimension) for dimension in array.shape)
+                             for array in arrays)
+    header_size = _PREAMBLE.size + len(array_headers)
+    payload_offset = -(-header_size // _PAYLOAD_ALIGNMENT) * _PAYLOAD_ALIGNMENT
+
+    # written to a temporary file and then moved over file_path, because networks loaded from file_path memory map it
+    # and would see their weights change, or crash part way through a read, if it was rewritten in place
+    temporary_path = '%s.%s.tmp' % (file_path, os.getpid())
+    with open(temporary_path, mode='wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, VERSION, len(arrays), payload_offset))
+        f.write(array_headers)
+        f.write(b'\0' * (payload_offset - header_size))
+        for array in arrays:
+            f.write(array.tobytes())
+    os.replace(temporary_path, file_path)
+
+
+def read_network_file(file_path, use_mmap=True):
+    """Read the arrays written by write_network_file
+
+    Args:
+        file_path (str): path of the file we want to load from.
+        use_mmap (bool): If True the arrays are read only views of the memory mapped file, otherwise they are read
+            into memory
+
+    Returns:
+        [np.array]
+    """
+    with open(file_path, mode='rb') as f:
+        magic, version, number_of_arrays, payload_offset = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+        if magic != MAGIC:
+            raise ValueError("%s is not a network file" % file_path)
+        if version != VERSION:
+            raise ValueError("%s is network file version %s, only version %s is supported"
+                             % (file_path, version, VERSION))
+
+        layouts = []
+        for _ in range(number_of_arrays):
+            ndim, dtype_code = _ARRAY_HEADER.unpack(f.read(_ARRAY_HEADER.size))
+            shape = tuple(_DIMENSION.unpack(f.read(_DIMENSION.size))[0] for _ in range(ndim))
+            layouts.append((_DTYPES[dtype_code], shape))
+
+    payload_size = sum(dtype.itemsize * int(np.prod(shape)) for dtype, shape in layouts)
+    if use_mmap:
+        payload = np.memmap(file_path, dtype=np.uint8, mode='r', offset=payload_offset, shape=(payload_size,))
+    else:
+        payload = np.fromfile(file_path, dtype=np.uint8, count=payload_size, offset=payload_offset)
+
+    arrays = []
+    position = 0
+    for dtype, shape in layouts:
+        size = dtype.itemsize * int(np.prod(shape))
+        arrays.append(payload[position:position + size].view(dtype).reshape(shape))
+        position += size
+    return arrays
+
+
+def read_weights(file_path):
+    """Read network weights from either this format or an old pickled network file
+
+    Args:
+        file_path (str): path of the file we want to load from.
+
+    Returns:
+        [np.array]
+    """
+    if is_network_file(file_path):
+        return read_network_file(file_path)
+    with open(file_path, mode='rb') as f:
+        return pickle.load(f)
+
+
+def convert_pickle_network(pickle_file_path, file_path):
+    """Convert an old pickled network file to this format
+
+    Args:
+        pickle_file_path (str): path of the pickled network
+        file_path (str): path to write the converted network to, can be the same as pickle_file_path
+    """
+    write_network_file(file_path, read_weights(pickle_file_path))
+
+
+if __name__ == '__main__':
+    import sys
+
+    for path in sys.argv[1:]:
+        print("converting %s" % path)
+        convert_pickle_network(path, path)
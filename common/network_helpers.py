@@ -1,10 +1,13 @@
 import operator
-import pickle
+import weakref
 from functools import reduce
 
 import numpy as np
 import tensorflow as tf
 
+from common.instrumentation import NULL_INSTRUMENTATION
+from common.network_file import read_weights, write_network_file
+
 
 def create_network(input_nodes, hidden_nodes, output_nodes=None, output_softmax=True):
     """Create a network with relu activations at each layer
@@ -65,8 +68,53 @@ def create_network(input_nodes, hidden_nodes, output_nodes=None, output_softmax=
     return input_layer, output_layer, variables
 
 
+def create_policy_gradient_train_step(output_layer, outputs, learn_rate):
+    """Create the Adam train step used by the policy gradient trainers, which raises the log probability of each move
+    made in proportion to it's reward
+
+    Args:
+        output_layer (tf.Tensor): The softmax output of the network being trained
+        outputs (int): How many moves the network chooses between, the game_spec's outputs()
+        learn_rate (float):
+
+    Returns:
+        (reward_placeholder, actual_move_placeholder, train_step): Feed the normalized reward and the flat index of
+            each move made to the placeholders when running train_step
+    """
+    reward_placeholder = tf.placeholder("float", shape=(None,))
+    # the flat index of each move made, rather than a 1 hot encoding, so the moves can be fed straight from a buffer
+    actual_move_placeholder = tf.placeholder(tf.int32, shape=(None,))
+
+    move_probability = tf.reduce_sum(tf.multiply(tf.one_hot(actual_move_placeholder, outputs), output_layer),
+                                     reduction_indices=1)
+    # a move the network would never make, e.g. a logged move trained on offline, can have a probability that rounds to
+    # 0, the log of which is -inf and would turn the weights into NaN
+    policy_gradient = tf.log(tf.maximum(move_probability, 1e-10)) * reward_placeholder
+    train_step = tf.train.AdamOptimizer(learn_rate).minimize(-policy_gradient)
+    return reward_placeholder, actual_move_placeholder, train_step
+
+
+def normalize_rewards(rewards):
+    """Shift and scale the rewards of a mini batch to a mean of 0 and a standard deviation of 1
+
+    Args:
+        rewards (np.array): The reward for each move in the mini batch
+
+    Returns:
+        np.array: The normalized rewards, a new array
+    """
+    normalized_rewards = rewards - np.mean(rewards)
+    rewards_std = np.std(normalized_rewards)
+    if rewards_std != 0:
+        normalized_rewards /= rewards_std
+    else:
+        print("warning: got mini batch std of 0.")
+    return normalized_rewards
+
+
 def save_network(session, tf_variables, file_path):
-    """Save the given set of variables to the given file using the given session
+    """Save the given set of variables to the given file using the given session, in the format described in
+    common.network_file
 
     Args:
         session (tf.Session): session within which the variables has been initialised
@@ -74,8 +122,7 @@ def save_network(session, tf_variables, file_path):
         file_path (str): path of the file we want to save to.
     """
     variable_values = session.run(tf_variables)
-    with open(file_path, mode='wb') as f:
-        pickle.dump(variable_values, f)
+    write_network_file(file_path, variable_values)
 
 
 def load_network(session, tf_variables, file_path):
@@ -85,17 +132,16 @@ def load_network(session, tf_variables, file_path):
         session (tf.Session): session within which the variables has been initialised
         tf_variables (list of tf.Variable): list of variables which will set up with the values saved to the file. List
             order matters, in must be the exact same order as was used to save and all of the same shape.
-        file_path (str): path of the file we want to load from.
+        file_path (str): path of the file we want to load from, either saved by save_network or an older pickled
+            network file
     """
-    with open(file_path, mode='rb') as f:
-        variable_values = pickle.load(f)
+    variable_values = read_weights(file_path)
 
     try:
         if len(variable_values) != len(tf_variables):
             raise ValueError("Network in file had different structure, variables in file: %s variables in memeory: %s"
                              % (len(variable_values), len(tf_variables)))
-        for value, tf_variable in zip(variable_values, tf_variables):
-            session.run(tf_variable.assign(value))
+        set_network_weights(session, tf_variables, variable_values)
     except ValueError as ex:
         # TODO: maybe raise custom exception
         raise ValueError("""Tried to load network file %s with different architecture from the in memory network.
@@ -103,6 +149,34 @@ Error was %s
 Either delete the network file to train a new network from scratch or change the in memory network to match that dimensions of the one in the file""" % (file_path, ex))
 
 
+# for each graph, the placeholder and assign op used to set each variable by name
+_assign_ops = weakref.WeakKeyDictionary()
+
+
+def set_network_weights(session, tf_variables, values):
+    """Set the values of the given variables in a single session.run. The placeholder and assign op for each variable
+    are only created the first time it is set, so setting weights over and over does not grow the graph.
+
+    Args:
+        session (tf.Session): session within which the variables has been initialised
+        tf_variables (list of tf.Variable): the variables to set
+        values (list of np.array): the value for each variable, must be the same shape as the variable
+    """
+    feed_dict = {}
+    assign_ops = []
+    for tf_variable, value in zip(tf_variables, values):
+        graph_assign_ops = _assign_ops.setdefault(tf_variable.graph, {})
+        if tf_variable.name not in graph_assign_ops:
+            with tf_variable.graph.as_default():
+                placeholder = tf.placeholder(tf_variable.dtype.base_dtype, tf_variable.get_shape())
+                graph_assign_ops[tf_variable.name] = (placeholder, tf_variable.assign(placeholder))
+        placeholder, assign_op = graph_assign_ops[tf_variable.name]
+        feed_dict[placeholder] = value
+        assign_ops.append(assign_op)
+
+    session.run(assign_ops, feed_dict=feed_dict)
+
+
 def invert_board_state(board_state):
     """Returns the board state inverted, so all 1 are replaced with -1 and visa-versa
 
@@ -116,7 +190,7 @@ def invert_board_state(board_state):
 
 
 def get_stochastic_network_move(session, input_layer, output_layer, board_state, side,
-                                valid_only=False, game_spec=None):
+                                valid_only=False, game_spec=None, instrumentation=None):
     """Choose a move for the given board_state using a stocastic policy. A move is selected using the values from the
      output_layer as a categorical probability distribution to select a single move
 
@@ -127,6 +201,8 @@ def get_stochastic_network_move(session, input_layer, output_layer, board_state,
             dimesensions (None, board_squares) and the sum of values across the board_squares to be 1.
         board_state: The board_state we want to get the move for.
         side: The side that is making the move.
+        instrumentation (common.instrumentation.Instrumentation): If set the session.run is timed as inference and
+            choosing the move from the probabilities as sampling
 
     Returns:
         (np.array) It's shape is (board_squares), and it is a 1 hot encoding for the move the network has chosen.
@@ -136,30 +212,29 @@ def get_stochastic_network_move(session, input_layer, output_layer, board_state,
         np_board_state = -np_board_state
 
     np_board_state = np_board_state.reshape(1, *input_layer.get_shape().as_list()[1:])
-    probability_of_actions = session.run(output_layer,
-                                         feed_dict={input_layer: np_board_state})[0]
-
-    if valid_only:
-        available_moves = list(game_spec.available_moves(board_state))
-        if len(available_moves) == 1:
-            move = np.zeros(game_spec.board_squares())
-            np.put(move, game_spec.tuple_move_to_flat(available_moves[0]), 1)
-            return move
-        available_moves_flat = [game_spec.tuple_move_to_flat(x) for x in available_moves]
-        for i in range(game_spec.board_squares()):
-            if i not in available_moves_flat:
-                probability_of_actions[i] = 0.
-
-        prob_mag = sum(probability_of_actions)
-        if prob_mag != 0.:
-            probability_of_actions /= sum(probability_of_actions)
-
-    try:
-        move = np.random.multinomial(1, probability_of_actions)
-    except ValueError:
-        # sometimes because of rounding errors we end up with probability_of_actions summing to greater than 1.
-        # so need to reduce slightly to be a valid value
-        move = np.random.multinomial(1, probability_of_actions / (1. + 1e-6))
+    instrumentation = instrumentation or NULL_INSTRUMENTATION
+    probability_of_actions = instrumentation.run_session(session, output_layer, {input_layer: np_board_state},
+                                                         'inference')[0]
+
+    with instrumentation.timer('sampling'):
+        if valid_only:
+            available_moves = list(game_spec.available_moves(board_state))
+            if len(available_moves) == 1:
+                move = np.zeros(game_spec.outputs())
+                np.put(move, game_spec.tuple_move_to_flat(available_moves[0]), 1)
+                return move
+            probability_of_actions = probability_of_actions * get_valid_moves_masks(game_spec, [board_state])[0]
+
+            prob_mag = sum(probability_of_actions)
+            if prob_mag != 0.:
+                probability_of_actions /= sum(probability_of_actions)
+
+        try:
+            move = np.random.multinomial(1, probability_of_actions)
+        except ValueError:
+            # sometimes because of rounding errors we end up with probability_of_actions summing to greater than 1.
+            # so need to reduce slightly to be a valid value
+            move = np.random.multinomial(1, probability_of_actions / (1. + 1e-6))
 
     return move
 
@@ -189,13 +264,110 @@ def get_deterministic_network_move(session, input_layer, output_layer, board_sta
                                          feed_dict={input_layer: np_board_state})[0]
 
     if valid_only:
-        available_moves = game_spec.available_moves(board_state)
-        available_moves_flat = [game_spec.tuple_move_to_flat(x) for x in available_moves]
-        for i in range(game_spec.board_squares()):
-            if i not in available_moves_flat:
-                probability_of_actions[i] = 0
+        probability_of_actions = probability_of_actions * get_valid_moves_masks(game_spec, [board_state])[0]
 
     move = np.argmax(probability_of_actions)
     one_hot = np.zeros(len(probability_of_actions))
     one_hot[move] = 1.
     return one_hot
+
+
+def get_valid_moves_masks(game_spec, board_states):
+    """Get a mask of the legal moves for each board, 1 for a legal move and 0 otherwise. For games where the moves are
+    the squares of the board, any empty square is taken to be a legal move so the masks are worked out in one array
+    operation, otherwise available_moves is called for each board.
+
+    Args:
+        game_spec (BaseGameSpec): The game being played
+        board_states (list of board states): The boards we want the masks for
+
+    Returns:
+        (np.array) Of shape (number of boards, outputs)
+    """
+    if game_spec.outputs() == game_spec.board_squares():
+        np_board_states = np.asarray(board_states)
+        return (np_board_states.reshape(len(np_board_states), -1) == 0).astype(np.float64)
+
+    masks = np.zeros((len(board_states), game_spec.outputs()))
+    for i, board_state in enumerate(board_states):
+        masks[i, [game_spec.tuple_move_to_flat(move) for move in game_spec.available_moves(board_state)]] = 1.
+    return masks
+
+
+def _get_network_probabilities(session, input_layer, output_layer, board_states, sides):
+    # the boards from the point of view of the side to move in each, all run through the network together
+    np_board_states = np.array(board_states, dtype=np.float32)
+    number_of_boards = len(np_board_states)
+    np_board_states = np_board_states.reshape(number_of_boards, -1) * np.reshape(sides, (-1, 1))
+    np_board_states = np_board_states.reshape(number_of_boards, *input_layer.get_shape().as_list()[1:])
+    return session.run(output_layer, feed_dict={input_layer: np_board_states}).astype(np.float64)
+
+
+def _one_hot(moves, outputs):
+    one_hot = np.zeros((len(moves), outputs))
+    one_hot[np.arange(len(moves)), moves] = 1.
+    return one_hot
+
+
+def get_stochastic_network_moves(session, input_layer, output_layer, board_states, sides, valid_only=False,
+                                 game_spec=None):
+    """Batch version of get_stochastic_network_move, choose a move for each of the board_states with a single
+    session.run.
+
+    Args:
+        session (tf.Session): Session used to run this network
+        input_layer (tf.Placeholder): Placeholder to the network used to feed in the board_states
+        output_layer (tf.Tensor): Tensor that will output the probabilities of the moves, we expect this to be of
+            dimesensions (None, outputs) and the sum of values across the outputs to be 1.
+        board_states (list of board states): The board_states we want to get the moves for.
+        sides (int or list of int): The side that is making the move on each board, or one side for all of them.
+        valid_only (bool): If True only legal moves can be chosen, needs game_spec. Boards where the network gives
+            no probability to any legal move choose uniformly from the legal moves.
+        game_spec (BaseGameSpec): The game being played
+
+    Returns:
+        (np.array) It's shape is (number of boards, outputs), each row is a 1 hot encoding for the move the network has
+            chosen for that board.
+    """
+    probability_of_actions = _get_network_probabilities(session, input_layer, output_layer, board_states, sides)
+
+    if valid_only:
+        masks = get_valid_moves_masks(game_spec, board_states)
+        probability_of_actions *= masks
+        no_valid_probability = probability_of_actions.sum(axis=1) == 0.
+        probability_of_actions[no_valid_probability] = masks[no_valid_probability]
+
+    # sample every row at once from it's cumulative distribution, scaled by the row total so rounding errors in the
+    # network output can't choose past the end of a row
+    cumulative = np.cumsum(probability_of_actions, axis=1)
+    thresholds = np.random.random(len(cumulative)) * cumulative[:, -1]
+    moves = np.minimum((cumulative <= thresholds[:, None]).sum(axis=1), cumulative.shape[1] - 1)
+    return _one_hot(moves, cumulative.shape[1])
+
+
+def get_deterministic_network_moves(session, input_layer, output_layer, board_states, sides, valid_only=False,
+                                    game_spec=None):
+    """Batch version of get_deterministic_network_move, choose the move with the highest score for each of the
+    board_states with a single session.run.
+
+    Args:
+        session (tf.Session): Session used to run this network
+        input_layer (tf.Placeholder): Placeholder to the network used to feed in the board_states
+        output_layer (tf.Tensor): Tensor that will output the scores of the moves, we expect this to be of
+            dimesensions (None, outputs).
+        board_states (list of board states): The board_states we want to get the moves for.
+        sides (int or list of int): The side that is making the move on each board, or one side for all of them.
+        valid_only (bool): If True only legal moves can be chosen, needs game_spec
+        game_spec (BaseGameSpec): The game being played
+
+    Returns:
+        (np.array) It's shape is (number of boards, outputs), each row is a 1 hot encoding for the move the network has
+            chosen for that board.
+    """
+    probability_of_actions = _get_network_probabilities(session, input_layer, output_layer, board_states, sides)
+
+    if valid_only:
+        masks = get_valid_moves_masks(game_spec, board_states)
+        probability_of_actions = np.where(masks > 0., probability_of_actions, -np.inf)
+
+    return _one_hot(probability_of_actions.argmax(axis=1), probability_of_actions.shape[1])
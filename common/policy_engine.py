@@ -0,0 +1,102 @@
+import os
+
+import tensorflow as tf
+
+from common.network_helpers import create_network, load_network, get_stochastic_network_move, \
+    get_deterministic_network_move, get_stochastic_network_moves, get_deterministic_network_moves
+
+
+class PolicyEngine(object):
+    def __init__(self, game_spec, hidden_nodes, network_file_path=None, deterministic=False):
+        """Long lived wrapper around a policy network, so that choosing a move does not rebuild the network.
+
+        The network gets its own tf.Graph and tf.Session which are created once here and then reused for every call to
+        move, so the size of the graph stays the same however many moves are made.
+
+        Examples:
+            engine = PolicyEngine(TicTacToeGameSpec(), (100, 100, 100), 'current_network.p')
+            move = engine.move(board_state, side)
+
+        Args:
+            game_spec (BaseGameSpec): The game the network plays
+            hidden_nodes ([int]): The number of hidden nodes in each hidden layer, must match the saved network
+            network_file_path (str): Optional path to the weights to load, if the file does not exist the network keeps
+                it's random initial weights
+            deterministic (bool): If True always play the move with the highest probability, otherwise sample a move
+                from the output of the network
+        """
+        self.game_spec = game_spec
+        self.deterministic = deterministic
+        self.graph = tf.Graph()
+
+        with self.graph.as_default():
+            self.input_layer, self.output_layer, self.variables = create_network(game_spec.board_squares(),
+                                                                                 hidden_nodes,
+                                                                                 output_nodes=game_spec.outputs())
+            self.session = tf.Session(graph=self.graph)
+            self.session.run(tf.global_variables_initializer())
+            if network_file_path and os.path.isfile(network_file_path):
+                print("loading pre-existing network")
+                load_network(self.session, self.variables, network_file_path)
+
+        # nothing should be added to the graph after this point, so fail loudly if something tries to
+        self.graph.finalize()
+
+    def move(self, board_state, side):
+        """Choose a move for the given board_state
+
+        Args:
+            board_state: The board_state we want to get the move for.
+            side (int): The side that is making the move.
+
+        Returns:
+            tuple or int: The move the network has chosen in board coordinates, this may not be a legal move
+        """
+        return self.game_spec.flat_move_to_tuple(self.move_one_hot(board_state, side).argmax())
+
+    def move_one_hot(self, board_state, side):
+        """Choose a move for the given board_state
+
+        Args:
+            board_state: The board_state we want to get the move for.
+            side (int): The side that is making the move.
+
+        Returns:
+            (np.array) It's shape is (outputs), and it is a 1 hot encoding for the move the network has chosen.
+        """
+        if self.deterministic:
+            return get_deterministic_network_move(self.session, self.input_layer, self.output_layer, board_state, side)
+        return get_stochastic_network_move(self.session, self.input_layer, self.output_layer, board_state, side)
+
+    def moves(self, board_states, sides):
+        """Choose a move for each of the board_states with a single session.run
+
+        Args:
+            board_states (list of board states): The board_states we want to get the moves for.
+            sides (int or list of int): The side that is making the move on each board, or one side for all of them.
+
+        Returns:
+            list of tuple or int: The move the network has chosen for each board in board coordinates, these may not
+                be legal moves
+        """
+        return [self.game_spec.flat_move_to_tuple(move) for move in
+                self.moves_one_hot(board_states, sides).argmax(axis=1)]
+
+    def moves_one_hot(self, board_states, sides):
+        """Choose a move for each of the board_states with a single session.run
+
+        Args:
+            board_states (list of board states): The board_states we want to get the moves for.
+            sides (int or list of int): The side that is making the move on each board, or one side for all of them.
+
+        Returns:
+            (np.array) It's shape is (number of boards, outputs), each row is a 1 hot encoding for a move
+        """
+        if self.deterministic:
+            return get_deterministic_network_moves(self.session, self.input_layer, self.output_layer, board_states,
+                                                   sides)
+        return get_stochastic_network_moves(self.session, self.input_layer, self.output_layer, board_states, sides)
+
+    def close(self):
+        """Release the session, the engine can not be used after this"""
+        self.session.close()
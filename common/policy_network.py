@@ -0,0 +1,182 @@
+"""
+NumPy only version of the networks built by common.network_helpers.create_network, for playing with a trained network
+without importing TensorFlow.
+
+The weights are the list of arrays saved by network_helpers.save_network, in the order create_network returns its
+variables: the weights and biases of each hidden layer followed by the output weights and bias.
+"""
+import numpy as np
+
+from common.network_file import read_weights
+
+
+class PolicyNetwork(object):
+    def __init__(self, weights, output_softmax=True):
+        """Network with relu activations at each hidden layer
+
+        Args:
+            weights ([np.array]): The weights and biases of every layer, in the order create_network uses
+            output_softmax (bool): If True softmax is used in the final layer, otherwise just use the activation with no
+                non-linearity function
+        """
+        if len(weights) < 2 or len(weights) % 2 != 0:
+            raise ValueError("Expected a weights and biases array for each layer, got %s arrays" % len(weights))
+
+        self.layers = [(np.asarray(weights[i], dtype=np.float32), np.asarray(weights[i + 1], dtype=np.float32))
+                       for i in range(0, len(weights), 2)]
+        self.output_softmax = output_softmax
+
+        for (layer_weights, _), (next_weights, _) in zip(self.layers, self.layers[1:]):
+            if layer_weights.shape[1] != next_weights.shape[0]:
+                raise ValueError("Layer with %s outputs is followed by a layer with %s inputs"
+                                 % (layer_weights.shape[1], next_weights.shape[0]))
+
+    @classmethod
+    def load(cls, file_path, output_softmax=True):
+        """Load a network saved by network_helpers.save_network, or an older pickled network file
+
+        Args:
+            file_path (str): path of the file we want to load from.
+            output_softmax (bool): Must match the value used to create the network that was saved
+
+        Returns:
+            PolicyNetwork
+        """
+        return cls(read_weights(file_path), output_softmax)
+
+    @classmethod
+    def create(cls, input_nodes, hidden_nodes, output_nodes=None, output_softmax=True):
+        """Create a network with random weights, initialised the same way as create_network
+
+        Args:
+            input_nodes (int): The size of the board this network will work on
+            hidden_nodes ([int]): The number of hidden nodes in each hidden layer
+            output_nodes (int): Number of output nodes, if None then number of input nodes is used
+            output_softmax (bool): If True softmax is used in the final layer
+
+        Returns:
+            PolicyNetwork
+        """
+        output_nodes = output_nodes or input_nodes
+        weights = []
+        last_layer_nodes = input_nodes
+        for nodes in hidden_nodes:
+            weights.append(_truncated_normal((last_layer_nodes, nodes), 1. / np.sqrt(last_layer_nodes)))
+            weights.append(np.full(nodes, 0.01, dtype=np.float32))
+            last_layer_nodes = nodes
+
+        weights.append(_truncated_normal((last_layer_nodes, output_nodes), 1. / np.sqrt(output_nodes)))
+        weights.append(np.full(output_nodes, 0.01, dtype=np.float32))
+        return cls(weights, output_softmax)
+
+    @property
+    def input_nodes(self):
+        return self.layers[0][0].shape[0]
+
+    @property
+    def output_nodes(self):
+        return self.layers[-1][0].shape[1]
+
+    def probabilities(self, board_states):
+        """Run the network on a batch of boards
+
+        Args:
+            board_states (np.array): Of shape (number of boards, input_nodes), or anything that reshapes to it
+
+        Returns:
+            np.array: Of shape (number of boards, output_nodes)
+        """
+        current_layer = np.asarray(board_states, dtype=np.float32).reshape(-1, self.input_nodes)
+        for layer_weights, layer_bias in self.layers[:-1]:
+            current_layer = np.maximum(current_layer.dot(layer_weights) + layer_bias, 0.)
+
+        output_weights, output_bias = self.layers[-1]
+        output_layer = current_layer.dot(output_weights) + output_bias
+        if self.output_softmax:
+            output_layer = np.exp(output_layer - output_layer.max(axis=1, keepdims=True))
+            output_layer /= output_layer.sum(axis=1, keepdims=True)
+        return output_layer
+
+    def get_stochastic_network_move(self, board_state, side, valid_only=False, game_spec=None):
+        """Choose a move for the given board_state using a stocastic policy, the same way as
+        network_helpers.get_stochastic_network_move.
+
+        Args:
+            board_state: The board_state we want to get the move for.
+            side: The side that is making the move.
+            valid_only (bool): If True only legal moves can be chosen, needs game_spec
+            game_spec (BaseGameSpec): The game being played
+
+        Returns:
+            (np.array) It's shape is (outputs), and it is a 1 hot encoding for the move the network has chosen.
+        """
+        np_board_state = np.array(board_state)
+        if side == -1:
+            np_board_state = -np_board_state
+
+        probability_of_actions = self.probabilities(np_board_state)[0].astype(np.float64)
+
+        if valid_only:
+            available_moves = list(game_spec.available_moves(board_state))
+            if len(available_moves) == 1:
+                move = np.zeros(game_spec.outputs())
+                np.put(move, game_spec.tuple_move_to_flat(available_moves[0]), 1)
+                return move
+            probability_of_actions *= _valid_moves_mask(game_spec, available_moves)
+
+            prob_mag = probability_of_actions.sum()
+            if prob_mag != 0.:
+                probability_of_actions /= prob_mag
+
+        try:
+            move = np.random.multinomial(1, probability_of_actions)
+        except ValueError:
+            # sometimes because of rounding errors we end up with probability_of_actions summing to greater than 1.
+            # so need to reduce slightly to be a valid value
+            move = np.random.multinomial(1, probability_of_actions / (1. + 1e-6))
+
+        return move
+
+    def get_deterministic_network_move(self, board_state, side, valid_only=False, game_spec=None):
+        """Choose the move with the highest score for the given board_state, the same way as
+        network_helpers.get_deterministic_network_move.
+
+        Args:
+            board_state: The board_state we want to get the move for.
+            side: The side that is making the move.
+            valid_only (bool): If True only legal moves can be chosen, needs game_spec
+            game_spec (BaseGameSpec): The game being played
+
+        Returns:
+            (np.array) It's shape is (outputs), and it is a 1 hot encoding for the move the network has chosen.
+        """
+        np_board_state = np.array(board_state)
+        if side == -1:
+            np_board_state = -np_board_state
+
+        probability_of_actions = self.probabilities(np_board_state)[0]
+
+        if valid_only:
+            probability_of_actions = probability_of_actions * _valid_moves_mask(
+                game_spec, game_spec.available_moves(board_state))
+
+        move = np.argmax(probability_of_actions)
+        one_hot = np.zeros(len(probability_of_actions))
+        one_hot[move] = 1.
+        return one_hot
+
+
+def _valid_moves_mask(game_spec, available_moves):
+    mask = np.zeros(game_spec.outputs())
+    mask[[game_spec.tuple_move_to_flat(move) for move in available_moves]] = 1.
+    return mask
+
+
+def _truncated_normal(shape, stddev):
+    # same as tf.truncated_normal, values more than 2 standard deviations from the mean are drawn again
+    values = np.random.normal(0., stddev, shape)
+    out_of_range = np.abs(values) > 2 * stddev
+    while out_of_range.any():
+        values[out_of_range] = np.random.normal(0., stddev, out_of_range.sum())
+        out_of_range = np.abs(values) > 2 * stddev
+    return values.astype(np.float32)
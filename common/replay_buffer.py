@@ -0,0 +1,208 @@
+"""
+Fixed size store for the board states, moves and rewards collected while training, used in place of growing python
+lists of small arrays.
+
+All the storage is allocated once when the buffer is made: an int8 array for the boards, a uint8 array for the flat
+move indexes (uint16 for games with more than 256 moves) and a float32 array for the rewards. Steps are written into
+these arrays as a ring, so once the buffer is full the oldest steps are overwritten and memory use stays the same
+however long training runs for.
+
+Examples:
+    buffer = ReplayBuffer(10000, game_spec.board_squares())
+    buffer.append(np.ravel(board_state) * side, move_index)
+    ...
+    buffer.end_episode(reward)
+    board_states, moves, rewards = buffer.contents()
+"""
+import numpy as np
+
+
+class ReplayBuffer(object):
+    def __init__(self, capacity, board_squares, outputs=None, prioritized=False, priority_exponent=0.6,
+                 importance_exponent=0.4):
+        """
+        Args:
+            capacity (int): The most steps the buffer holds
+            board_squares (int): The size of a flattened board
+            outputs (int): Number of possible moves, if None then board_squares is used
+            prioritized (bool): If True sample chooses steps in proportion to their priority rather than uniformly
+            priority_exponent (float): How much the priorities matter when prioritized, 0 is uniform sampling
+            importance_exponent (float): How much the importance weights returned by sample correct for the
+                prioritized sampling, 1 fully corrects for it
+        """
+        outputs = outputs or board_squares
+        self.capacity = capacity
+        self.board_states = np.zeros((capacity, board_squares), dtype=np.int8)
+        self.moves = np.zeros(capacity, dtype=np.uint8 if outputs <= 256 else np.uint16)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+
+        self._size = 0
+        # total steps ever added, the next step goes in at self._steps % capacity
+        self._steps = 0
+        self._episode_start = 0
+
+        self.prioritized = prioritized
+        if prioritized:
+            self.priority_exponent = priority_exponent
+            self.importance_exponent = importance_exponent
+            self._max_priority = 1.
+            # sum tree, the leaves at [_tree_size, _tree_size + capacity) hold priority ** priority_exponent for each
+            # step and every other node holds the sum of it's two children, so node 1 is the total
+            self._tree_size = 1 << max(capacity - 1, 1).bit_length()
+            self._tree = np.zeros(2 * self._tree_size)
+            self._stale_leaves = []
+
+    def __len__(self):
+        return self._size
+
+    def clear(self):
+        """Remove every step, the storage is kept for reuse"""
+        self._size = 0
+        self._steps = 0
+        self._episode_start = 0
+        if self.prioritized:
+            self._tree[:] = 0.
+            del self._stale_leaves[:]
+
+    def append(self, board_state, move):
+        """Add a single step, it's reward is set by end_episode
+
+        Args:
+            board_state (np.array): The flattened board from the point of view of the side that moved
+            move (int): The flat index of the move made
+        """
+        index = self._steps % self.capacity
+        self.board_states[index] = board_state
+        self.moves[index] = move
+        self.rewards[index] = 0.
+        self._added(index, 1)
+
+    def end_episode(self, reward):
+        """Set the reward for every step added since the last episode ended to reward divided by the number of steps,
+        so winning quickly is better winning slowly and loosing slowly better than loosing quick
+
+        Args:
+            reward (float): The result of the game
+
+        Returns:
+            int: The number of steps in the episode
+        """
+        episode_length = min(self._steps - self._episode_start, self.capacity)
+        if episode_length > 0:
+            indexes = np.arange(self._steps - episode_length, self._steps) % self.capacity
+            self.rewards[indexes] = reward / float(episode_length)
+        self._episode_start = self._steps
+        return episode_length
+
+    def extend(self, board_states, moves, rewards):
+        """Add many steps at once, e.g. the output of VectorizedSelfPlay.play_games
+
+        Args:
+            board_states (np.array): Of shape (number of steps, board_squares)
+            moves (np.array): The flat index of each move, or a (number of steps, outputs) 1 hot encoding of them
+            rewards (np.array): The reward for each step
+        """
+        moves = np.asarray(moves)
+        if moves.ndim == 2:
+            moves = moves.argmax(axis=1)
+        number_of_steps = len(moves)
+        if number_of_steps > self.capacity:
+            board_states = board_states[-self.capacity:]
+            moves = moves[-self.capacity:]
+            rewards = rewards[-self.capacity:]
+            self._steps += number_of_steps - self.capacity
+            number_of_steps = self.capacity
+
+        start = self._steps % self.capacity
+        first_part = min(number_of_steps, self.capacity - start)
+        for source, target in ((slice(0, first_part), slice(start, start + first_part)),
+                               (slice(first_part, number_of_steps), slice(0, number_of_steps - first_part))):
+            self.board_states[target] = np.reshape(board_states, (number_of_steps, -1))[source]
+            self.moves[target] = moves[source]
+            self.rewards[target] = rewards[source]
+        self._added(start, number_of_steps)
+        self._episode_start = self._steps
+
+    def _added(self, start, number_of_steps):
+        self._steps += number_of_steps
+        self._size = min(self._size + number_of_steps, self.capacity)
+        if self.prioritized:
+            # new steps get the highest priority so far, the sum tree is brought up to date before the next sample
+            indexes = (start + np.arange(number_of_steps)) % self.capacity if number_of_steps > 1 else (start,)
+            leaves = np.add(indexes, self._tree_size)
+            self._tree[leaves] = self._max_priority ** self.priority_exponent
+            self._stale_leaves.extend(leaves)
+            if len(self._stale_leaves) >= self.capacity:
+                # don't let the list grow without limit if we are adding a lot without sampling
+                self._update_tree(self._stale_leaves)
+                del self._stale_leaves[:]
+
+    def contents(self):
+        """Views of every step in the buffer, nothing is copied so they are only valid until more steps are added. The
+        steps are in the order they were added unless the buffer has wrapped around.
+
+        Returns:
+            (board_states (np.array), moves (np.array), rewards (np.array))
+        """
+        return self.board_states[:self._size], self.moves[:self._size], self.rewards[:self._size]
+
+    def sample(self, batch_size):
+        """Choose batch_size steps at random, uniformly or by priority if the buffer is prioritized
+
+        Returns:
+            (board_states, moves, rewards, indexes, weights): indexes can be given to update_priorities, weights are the
+                importance sampling weights for each step, all 1 if not prioritized
+        """
+        if self._size == 0:
+            raise ValueError("Can not sample from an empty buffer")
+
+        if not self.prioritized:
+            indexes = np.random.randint(self._size, size=batch_size)
+            weights = np.ones(batch_size, dtype=np.float32)
+        else:
+            self._update_tree(self._stale_leaves)
+            del self._stale_leaves[:]
+
+            total = self._tree[1]
+            # one value from each of batch_size equal slices of the total, then walk down the tree to the leaf for each
+            values = (np.arange(batch_size) + np.random.random(batch_size)) * (total / batch_size)
+            nodes = np.ones(batch_size, dtype=np.intp)
+            while nodes[0] < self._tree_size:
+                left = nodes * 2
+                left_values = self._tree[left]
+                go_right = values > left_values
+                values -= left_values * go_right
+                nodes = left + go_right
+            indexes = np.minimum(nodes - self._tree_size, self._size - 1)
+
+            probabilities = self._tree[indexes + self._tree_size] / total
+            weights = (self._size * probabilities) ** -self.importance_exponent
+            weights = (weights / weights.max()).astype(np.float32)
+
+        return self.board_states[indexes], self.moves[indexes], self.rewards[indexes], indexes, weights
+
+    def update_priorities(self, indexes, priorities):
+        """Set the priorities of sampled steps, e.g. to the size of their error
+
+        Args:
+            indexes (np.array): The indexes returned by sample
+            priorities (np.array): The new priority for each, must be more than 0
+        """
+        if not self.prioritized:
+            raise ValueError("update_priorities needs a prioritized buffer")
+        priorities = np.maximum(np.asarray(priorities, dtype=np.float64), 1e-6)
+        self._max_priority = max(self._max_priority, priorities.max())
+        leaves = np.asarray(indexes) + self._tree_size
+        self._tree[leaves] = priorities ** self.priority_exponent
+        self._update_tree(leaves)
+
+    def _update_tree(self, leaves):
+        if len(leaves) == 0:
+            return
+        # every leaf is at the same depth, so the parents can be updated one level at a time
+        nodes = np.unique(np.asarray(leaves) // 2)
+        while True:
+            self._tree[nodes] = self._tree[nodes * 2] + self._tree[nodes * 2 + 1]
+            if nodes[0] == 1:
+                break
+            nodes = np.unique(nodes // 2)
@@ -0,0 +1,434 @@
+"""
+Connect 4, on a 6 row by 7 column board. A move is the int index of the column to drop a piece into, so there are only 7
+outputs rather than one per square.
+
+Each side is stored as an integer bitboard with 7 bits per column: bit column * 7 + height is set if that side has a
+piece height places up from the bottom of the column. The 7th bit of each column is always empty, so shifting a
+bitboard never carries a line from the top of one column into the bottom of the next. That makes checking for 4 in a
+row a few shifts and ANDs per direction, and only the side that just moved needs checking, so apply_move works out the
+winner as it goes.
+
+The board is a ConnectFourBoard object. It can be indexed and iterated like a tuple of rows of ints, with row 0 at the
+top, so np.array(board_state), board_state[x][y] and the network helpers all keep working. Every function in this
+module also accepts the tuple form, use from_tuple and to_tuple to convert between the two.
+
+For search code that makes and takes back moves in place, ConnectFourMutableBoard has the same interface as
+common.mutable_board.MutableBoard, with a column as the square, get one with ConnectFourGameSpec.new_mutable_board.
+"""
+import itertools
+import random
+
+from common.base_game_spec import BaseGameSpec
+
+ROWS = 6
+COLUMNS = 7
+_COLUMN_BITS = ROWS + 1
+
+# the bottom square and the top playable square of each column
+_BOTTOM = tuple(1 << (column * _COLUMN_BITS) for column in range(COLUMNS))
+_TOP = tuple(1 << (column * _COLUMN_BITS + ROWS - 1) for column in range(COLUMNS))
+_COLUMN_MASKS = tuple(((1 << ROWS) - 1) << (column * _COLUMN_BITS) for column in range(COLUMNS))
+# the bottom square of every column, a bitboard shifted down by a height and masked with this has the row at that height
+_ROW_MASK = sum(_BOTTOM)
+# (plus bits of a row | minus bits of the row << 1) -> the row as a tuple of ints, for indexing a board like a tuple
+_ROW_TUPLES = {sum(1 << (column * _COLUMN_BITS) for column, piece in enumerate(row) if piece == 1) |
+               sum(1 << (column * _COLUMN_BITS) for column, piece in enumerate(row) if piece == -1) << 1: row
+               for row in itertools.product((0, 1, -1), repeat=COLUMNS)}
+# the height of each row, from the top row down
+_ROW_HEIGHTS = tuple(range(ROWS - 1, -1, -1))
+# the minus bitboard is shifted up by this much in a ConnectFourMutableBoard's hash, so the hash is unique to a position
+_MINUS_HASH_SHIFT = COLUMNS * _COLUMN_BITS
+
+# the columns in the order available_moves returns them, center first because they are usually the best moves so
+# alpha-beta search gets more cut offs
+_MOVE_ORDER = tuple(sorted(range(COLUMNS), key=lambda column: abs(column - COLUMNS // 2)))
+
+# _AVAILABLE_MOVES[occupied & _TOP_ROW] is the tuple of columns that are not full
+_TOP_ROW = sum(_TOP)
+_AVAILABLE_MOVES = {sum(_TOP[column] for column in range(COLUMNS) if full & (1 << column)):
+                    tuple(column for column in _MOVE_ORDER if not full & (1 << column))
+                    for full in range(1 << COLUMNS)}
+
+# every line of 4 squares as a mask, used by evaluate
+_LINES = tuple(sum(1 << ((column + dx * i) * _COLUMN_BITS + height + dy * i) for i in range(4))
+               for column in range(COLUMNS) for height in range(ROWS) for dx, dy in ((0, 1), (1, 0), (1, 1), (1, -1))
+               if 0 <= column + dx * 3 < COLUMNS and 0 <= height + dy * 3 < ROWS)
+
+
+def _is_winning(bitboard):
+    # for each direction, pairs has a bit set where there are 2 in a row, so 2 pairs 2 apart are 4 in a row
+    pairs = bitboard & (bitboard >> 1)  # vertical
+    if pairs & (pairs >> 2):
+        return True
+    pairs = bitboard & (bitboard >> 7)  # horizontal
+    if pairs & (pairs >> 14):
+        return True
+    pairs = bitboard & (bitboard >> 6)  # diagonal going down to the right
+    if pairs & (pairs >> 12):
+        return True
+    pairs = bitboard & (bitboard >> 8)  # diagonal going up to the right
+    return bool(pairs & (pairs >> 16))
+
+
+class ConnectFourBoard(object):
+    """Immutable connect 4 board made of a bitboard for each side, along with the winner so far.
+
+    Behaves like the 6 x 7 tuple of rows of ints used for boards elsewhere, board_state[x][y] gives 1, -1 or 0 for row x
+    counting down from the top and column y.
+    """
+    __slots__ = ('plus', 'minus', 'winner', '_hash')
+
+    def __init__(self, plus=0, minus=0, winner=None):
+        self.plus = plus
+        self.minus = minus
+        if winner is None:
+            winner = 1 if _is_winning(plus) else -1 if _is_winning(minus) else 0
+        self.winner = winner
+
+    def __getitem__(self, x):
+        if x < 0:
+            x += ROWS
+        if not 0 <= x < ROWS:
+            raise IndexError('board row index out of range')
+        height = ROWS - 1 - x
+        return _ROW_TUPLES[(self.plus >> height) & _ROW_MASK | ((self.minus >> height) & _ROW_MASK) << 1]
+
+    def __len__(self):
+        return ROWS
+
+    def __iter__(self):
+        for x in range(ROWS):
+            yield self[x]
+
+    def __eq__(self, other):
+        if isinstance(other, ConnectFourBoard):
+            return self.plus == other.plus and self.minus == other.minus
+        try:
+            return to_tuple(self) == tuple(tuple(row) for row in other)
+        except TypeError:
+            return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        # must match the hash of the equivalent tuple because the two compare equal, so it is worked out from the tuple
+        # the first time it is needed and kept
+        try:
+            return self._hash
+        except AttributeError:
+            self._hash = board_hash = hash(to_tuple(self))
+            return board_hash
+
+    def __reduce__(self):
+        return ConnectFourBoard, (self.plus, self.minus, self.winner)
+
+    def __repr__(self):
+        return 'ConnectFourBoard(%r)' % (to_tuple(self),)
+
+
+def from_tuple(board_state):
+    """Convert a board in the 6 x 7 tuple of ints form into a ConnectFourBoard.
+
+    Args:
+        board_state (6x7 tuple of int, ConnectFourBoard or ConnectFourMutableBoard): The board to convert, a
+            ConnectFourBoard is returned unchanged
+
+    Returns:
+        ConnectFourBoard
+    """
+    if board_state.__class__ is ConnectFourBoard:
+        return board_state
+    if board_state.__class__ is ConnectFourMutableBoard:
+        return board_state.board_state()
+    plus = minus = 0
+    for x in range(ROWS):
+        row = board_state[x]
+        height = ROWS - 1 - x
+        for column in range(COLUMNS):
+            if row[column] == 1:
+                plus |= 1 << (column * _COLUMN_BITS + height)
+            elif row[column] == -1:
+                minus |= 1 << (column * _COLUMN_BITS + height)
+    return ConnectFourBoard(plus, minus)
+
+
+def to_tuple(board_state):
+    """Convert a ConnectFourBoard into the 6 x 7 tuple of ints form.
+
+    Args:
+        board_state (ConnectFourBoard or ConnectFourMutableBoard): The board to convert
+
+    Returns:
+        6x7 tuple of ints
+    """
+    plus, minus = board_state.plus, board_state.minus
+    return tuple(_ROW_TUPLES[(plus >> height) & _ROW_MASK | ((minus >> height) & _ROW_MASK) << 1]
+                 for height in _ROW_HEIGHTS)
+
+
+_EMPTY_BOARD = ConnectFourBoard(0, 0, 0)
+_new_object = object.__new__
+
+
+def _new_board():
+    """Return a empty connect 4 board we can use for simulating a game.
+
+    Returns:
+        ConnectFourBoard
+    """
+    return _EMPTY_BOARD
+
+
+def apply_move(board_state, move, side):
+    """Returns a copy of the given board_state with a piece dropped into the column move.
+
+    Args:
+        board_state (ConnectFourBoard): The given board_state we want to apply the move to.
+        move (int): The column we want to drop a piece into, it must not be full.
+        side (int): The side we are making this move for, 1 for the first player, -1 for the second player.
+
+    Returns:
+        (ConnectFourBoard): A copy of the board_state with the given move applied for the given side.
+    """
+    if board_state.__class__ is not ConnectFourBoard:
+        board_state = from_tuple(board_state)
+    plus, minus = board_state.plus, board_state.minus
+    # adding the bottom bit to the column carries up through the pieces already there to the lowest empty square
+    occupied = plus | minus
+    bit = (occupied + _BOTTOM[move]) & _COLUMN_MASKS[move]
+
+    winner = board_state.winner
+    if side > 0:
+        bitboard = plus = plus | bit
+        side = 1
+    else:
+        bitboard = minus = minus | bit
+        side = -1
+    if not winner:
+        # _is_winning written out here, this is called for every node of a search and the call costs as much as a
+        # direction
+        pairs = bitboard & (bitboard >> 1)
+        if pairs & (pairs >> 2):
+            winner = side
+        else:
+            pairs = bitboard & (bitboard >> 7)
+            if pairs & (pairs >> 14):
+                winner = side
+            else:
+                pairs = bitboard & (bitboard >> 6)
+                if pairs & (pairs >> 12):
+                    winner = side
+                else:
+                    pairs = bitboard & (bitboard >> 8)
+                    if pairs & (pairs >> 16):
+                        winner = side
+    # the slots are set directly rather than going through __init__, for the same reason
+    result = _new_object(ConnectFourBoard)
+    result.plus = plus
+    result.minus = minus
+    result.winner = winner
+    return result
+
+
+class ConnectFourMutableBoard(object):
+    def __init__(self, board_state=None):
+        """Connect 4 board that moves are pushed onto and popped off in place, with the same interface as
+        common.mutable_board.MutableBoard. A square is a column, the same as a move, and available is the columns that
+        are not full, center first.
+
+        Args:
+            board_state: Optionally start from this position, a ConnectFourBoard or the tuple form
+        """
+        board_state = _EMPTY_BOARD if board_state is None else from_tuple(board_state)
+        self.plus = board_state.plus
+        self.minus = board_state.minus
+        self.winner = board_state.winner
+        occupied = self.plus | self.minus
+        # the square the next piece dropped into each column lands on, 0 once it is full
+        self._next_bits = [(occupied + _BOTTOM[column]) & _COLUMN_MASKS[column] for column in range(COLUMNS)]
+        self.available = [column for column in _MOVE_ORDER if self._next_bits[column]]
+        # (column, square played, winner before) for each push, so pop can undo it
+        self._pushed = []
+        # where in available each column that was filled by a push was
+        self._filled_positions = []
+
+    @property
+    def hash(self):
+        """The two bitboards side by side, unique to the position, for keying a transposition table"""
+        return self.plus | (self.minus << _MINUS_HASH_SHIFT)
+
+    def push(self, move, side):
+        """Make a move
+
+        Args:
+            move (int): The column to drop a piece into, it must not be full
+            side (int): The side making the move, 1 or -1
+        """
+        self.push_square(move, side)
+
+    def push_square(self, square, side):
+        """The same as push, the square is the column"""
+        next_bits = self._next_bits
+        bit = next_bits[square]
+        next_bits[square] = next_bit = (bit << 1) & _COLUMN_MASKS[square]
+        if not next_bit:
+            position = self.available.index(square)
+            del self.available[position]
+            self._filled_positions.append(position)
+
+        winner = self.winner
+        self._pushed.append((square, bit, winner))
+        if side > 0:
+            self.plus = plus = self.plus | bit
+            if not winner and _is_winning(plus):
+                self.winner = 1
+        else:
+            self.minus = minus = self.minus | bit
+            if not winner and _is_winning(minus):
+                self.winner = -1
+
+    def pop(self):
+        """Take back the last move pushed
+
+        Returns:
+            int: The column taken back
+        """
+        column, bit, self.winner = self._pushed.pop()
+        next_bits = self._next_bits
+        if not next_bits[column]:
+            self.available.insert(self._filled_positions.pop(), column)
+        next_bits[column] = bit
+
+        if self.plus & bit:
+            self.plus ^= bit
+        else:
+            self.minus ^= bit
+        return column
+
+    def move_for_square(self, square):
+        return square
+
+    def available_moves(self):
+        return list(self.available)
+
+    def is_over(self):
+        return self.winner != 0 or not self.available
+
+    def board_state(self):
+        """The position as an immutable ConnectFourBoard"""
+        return ConnectFourBoard(self.plus, self.minus, self.winner)
+
+    def to_tuple(self):
+        return to_tuple(self)
+
+    # indexed the same way as a ConnectFourBoard, which only uses the bitboards
+    __getitem__ = ConnectFourBoard.__getitem__
+    __len__ = ConnectFourBoard.__len__
+    __iter__ = ConnectFourBoard.__iter__
+
+    def __repr__(self):
+        return 'ConnectFourMutableBoard(%r)' % (to_tuple(self),)
+
+
+def available_moves(board_state):
+    """Get all legal moves for the current board_state, every column that is not full.
+
+    Args:
+        board_state: The board_state we want to check for valid moves.
+
+    Returns:
+        tuple of int: All the valid moves that can be played in this position, center columns first.
+    """
+    if board_state.__class__ is not ConnectFourBoard:
+        board_state = from_tuple(board_state)
+    return _AVAILABLE_MOVES[(board_state.plus | board_state.minus) & _TOP_ROW]
+
+
+def has_winner(board_state):
+    """Determine if a player has won on the given board_state.
+
+    Args:
+        board_state (ConnectFourBoard): The current board_state we want to evaluate.
+
+    Returns:
+        int: 1 if player one has won, -1 if player 2 has won, otherwise 0.
+    """
+    if board_state.__class__ is not ConnectFourBoard:
+        board_state = from_tuple(board_state)
+    return board_state.winner
+
+
+def evaluate(board_state):
+    """Get a rough score for how good we think this board position is for the plus_player. Does this based on the
+    number of lines of 4 where a player has 3 pieces and the 4th square is empty.
+
+    Args:
+        board_state (ConnectFourBoard): The board state we are evaluating
+
+    Returns:
+        int: evaluated score for the position for the plus player, posative is good for the plus player, negative good
+            for the minus player
+    """
+    if board_state.__class__ is not ConnectFourBoard:
+        board_state = from_tuple(board_state)
+    plus, minus = board_state.plus, board_state.minus
+    score = 0
+    for line in _LINES:
+        plus_line = plus & line
+        minus_line = minus & line
+        if not minus_line:
+            if plus_line and bin(plus_line).count('1') == 3:
+                score += 1
+        elif not plus_line and bin(minus_line).count('1') == 3:
+            score -= 1
+    return score
+
+
+def random_player(board_state, _):
+    """A player func that can be used in the play_game method. Given a board state it chooses a column randomly from
+    the columns that are not full.
+
+    Args:
+        board_state (ConnectFourBoard): The current state of the board
+        _: the side this player is playing, not used in this function because we are simply choosing the moves randomly
+
+    Returns:
+        int: the column we want to play in on the current board
+    """
+    return random.choice(available_moves(board_state))
+
+
+class ConnectFourGameSpec(BaseGameSpec):
+    def __init__(self):
+        self.available_moves = available_moves
+        self.has_winner = has_winner
+        self.new_board = _new_board
+        self.apply_move = apply_move
+        self.evaluate = evaluate
+
+    def board_dimensions(self):
+        return ROWS, COLUMNS
+
+    def new_mutable_board(self, board_state=None):
+        return ConnectFourMutableBoard(board_state)
+
+    def outputs(self):
+        return COLUMNS
+
+    def flat_move_to_tuple(self, move_index):
+        # a move is already just the column
+        return int(move_index)
+
+    def tuple_move_to_flat(self, tuple_move):
+        return tuple_move
+
+    def get_random_player_func(self):
+        return random_player
+
+
+if __name__ == '__main__':
+    # example of playing a game of connect 4 between random players
+    game_spec = ConnectFourGameSpec()
+    print(game_spec.play_game(random_player, random_player, log=True))
@@ -1,40 +1,53 @@
-import functools
 import collections
 import os
 import random
 import numpy as np
-import tensorflow as tf
 
 from games.tic_tac_toe import TicTacToeGameSpec, human_player
-from common.network_helpers import load_network, get_stochastic_network_move,create_network
+from common.policy_network import PolicyNetwork
 
 def human_vs_ai() :
     NETWORK_FILE_PATH ='current_network.p' #保存数据的位置
     RANDOMIZE_FIRST_PLAYER=True     #是否随机先手
+    MOVE_SERVER_PORT = None    #port of a local common.move_server to get the AI's moves from, None to load the network here
 
     game_spec = TicTacToeGameSpec()
-    create_network_func = functools.partial(create_network, game_spec.board_squares(), (100, 100, 100))
-
-    input_layer, output_layer, variables = create_network_func()
-
-    with tf.Session() as session:
-        session.run(tf.global_variables_initializer())
-        if NETWORK_FILE_PATH and os.path.isfile(NETWORK_FILE_PATH):
-            print("loading pre-existing network")
-            load_network(session, variables, NETWORK_FILE_PATH)
-
-        mini_batch_board_states, mini_batch_moves = [], []
-
-        def make_training_move(board_state, side):
-            mini_batch_board_states.append(np.ravel(board_state) * side)
-            move = get_stochastic_network_move(session, input_layer, output_layer, board_state, side)
-            mini_batch_moves.append(move)
-            return game_spec.flat_move_to_tuple(move.argmax())
-        
-        if (not RANDOMIZE_FIRST_PLAYER) or bool(random.getrandbits(1)):
-            game_spec.play_game(make_training_move, human_player,log=False)
-        else:
-            game_spec.play_game(human_player, make_training_move,log=False)
+
+    ai_player = _move_server_player(MOVE_SERVER_PORT) if MOVE_SERVER_PORT else None
+    if ai_player is not None:
+        network = None
+    elif NETWORK_FILE_PATH and os.path.isfile(NETWORK_FILE_PATH):
+        print("loading pre-existing network")
+        network = PolicyNetwork.load(NETWORK_FILE_PATH)
+    else:
+        network = PolicyNetwork.create(game_spec.board_squares(), (100, 100, 100))
+
+    mini_batch_board_states, mini_batch_moves = [], []
+
+    def make_training_move(board_state, side):
+        mini_batch_board_states.append(np.ravel(board_state) * side)
+        move = network.get_stochastic_network_move(board_state, side)
+        mini_batch_moves.append(move)
+        return game_spec.flat_move_to_tuple(move.argmax())
+
+    ai_player = ai_player or make_training_move
+    if (not RANDOMIZE_FIRST_PLAYER) or bool(random.getrandbits(1)):
+        game_spec.play_game(ai_player, human_player,log=False)
+    else:
+        game_spec.play_game(human_player, ai_player,log=False)
+
+
+def _move_server_player(port):
+    """Player func getting the AI's moves from the network on a common.move_server, None if it can't be reached"""
+    from common.move_server import MoveClient
+
+    try:
+        move_client = MoveClient(port=port, timeout=5.)
+    except OSError as ex:
+        print("can't reach the move server, loading the network here. %s" % ex)
+        return None
+    print("getting moves from the move server on port %s" % port)
+    return move_client.player_func('network')
 
 if __name__ == '__main__':
     # example of playing a game
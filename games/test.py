@@ -1,3 +1,6 @@
+import numpy as np
+
+
 def State_to_Str(board_state):
     result = ""
     for i in range(3):
@@ -10,102 +13,85 @@ def Str_to_State(board_string):
                 (2 if int(s[3]) == 2 else int(s[3]),2 if int(s[4]) == 2 else int(s[4]),2 if int(s[5]) == 2 else int(s[5])),
                 (2 if int(s[6]) == 2 else int(s[6]),2 if int(s[7]) == 2 else int(s[7]),2 if int(s[8]) == 2 else int(s[8])))
     return result
-def simpleAI(net,side):
-    #0 means null;1 means X;2 means O;
-    str1 = State_to_Str(net)
-    for i in range(9):
-        if(side == -1):
-            if(str1[i] == '2'):
-                str1[i] == '1'
-            if(str1[i] == '1'):
-                str1[i] == '2'
-    net = Str_to_State(str1)
-    level = [[0,0,0],[0,0,0],[0,0,0]]
-    o2=10000#一个己方活二权值
-    x2=1000#一个对方活二权值
-    x=10#一个对方活一权值
-    o=6#一个己方活一权值
-    nothing = 4#一个空行权值
 
-    for i in range(3):
-        for j in range(3):
-            if(net[i][j]!=0):
-                 level[i][j]=0
-            else:
-                 #自己活二,,220
-                if(((net[0][j]+net[1][j]+net[2][j])==4) and (net[0][j]*net[1][j]*net[2][j])==0 and ((net[0][j]-1)*(net[1][j]-1)*(net[2][j]-1))==-1):
-                    level[i][j]=level[i][j]+o2
-                if(((net[i][0]+net[i][1]+net[i][2])==4) and (net[i][0]*net[i][1]*net[i][2])==0 and ((net[i][0]-1)*(net[i][1]-1)*(net[i][2]-1))==-1):
-                    level[i][j]=level[i][j]+o2
-                #对方活二，110
-                if(((net[0][j]+net[1][j]+net[2][j])==2) and (net[0][j]*net[1][j]*net[2][j])==0 and ((net[0][j]-1)*(net[1][j]-1)*(net[2][j]-1))==0):
-                    level[i][j]=level[i][j]+x2
-                if(((net[i][0]+net[i][1]+net[i][2])==2) and (net[i][0]*net[i][1]*net[i][2])==0 and ((net[i][0]-1)*(net[i][1]-1)*(net[i][2]-1))==0):
-                    level[i][j]=level[i][j]+x2
-                #单个X，100
-                if(((net[0][j]+net[1][j]+net[2][j])==1) and (net[0][j]*net[1][j]*net[2][j])==0 and ((net[0][j]-1)*(net[1][j]-1)*(net[2][j]-1))==0):
-                    level[i][j]=level[i][j]+x
-                if(((net[i][0]+net[i][1]+net[i][2])==1)and(net[i][0]*net[i][1]*net[i][2])==0 and ((net[i][0]-1)*(net[i][1]-1)*(net[i][2]-1))==0):
-                    level[i][j]=level[i][j]+x
-                #单个O，200
-                if(((net[0][j]+net[1][j]+net[2][j])==2)and(net[0][j]*net[1][j]*net[2][j])==0 and((net[0][j]-1)*(net[1][j]-1)*(net[2][j]-1))==1):
-                    level[i][j]=level[i][j]+o
-                if(((net[i][0]+net[i][1]+net[i][2])==2)and(net[i][0]*net[i][1]*net[i][2])==0 and((net[i][0]-1)*(net[i][1]-1)*(net[i][2]-1))==1):
-                    level[i][j]=level[i][j]+o
-                #空行，000
-                if(((net[0][j]+net[1][j]+net[2][j])==0)and(net[0][j]*net[1][j]*net[2][j])==0 and((net[0][j]-1)*(net[1][j]-1)*(net[2][j]-1))==-1):
-                    level[i][j]=level[i][j]+nothing
-                if(((net[i][0]+net[i][1]+net[i][2])==0)and(net[i][0]*net[i][1]*net[i][2])==0 and ((net[i][0]-1)*(net[i][1]-1)*(net[i][2]-1))==-1):
-                    level[i][j]=level[i][j]+nothing
-            
-                #分情况 主对角线
-                if((i==0 and j==0)or(i==2 and j==2)or(i==1 and j==1)):
-                    #己方活二
-                    if(((net[0][0]+net[1][1]+net[2][2])==4)and(net[0][0]*net[1][1]*net[2][2])==0 and((net[0][0]-1)*(net[1][1]-1)*(net[2][2]-1))==-1):
-                        level[i][j]=level[i][j]+o2
-                    #对方活二
-                    if(((net[0][0]+net[1][1]+net[2][2])==2)and(net[0][0]*net[1][1]*net[2][2])==0 and((net[0][0]-1)*(net[1][1]-1)*(net[2][2]-1))==0):
-                        level[i][j]=level[i][j]+x2
-                    #单个X
-                    if(((net[0][0]+net[1][1]+net[2][2])==1)and(net[0][0]*net[1][1]*net[2][2])==0 and((net[0][0]-1)*(net[1][1]-1)*(net[2][2]-1))==0):
-                        level[i][j]=level[i][j]+x
-                    #单个O
-                    if(((net[0][0]+net[1][1]+net[2][2])==2) and(net[0][0]*net[1][1]*net[2][2])==0 and((net[0][0]-1)*(net[1][1]-1)*(net[2][2]-1))==1):
-                        level[i][j]=level[i][j]+o
-                    #空行，000
-                    if(((net[0][0]+net[1][1]+net[2][2])==0) and(net[0][0]*net[1][1]*net[2][2])==0 and((net[0][0]-1)*(net[1][1]-1)*(net[2][2]-1))==-1):
-                        level[i][j]=level[i][j]+nothing
-            
-                #副对角线
-                if((i==0 and j==2)or(i==2 and j==0)or(i==1 and j==1)):
-                    #己方活二
-                    if(((net[0][2]+net[1][1]+net[2][0])==4) and(net[0][2]*net[1][1]*net[2][0])==0 and((net[0][2]-1)*(net[1][1]-1)*(net[2][0]-1))==-1):
-                        level[i][j]=level[i][j]+o2
-                    #对方活二
-                    if(((net[0][2]+net[1][1]+net[2][0])==2) and(net[0][2]*net[1][1]*net[2][0])==0 and((net[0][2]-1)*(net[1][1]-1)*(net[2][0]-1))==0):
-                        level[i][j]=level[i][j]+x2
-                    #单个X
-                    if(((net[0][2]+net[1][1]+net[2][0])==1) and(net[0][2]*net[1][1]*net[2][0])==0 and((net[0][2]-1)*(net[1][1]-1)*(net[2][0]-1))==0):
-                        level[i][j]=level[i][j]+x
-                    #单个O
-                    if(((net[0][2]+net[1][1]+net[2][0])==2) and(net[0][2]*net[1][1]*net[2][0])==0 and((net[0][2]-1)*(net[1][1]-1)*(net[2][0]-1))==1):
-                        level[i][j]=level[i][j]+o
-                    #空行，000
-                    if(((net[0][2]+net[1][1]+net[2][0])==0) and(net[0][2]*net[1][1]*net[2][0])==0 and((net[0][2]-1)*(net[1][1]-1)*(net[2][0]-1))==-1):
-                        level[i][j]=level[i][j]+nothing
 
+# simpleAI scores each empty square by adding up a weight for every line (row, column or diagonal) through it. The
+# weight only depends on what is in the line, so it is looked up by the line code: the number of 1s in the line plus 4
+# times the number of -1s. Like the original string version, 1 is always treated as the opponent and -1 as ourselves.
+_o2 = 10000  # 一个己方活二权值
+_x2 = 1000  # 一个对方活二权值
+_x = 10  # 一个对方活一权值
+_o = 6  # 一个己方活一权值
+_nothing = 4  # 一个空行权值
+
+_LINE_WEIGHTS = [0] * 16
+_LINE_WEIGHTS[0 + 4 * 0] = _nothing  # 空行，000
+_LINE_WEIGHTS[1 + 4 * 0] = _x  # 单个X，100
+_LINE_WEIGHTS[0 + 4 * 1] = _o  # 单个O，200
+_LINE_WEIGHTS[2 + 4 * 0] = _x2  # 对方活二，110
+_LINE_WEIGHTS[0 + 4 * 2] = _o2  # 自己活二，220
 
+_LINES = ((0, 1, 2), (3, 4, 5), (6, 7, 8),  # rows
+          (0, 3, 6), (1, 4, 7), (2, 5, 8),  # columns
+          (0, 4, 8), (2, 4, 6))  # diagonals
+
+# the lines through each square, by flat square index
+_SQUARE_LINES = tuple(tuple(line_index for line_index, line in enumerate(_LINES) if square in line)
+                      for square in range(9))
+
+_CELL_CODES = {0: 0, 1: 1, -1: 4}
+
+
+def simpleAI(net,side):
+    """Heuristic player func, given a board state it plays the empty square with the highest score from the line
+    weights above.
+
+    Args:
+        net (3x3 tuple of int): The current state of the board
+        side: the side this player is playing, not used, -1 is always treated as this player
+
+    Returns:
+        (int, int): the move we want to play on the current board
+    """
+    cells = [_CELL_CODES[square] for row in net for square in row]
+    line_weights = [_LINE_WEIGHTS[cells[a] + cells[b] + cells[c]] for a, b, c in _LINES]
 
     #寻找最大权值的位置
-    maxi = 0
-    maxj = 0
-    temp = 0
-    for i in range(3):
-        for j in range(3):
-            if(level[i][j]>temp):
-                temp=level[i][j]
-                maxi=i
-                maxj=j
-    move = (maxi,maxj)
+    best_square = 0
+    best_level = 0
+    for square in range(9):
+        if cells[square] == 0:
+            level = 0
+            for line_index in _SQUARE_LINES[square]:
+                level += line_weights[line_index]
+            if level > best_level:
+                best_level = level
+                best_square = square
+
+    return (best_square // 3, best_square % 3)
+
+
+_NP_LINES = np.array(_LINES)
+_NP_LINE_WEIGHTS = np.array(_LINE_WEIGHTS)
+# _NP_SQUARE_LINES[line, square] is 1 if the square is on the line
+_NP_SQUARE_LINES = np.zeros((len(_LINES), 9), dtype=np.int64)
+for _line_index, _line in enumerate(_LINES):
+    _NP_SQUARE_LINES[_line_index, list(_line)] = 1
+
+
+def simpleAI_batch(board_states, side=None):
+    """simpleAI for a batch of boards at once, chooses the same moves as calling simpleAI on each board.
+
+    Args:
+        board_states (np.array): Of shape (number of boards, 9) or (number of boards, 3, 3)
+        side: the side this player is playing, not used, -1 is always treated as this player
 
-    return move
+    Returns:
+        np.array of int: The flat index of the move for each board, as used by tuple_move_to_flat
+    """
+    board_states = np.asarray(board_states).reshape(-1, 9)
+    cell_codes = (board_states == 1) + 4 * (board_states == -1)
+    line_weights = _NP_LINE_WEIGHTS[cell_codes[:, _NP_LINES].sum(axis=2)]
+    levels = line_weights.dot(_NP_SQUARE_LINES) * (board_states == 0)
+    # argmax takes the first of any ties like simpleAI, and a board where no square scores gets square 0 in both
+    return levels.argmax(axis=1)
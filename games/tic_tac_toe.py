@@ -99,6 +99,18 @@ def has_winner(board_state):
     return 0,""  # no one has won, return 0 for a draw
 
 
+def _winner(board_state):
+    """The winner on the given board_state without the winning line, as BaseGameSpec.has_winner returns it.
+
+    Args:
+        board_state (3x3 tuple of int): The current board_state we want to evaluate.
+
+    Returns:
+        int: 1 if player one has won, -1 if player 2 has won, otherwise 0.
+    """
+    return has_winner(board_state)[0]
+
+
 def play_game(plus_player_func, minus_player_func, log=False):
     """Run a single game of tic-tac-toe until the end, using the provided function args to determine the moves for each
     player.
@@ -191,7 +203,8 @@ def human_player(board_state, _):
 class TicTacToeGameSpec(BaseGameSpec):
     def __init__(self):
         self.available_moves = available_moves
-        self.has_winner = has_winner
+        # has_winner also gives the winning line, which the GUI draws, the game spec only gives the winner
+        self.has_winner = _winner
         self.new_board = _new_board
         self.apply_move = apply_move
         self.evaluate = evaluate
@@ -0,0 +1,345 @@
+"""
+Bitboard version of the 3 by 3 tic-tac-toe game in tic_tac_toe_for_train.py, the rules and the functions are the same
+but it runs several times faster.
+
+Each side is stored as a 9 bit integer mask, bit x * 3 + y is set if that side has played on square (x, y). Checking for
+a winner is a single lookup into a table built from the 8 winning masks, and the available moves for every possible set
+of occupied squares are also precomputed.
+
+The board is a BitBoard object. It can be indexed and iterated in the same way as the 3 x 3 tuple of ints used by the
+other tic-tac-toe modules, so np.array(board_state), board_state[x][y] and the network helpers all keep working. Every
+function in this module also accepts the tuple form, use from_tuple and to_tuple to convert between the two.
+
+For search code that makes and takes back moves in place, MutableBitBoard has the same interface as
+common.mutable_board.MutableBoard, get one with TicTacToeBitboardGameSpec.new_mutable_board.
+"""
+import random
+
+from common.base_game_spec import BaseGameSpec
+
+_WINNING_MASKS = (0b000000111, 0b000111000, 0b111000000,  # rows
+                  0b001001001, 0b010010010, 0b100100100,  # columns
+                  0b100010001, 0b001010100)  # diagonals
+
+_ALL_SQUARES = 0b111111111
+
+# _IS_WINNING[mask] is True if the squares in mask contain 3 in a line
+_IS_WINNING = tuple(any(mask & line == line for line in _WINNING_MASKS) for mask in range(_ALL_SQUARES + 1))
+
+# _AVAILABLE_MOVES[occupied] is the tuple of free squares, in the same order tic_tac_toe_for_train.available_moves uses
+_AVAILABLE_MOVES = tuple(tuple((i // 3, i % 3) for i in range(9) if not occupied & (1 << i))
+                         for occupied in range(_ALL_SQUARES + 1))
+
+_MOVE_BITS = {(i // 3, i % 3): 1 << i for i in range(9)}
+
+# _SQUARE_MOVES[square] is the (x, y) move for the flat index x * 3 + y, which is also the square's bit
+_SQUARE_MOVES = tuple((i // 3, i % 3) for i in range(9))
+
+# _ROWS[plus_bits | minus_bits << 3] is the tuple for a row given the 3 bits of that row for each side
+_ROWS = tuple(tuple(1 if plus_bits & (1 << y) else -1 if minus_bits & (1 << y) else 0 for y in range(3))
+              for minus_bits in range(8) for plus_bits in range(8))
+
+_POPCOUNT = tuple(bin(mask).count('1') for mask in range(_ALL_SQUARES + 1))
+
+
+class BitBoard(object):
+    """Immutable tic-tac-toe board made of a 9 bit mask for each side.
+
+    Behaves like the 3 x 3 tuple of ints used for boards elsewhere, board_state[x][y] gives 1, -1 or 0.
+    """
+    __slots__ = ('plus', 'minus')
+
+    def __init__(self, plus=0, minus=0):
+        self.plus = plus
+        self.minus = minus
+
+    def __getitem__(self, x):
+        if x < 0:
+            x += 3
+        if not 0 <= x < 3:
+            raise IndexError('board row index out of range')
+        shift = x * 3
+        return _ROWS[(self.plus >> shift) & 7 | ((self.minus >> shift) & 7) << 3]
+
+    def __len__(self):
+        return 3
+
+    def __iter__(self):
+        plus, minus = self.plus, self.minus
+        for shift in (0, 3, 6):
+            yield _ROWS[(plus >> shift) & 7 | ((minus >> shift) & 7) << 3]
+
+    def __eq__(self, other):
+        if isinstance(other, BitBoard):
+            return self.plus == other.plus and self.minus == other.minus
+        try:
+            return to_tuple(self) == tuple(tuple(row) for row in other)
+        except TypeError:
+            return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        # must match the hash of the equivalent tuple because the two compare equal
+        return hash(to_tuple(self))
+
+    def __repr__(self):
+        return 'BitBoard(%r)' % (to_tuple(self),)
+
+
+def from_tuple(board_state):
+    """Convert a board in the 3 x 3 tuple of ints form into a BitBoard.
+
+    Args:
+        board_state (3x3 tuple of int, BitBoard or MutableBitBoard): The board to convert, a BitBoard is returned
+            unchanged
+
+    Returns:
+        BitBoard
+    """
+    if board_state.__class__ is BitBoard:
+        return board_state
+    if board_state.__class__ is MutableBitBoard:
+        return board_state.board_state()
+    plus = minus = 0
+    for x in range(3):
+        row = board_state[x]
+        for y in range(3):
+            if row[y] == 1:
+                plus |= 1 << (x * 3 + y)
+            elif row[y] == -1:
+                minus |= 1 << (x * 3 + y)
+    return BitBoard(plus, minus)
+
+
+def to_tuple(board_state):
+    """Convert a BitBoard into the 3 x 3 tuple of ints form used by the other tic-tac-toe modules.
+
+    Args:
+        board_state (BitBoard): The board to convert
+
+    Returns:
+        3x3 tuple of ints
+    """
+    return tuple(board_state)
+
+
+def _new_board():
+    """Return a empty tic-tac-toe board we can use for simulating a game.
+
+    Returns:
+        BitBoard
+    """
+    return _EMPTY_BOARD
+
+
+_EMPTY_BOARD = BitBoard(0, 0)
+
+
+def apply_move(board_state, move, side):
+    """Returns a copy of the given board_state with the desired move applied.
+
+    Args:
+        board_state (BitBoard): The given board_state we want to apply the move to.
+        move (int, int): The position we want to make the move in.
+        side (int): The side we are making this move for, 1 for the first player, -1 for the second player.
+
+    Returns:
+        (BitBoard): A copy of the board_state with the given move applied for the given side.
+    """
+    if board_state.__class__ is not BitBoard:
+        board_state = from_tuple(board_state)
+    try:
+        bit = _MOVE_BITS[move]
+    except (KeyError, TypeError):
+        move_x, move_y = move
+        bit = 1 << (move_x * 3 + move_y)
+
+    if side > 0:
+        return BitBoard(board_state.plus | bit, board_state.minus & ~bit)
+    return BitBoard(board_state.plus & ~bit, board_state.minus | bit)
+
+
+class MutableBitBoard(object):
+    def __init__(self, board_state=None):
+        """Tic-tac-toe board that moves are pushed onto and popped off in place, with the same interface as
+        common.mutable_board.MutableBoard. A square is the flat index x * 3 + y, which is also the bit for that square,
+        so the winner after each push is one lookup into _IS_WINNING.
+
+        Args:
+            board_state: Optionally start from this position, a BitBoard or the tuple form
+        """
+        board_state = _EMPTY_BOARD if board_state is None else from_tuple(board_state)
+        self.plus = board_state.plus
+        self.minus = board_state.minus
+        self.winner = has_winner(board_state)
+        occupied = self.plus | self.minus
+        self.available = [square for square in range(9) if not occupied & (1 << square)]
+        # (square, where it was in available, plus, minus and winner before) for each push, so pop can undo it
+        self._pushed = []
+
+    @property
+    def hash(self):
+        """The two bitboards side by side, unique to the position, for keying a transposition table"""
+        return self.plus | (self.minus << 9)
+
+    def push(self, move, side):
+        """Make a move
+
+        Args:
+            move ((int, int)): The square to play on, it must be empty
+            side (int): The side making the move, 1 or -1
+        """
+        self.push_square(move[0] * 3 + move[1], side)
+
+    def push_square(self, square, side):
+        """Make a move given as a flat index, see push"""
+        # deleted and inserted back at the same place rather than swapped with the last entry as MutableBoard does,
+        # the list is at most 9 long so both are single fast list operations
+        available = self.available
+        position = available.index(square)
+        del available[position]
+
+        winner = self.winner
+        self._pushed.append((square, position, self.plus, self.minus, winner))
+        if side > 0:
+            self.plus = plus = self.plus | (1 << square)
+            if not winner and _IS_WINNING[plus]:
+                self.winner = 1
+        else:
+            self.minus = minus = self.minus | (1 << square)
+            if not winner and _IS_WINNING[minus]:
+                self.winner = -1
+
+    def pop(self):
+        """Take back the last move pushed
+
+        Returns:
+            (int, int): The move taken back
+        """
+        square, position, self.plus, self.minus, self.winner = self._pushed.pop()
+        self.available.insert(position, square)
+        return _SQUARE_MOVES[square]
+
+    def move_for_square(self, square):
+        """The (x, y) move for a flat index"""
+        return _SQUARE_MOVES[square]
+
+    def available_moves(self):
+        """The empty squares as (x, y) moves
+
+        Returns:
+            list of (int, int)
+        """
+        return [_SQUARE_MOVES[square] for square in self.available]
+
+    def is_over(self):
+        return self.winner != 0 or not self.available
+
+    def board_state(self):
+        """The position as an immutable BitBoard"""
+        return BitBoard(self.plus, self.minus)
+
+    def to_tuple(self):
+        return to_tuple(self)
+
+    # indexed the same way as a BitBoard, which only uses the bitboards
+    __getitem__ = BitBoard.__getitem__
+    __len__ = BitBoard.__len__
+    __iter__ = BitBoard.__iter__
+
+    def __repr__(self):
+        return 'MutableBitBoard(%r)' % (to_tuple(self),)
+
+
+def available_moves(board_state):
+    """Get all legal moves for the current board_state. For Tic-tac-toe that is all positions that do not currently have
+    pieces played.
+
+    Args:
+        board_state: The board_state we want to check for valid moves.
+
+    Returns:
+        tuple of (int, int): All the valid moves that can be played in this position.
+    """
+    if board_state.__class__ is not BitBoard:
+        board_state = from_tuple(board_state)
+    return _AVAILABLE_MOVES[board_state.plus | board_state.minus]
+
+
+def has_winner(board_state):
+    """Determine if a player has won on the given board_state.
+
+    Args:
+        board_state (BitBoard): The current board_state we want to evaluate.
+
+    Returns:
+        int: 1 if player one has won, -1 if player 2 has won, otherwise 0.
+    """
+    if board_state.__class__ is not BitBoard:
+        board_state = from_tuple(board_state)
+    if _IS_WINNING[board_state.plus]:
+        return 1
+    if _IS_WINNING[board_state.minus]:
+        return -1
+    return 0
+
+
+def evaluate(board_state):
+    """Get a rough score for how good we think this board position is for the plus_player. Does this based on number of
+    2 in row lines we have, giving the same scores as techniques.min_max.evaluate.
+
+    Args:
+        board_state (BitBoard): The board state we are evaluating
+
+    Returns:
+        int: evaluated score for the position for the plus player, posative is good for the plus player, negative good
+            for the minus player
+    """
+    if board_state.__class__ is not BitBoard:
+        board_state = from_tuple(board_state)
+    plus, minus = board_state.plus, board_state.minus
+    score = 0
+    for line in _WINNING_MASKS:
+        plus_line = plus & line
+        minus_line = minus & line
+        if not minus_line:
+            if _POPCOUNT[plus_line] == 2:
+                score += 1
+        elif not plus_line and _POPCOUNT[minus_line] == 2:
+            score -= 1
+    return score
+
+
+def random_player(board_state, _):
+    """A player func that can be used in the play_game method. Given a board state it chooses a move randomly from the
+    valid moves in the current state.
+
+    Args:
+        board_state (BitBoard): The current state of the board
+        _: the side this player is playing, not used in this function because we are simply choosing the moves randomly
+
+    Returns:
+        (int, int): the move we want to play on the current board
+    """
+    return random.choice(available_moves(board_state))
+
+
+class TicTacToeBitboardGameSpec(BaseGameSpec):
+    def __init__(self):
+        self.available_moves = available_moves
+        self.has_winner = has_winner
+        self.new_board = _new_board
+        self.apply_move = apply_move
+        self.evaluate = evaluate
+
+    def board_dimensions(self):
+        return 3, 3
+
+    def new_mutable_board(self, board_state=None):
+        return MutableBitBoard(board_state)
+
+    def get_random_player_func(self):
+        return random_player
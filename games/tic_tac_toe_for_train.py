@@ -14,6 +14,7 @@ import random
 import time
 
 from common.base_game_spec import BaseGameSpec
+from common.mutable_board import MutableBoard
 from techniques.min_max import evaluate
 
 
@@ -199,6 +200,9 @@ class TicTacToeGameSpec(BaseGameSpec):
     def board_dimensions(self):
         return 3, 3
 
+    def new_mutable_board(self, board_state=None):
+        return MutableBoard((3, 3), 3, board_state)
+
 
 if __name__ == '__main__':
     # example of playing a game
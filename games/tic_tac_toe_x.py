@@ -0,0 +1,242 @@
+"""
+Tic-tac-toe on a board of any size, where the first player to get winning_length in a row, including diagonals, wins.
+e.g. TicTacToeXGameSpec(3, 3) is normal tic-tac-toe and TicTacToeXGameSpec(15, 5) is gomoku.
+
+The board is a tuple of rows of ints, the same as the 3 x 3 tuple used in tic_tac_toe_for_train.py: 0 means no player has
+played in a space, 1 means player one has played there, -1 the second player. The boards returned by new_board and
+apply_move are Board objects, a subclass of tuple that also remembers the last move, the winner and the moves still
+available. So apply_move only has to check the lines through the move that was just made for a winner, which takes
+O(winning_length) time rather than scanning the whole board, and available_moves does not need to scan the board at all.
+
+Every function also accepts a plain tuple of tuples, in which case the board is scanned once to work these out.
+"""
+import random
+
+from common.base_game_spec import BaseGameSpec
+from common.mutable_board import MutableBoard
+
+_DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+class Board(tuple):
+    """A board state, a tuple of rows of ints, along with what apply_move worked out about it.
+
+    Attributes:
+        available ((int, int) tuple): The empty squares, in the order available_moves returns them
+        last_move ((int, int)): The move that led to this board, None for a new board
+        winner (int): 1 if player one has won, -1 if player 2 has won, otherwise 0
+    """
+
+    def __new__(cls, rows, available, last_move=None, winner=0):
+        board = tuple.__new__(cls, rows)
+        board.available = available
+        board.last_move = last_move
+        board.winner = winner
+        return board
+
+    def __reduce__(self):
+        return Board, (tuple(self), self.available, self.last_move, self.winner)
+
+
+def winning_lines(board_dimensions, winning_length):
+    """Get every line of winning_length squares on the board
+
+    Args:
+        board_dimensions ((int, int)): The number of rows and columns of the board
+        winning_length (int): How many in a row is needed to win
+
+    Returns:
+        tuple of tuple of (int, int): The squares in each line
+    """
+    rows, columns = board_dimensions
+    lines = []
+    for x in range(rows):
+        for y in range(columns):
+            for dx, dy in _DIRECTIONS:
+                end_x, end_y = x + dx * (winning_length - 1), y + dy * (winning_length - 1)
+                if 0 <= end_x < rows and 0 <= end_y < columns:
+                    lines.append(tuple((x + dx * i, y + dy * i) for i in range(winning_length)))
+    return tuple(lines)
+
+
+def _new_board(board_dimensions):
+    """Return a empty board we can use for simulating a game.
+
+    Args:
+        board_dimensions ((int, int)): The number of rows and columns of the board
+
+    Returns:
+        Board
+    """
+    rows, columns = board_dimensions
+    return Board(((0,) * columns,) * rows, tuple((x, y) for x in range(rows) for y in range(columns)))
+
+
+def from_tuple(board_state, winning_length):
+    """Convert a tuple of rows of ints to a Board, scanning it for the available moves and the winner.
+
+    Args:
+        board_state (tuple of tuple of int): The board state
+        winning_length (int): How many in a row is needed to win
+
+    Returns:
+        Board
+    """
+    if isinstance(board_state, Board):
+        return board_state
+    rows = tuple(tuple(row) for row in board_state)
+    available = tuple((x, y) for x, row in enumerate(rows) for y, square in enumerate(row) if square == 0)
+    winner = 0
+    for line in winning_lines((len(rows), len(rows[0])), winning_length):
+        first = rows[line[0][0]][line[0][1]]
+        if first != 0 and all(rows[x][y] == first for x, y in line):
+            winner = first
+            break
+    return Board(rows, available, winner=winner)
+
+
+def _is_winning_move(rows, move, side, winning_length):
+    # count the pieces in a row through the move in each direction, stopping once we have enough
+    move_x, move_y = move
+    number_of_rows, number_of_columns = len(rows), len(rows[0])
+    for dx, dy in _DIRECTIONS:
+        count = 1
+        for sign in (1, -1):
+            x, y = move_x + dx * sign, move_y + dy * sign
+            while count < winning_length and 0 <= x < number_of_rows and 0 <= y < number_of_columns and \
+                    rows[x][y] == side:
+                count += 1
+                x += dx * sign
+                y += dy * sign
+        if count >= winning_length:
+            return True
+    return False
+
+
+def apply_move(board_state, move, side, winning_length):
+    """Returns a copy of the given board_state with the desired move applied.
+
+    Args:
+        board_state (Board): The given board_state we want to apply the move to.
+        move (int, int): The position we want to make the move in.
+        side (int): The side we are making this move for, 1 for the first player, -1 for the second player.
+        winning_length (int): How many in a row is needed to win
+
+    Returns:
+        Board: A copy of the board_state with the given move applied for the given side.
+    """
+    board_state = from_tuple(board_state, winning_length)
+    move_x, move_y = move
+    row = board_state[move_x]
+    rows = board_state[:move_x] + (row[:move_y] + (side,) + row[move_y + 1:],) + board_state[move_x + 1:]
+
+    available = board_state.available
+    index = available.index(move)
+    available = available[:index] + available[index + 1:]
+
+    winner = board_state.winner
+    if winner == 0 and _is_winning_move(rows, move, side, winning_length):
+        winner = side
+    return Board(rows, available, move, winner)
+
+
+def available_moves(board_state, winning_length):
+    """Get all legal moves for the current board_state, all positions that do not currently have pieces played.
+
+    Args:
+        board_state (Board): The board_state we want to check for valid moves.
+        winning_length (int): How many in a row is needed to win
+
+    Returns:
+        tuple of (int, int): All the valid moves that can be played in this position.
+    """
+    return from_tuple(board_state, winning_length).available
+
+
+def has_winner(board_state, winning_length):
+    """Determine if a player has won on the given board_state.
+
+    Args:
+        board_state (Board): The current board_state we want to evaluate.
+        winning_length (int): How many in a row is needed to win
+
+    Returns:
+        int: 1 if player one has won, -1 if player 2 has won, otherwise 0.
+    """
+    return from_tuple(board_state, winning_length).winner
+
+
+def evaluate(board_state, lines):
+    """Get a rough score for how good we think this board position is for the plus_player. Does this based on the
+    number of lines one move away from being a win for a player.
+
+    Args:
+        board_state (tuple of tuple of int): The board state we are evaluating
+        lines: The winning lines of the board, from winning_lines
+
+    Returns:
+        int: evaluated score for the position for the plus player, posative is good for the plus player, negative good
+            for the minus player
+    """
+    score = 0
+    for line in lines:
+        total = 0
+        pieces = 0
+        for x, y in line:
+            square = board_state[x][y]
+            if square != 0:
+                total += square
+                pieces += 1
+        if pieces == len(line) - 1 and abs(total) == pieces:
+            score += 1 if total > 0 else -1
+    return score
+
+
+class TicTacToeXGameSpec(BaseGameSpec):
+    def __init__(self, board_size, winning_length):
+        """Tic-tac-toe on any size of board
+
+        Args:
+            board_size (int or (int, int)): The number of rows and columns of the board, an int for a square board
+            winning_length (int): How many in a row is needed to win
+        """
+        if isinstance(board_size, int):
+            board_size = (board_size, board_size)
+        self._board_dimensions = tuple(board_size)
+        self._winning_length = winning_length
+        if winning_length > max(self._board_dimensions):
+            raise ValueError("Can not get %s in a row on a %sx%s board" % ((winning_length,) + self._board_dimensions))
+        self._lines = winning_lines(self._board_dimensions, winning_length)
+
+    def new_board(self):
+        return _new_board(self._board_dimensions)
+
+    def apply_move(self, board_state, move, side):
+        return apply_move(board_state, move, side, self._winning_length)
+
+    def available_moves(self, board_state):
+        return available_moves(board_state, self._winning_length)
+
+    def has_winner(self, board_state):
+        return has_winner(board_state, self._winning_length)
+
+    def evaluate(self, board_state):
+        return evaluate(board_state, self._lines)
+
+    def board_dimensions(self):
+        return self._board_dimensions
+
+    def winning_length(self):
+        return self._winning_length
+
+    def new_mutable_board(self, board_state=None):
+        return MutableBoard(self._board_dimensions, self._winning_length, board_state)
+
+    def get_random_player_func(self):
+        return lambda board_state, side: random.choice(self.available_moves(board_state))
+
+
+if __name__ == '__main__':
+    # example of playing a game of gomoku between random players
+    game_spec = TicTacToeXGameSpec(15, 5)
+    print(game_spec.play_game(game_spec.get_random_player_func(), game_spec.get_random_player_func(), log=True))
@@ -8,19 +8,17 @@ from tkinter import messagebox
 import webbrowser
 # Import multi-threading module
 import threading
+import queue
 import time
-# Import socket
-import socket
 import random
 import functools
 import collections
 import os
-import numpy as np
-import tensorflow as tf
 
+# The network, and NumPy, are imported by EngineLoader in the background so 
+# the welcome scene can be shown straight away
 from games.tic_tac_toe import TicTacToeGameSpec, human_player,available_moves,apply_move,has_winner
-from common.network_helpers import load_network, get_stochastic_network_move,create_network
-from games.test import simpleAI
+from common.game_record import GameRecordWriter
 
 
 # Constants 
@@ -31,6 +29,16 @@ C_WINDOW_MIN_HEIGHT = 360
 C_COLOR_BLUE_LIGHT = "#e4f1fe"
 C_COLOR_BLUE_DARK = "#304e62"
 C_COLOR_BLUE = "#a8d4f2"
+C_NETWORK_FILE_PATH = 'current_network.p' #保存数据的位置
+C_NETWORK_HIDDEN_NODES = (100, 100, 100)
+C_AI_POLL_MS = 20 # How often to check if the AI has finished thinking
+C_AI_PONDER = True # Let the AI think about its replies during the human's turn
+C_PIECE_PADDING = 0.1875 # Gap around an X or O, as a fraction of a square
+C_BOARD_LAYOUT_CACHE_SIZE = 16 # How many window sizes to keep the layout of
+C_GAME_RECORD_PATH = 'gui_games.log' # Every finished game is added here, None to not keep them
+C_MOVE_SERVER = None # (host, port) of a common.move_server to get Hard's moves from, e.g. ('127.0.0.1', 5599)
+C_MOVE_SERVER_ENGINE = "network" # Which of the server's engines plays Hard
+C_MOVE_SERVER_TIMEOUT = 5 # Seconds to wait for the move server before giving up on it
 
 class CanvasWidget:
 	"""(Abstract) The base class for all the canvas widgets."""
@@ -202,6 +210,10 @@ class CanvasButton(CanvasWidget):
 			self.canvas.itemconfig("text" + self.id, 
 				fill=self.normal_text_color)
 
+	def set_text(self, button_text):
+		"""Changes the text shown on the button."""
+		self.canvas.itemconfig("text" + self.id, text=button_text)
+
 class CanvasSquare(CanvasWidget):
 	"""A square that responds to mouse click event. This is for the grid
 	board."""
@@ -245,6 +257,9 @@ class BaseScene(tkinter.Canvas):
 	"""(Abstract) The base class for all scenes. BaseScene deals with
 	general widgets and handles window resizing event."""
 
+	# Tag expression of the items to rescale when the window is resized
+	RESIZE_TAGS = "all"
+
 	def __init__(self, parent):
 		"""Initializes the scene."""
 
@@ -272,8 +287,8 @@ class BaseScene(tkinter.Canvas):
 		# Resize the canvas 
 		self.config(width=self.width, height=self.height)
 
-		# Rescale all the objects tagged with the "all" tag
-		self.scale("all", 0, 0, self.wscale, self.hscale)
+		# Rescale all the objects matching RESIZE_TAGS
+		self.scale(self.RESIZE_TAGS, 0, 0, self.wscale, self.hscale)
 
 	def create_button(self, x, y, button_text, 
 		normal_color=C_COLOR_BLUE, hovered_color=C_COLOR_BLUE_DARK, 
@@ -337,9 +352,11 @@ class WelcomeScene(BaseScene):
 				" as this script.")
 
 		# Create the hard button
-		hard_btn = self.create_button(C_WINDOW_WIDTH/2, 
+		self.hard_btn = self.create_button(C_WINDOW_WIDTH/2, 
 			C_WINDOW_HEIGHT/2 + 100, "Hard")
-		hard_btn.command = self.__on_hard_clicked__
+		self.hard_btn.command = self.__on_hard_clicked__
+		# Set when hard was clicked before the AI finished loading
+		self.waiting_for_engine = False
 		# Create the easy button
 		easy_btn = self.create_button(C_WINDOW_WIDTH/2, 
 			C_WINDOW_HEIGHT/2 + 192+96, "Easy")
@@ -350,10 +367,32 @@ class WelcomeScene(BaseScene):
 
 	def __on_hard_clicked__(self):
 		"""(Private) Switches to the main game scene when the hard
-		button is clicked."""
+		button is clicked, once the AI has loaded."""
+		if(not self.engine_loader.is_ready()):
+			if(not self.waiting_for_engine):
+				self.waiting_for_engine = True
+				self.hard_btn.set_text("Loading...")
+				self.after(C_AI_POLL_MS, self.__wait_for_engine__)
+			return
+		if(self.engine_loader.error is not None):
+			tkinter.messagebox.showerror("Error", "Can't load the AI.\n" + 
+				str(self.engine_loader.error))
+			return
 		self.pack_forget()
 		self.main_game_scene_ai.pack()
 
+	def __wait_for_engine__(self):
+		"""(Private) Switches to the main game scene once the AI has 
+		loaded, if hard was clicked while it was still loading."""
+		if(not self.engine_loader.is_ready()):
+			self.after(C_AI_POLL_MS, self.__wait_for_engine__)
+			return
+		self.waiting_for_engine = False
+		self.hard_btn.set_text("Hard")
+		# Only if the user is still on the welcome scene
+		if(self.winfo_ismapped()):
+			self.__on_hard_clicked__()
+
 
 
 	def __on_easy_clicked__(self):
@@ -364,338 +403,372 @@ class WelcomeScene(BaseScene):
 
 		self.main_game_scene_random.pack()
 		
-class MainGameSceneAI(BaseScene):
-	"""MainGameScene deals with the game logic."""
-
-	def __init__(self, parent):
-		"""Initializes the main game scene object."""
-
-		# Initialize the base scene
-		super().__init__(parent)
-
-		#create tag for squares
-		self.square_num = -1
-		# Initialize instance variables
-		self.board_grids_power = 3 # Make it a 3x3 grid board
-		self.board_width = 512+256 # The board is 256x256 wide
-
-		# Create a blue arch at the bottom of the canvas
-		self.create_arc((-128, C_WINDOW_HEIGHT - 128, C_WINDOW_WIDTH + 128, 
-			C_WINDOW_HEIGHT + 368), start=0, extent=180, fill=C_COLOR_BLUE, 
-			outline="")
-
-		# Create the return button
-		return_btn = self.create_button(C_WINDOW_WIDTH - 320, 64, "Go back") 
-		return_btn.command = self.__on_return_clicked__
-
-		self.squares = [None] * self.board_grids_power ** 2
-		
-		self.draw_board()
-		
-
-		self.squares[0].command = self.__on_squares_0_clicked__
-		self.squares[1].command = self.__on_squares_1_clicked__
-		self.squares[2].command = self.__on_squares_2_clicked__
-		self.squares[3].command = self.__on_squares_3_clicked__
-		self.squares[4].command = self.__on_squares_4_clicked__
-		self.squares[5].command = self.__on_squares_5_clicked__
-		self.squares[6].command = self.__on_squares_6_clicked__
-		self.squares[7].command = self.__on_squares_7_clicked__
-		self.squares[8].command = self.__on_squares_8_clicked__
-		self.player_turn = 1
-		self.board_string = "000000000"
-		self.board_state = ((0, 0, 0),
-							(0, 0, 0),
-							(0, 0, 0))
-		self.isHumanFirst = False
-		if bool(random.getrandbits(1)):
-			self.isHumanFirst = True
-
-		self.AI()
-		# Set restart button to None so it won't raise AttributeError
-		self.restart_btn = None
-
-		# Tag all of the drawn widgets for later reference
-		self.addtag_all("all")
-	
-	def AI(self):
-		
-		NETWORK_FILE_PATH ='current_network.p' #保存数据的位置
-
-		game_spec = TicTacToeGameSpec()
-		create_network_func = functools.partial(create_network, game_spec.board_squares(), (100, 100, 100))
-
-		input_layer, output_layer, variables = create_network_func()
-
-		with tf.Session() as session:
-			session.run(tf.global_variables_initializer())
-			if NETWORK_FILE_PATH and os.path.isfile(NETWORK_FILE_PATH):
+class EngineLoader:
+	"""Imports and loads the AI's network on a background thread, so 
+	starting the GUI doesn't have to wait for it. If C_MOVE_SERVER is set 
+	and the server can be reached the moves come from it instead, and the 
+	network isn't loaded here at all."""
+
+	def __init__(self):
+		"""Initializes the loader, call start() to begin loading."""
+		self.policy_network = None
+		# The move server's player func, None when the network is loaded here
+		self.server_player = None
+		self.error = None
+		self.__ready = threading.Event()
+		self.__thread = threading.Thread(target=self.__load__, daemon=True)
+
+	def start(self):
+		"""Starts loading in the background."""
+		self.__thread.start()
+
+	def is_ready(self):
+		"""Returns True once loading has finished, check error to see if
+		it worked."""
+		return self.__ready.is_set()
+
+	def wait(self):
+		"""Blocks until loading has finished and returns the network. 
+		Never call this from the Tk thread."""
+		self.__ready.wait()
+		if self.error is not None:
+			raise self.error
+		return self.policy_network
+
+	def __load__(self):
+		"""(Private) The loading thread."""
+		try:
+			if C_MOVE_SERVER is not None:
+				self.server_player = self.__connect__()
+				if self.server_player is not None:
+					return
+			from common.policy_network import PolicyNetwork
+			if os.path.isfile(C_NETWORK_FILE_PATH):
 				print("loading pre-existing network")
-				load_network(session, variables, NETWORK_FILE_PATH)
-
-			mini_batch_board_states, mini_batch_moves = [], []
-
-			def make_training_move(board_state, side):
-				mini_batch_board_states.append(np.ravel(board_state) * side)
-				move = get_stochastic_network_move(session, input_layer, output_layer, board_state, side)
-				mini_batch_moves.append(move)
-				return game_spec.flat_move_to_tuple(move.argmax())
-		
-			_available_moves = list(available_moves(self.board_state))
-
-
-			if(not self.isHumanFirst):
-				move = make_training_move(self.board_state, self.player_turn)
-				#print(move)
-				_available_moves = list(available_moves(self.board_state))
-				if(move not in _available_moves):
-					if((2,1) in _available_moves):
-						move = (2,1)
-					else:
-						move = random.choice(_available_moves)
-				self.board_state = apply_move(self.board_state, move, self.player_turn)
-				self.board_string =self.State_to_Str(self.board_state)
-				self.update_board_content(self.board_string)
-				self.player_turn = -self.player_turn
-			self.isHumanFirst = False	
-	
-
-			
-	def State_to_Str(self,board_state):
-		result = ""
-		for i in range(3):
-			for j in range(3):
-				result+=str(2 if board_state[i][j]==-1 else  board_state[i][j])
-		return result
-	def Str_to_State(self,board_string):
-		s = board_string
-		result = ((-1 if int(s[0]) == 2 else int(s[0]),-1 if int(s[1]) == 2 else int(s[1]),-1 if int(s[2]) == 2 else int(s[2])),
-				  (-1 if int(s[3]) == 2 else int(s[3]),-1 if int(s[4]) == 2 else int(s[4]),-1 if int(s[5]) == 2 else int(s[5])),
-				  (-1 if int(s[6]) == 2 else int(s[6]),-1 if int(s[7]) == 2 else int(s[7]),-1 if int(s[8]) == 2 else int(s[8])))
-		return result
-
-	def pack(self):
-		"""(Override) When the scene packs, start the client thread."""
-		super().pack()
-		# Start a new thread to deal with the client communication
-
-
-	def draw_board(self, board_line_width = 4):
-		"""Draws the board at the center of the screen, parameter 
-		board_line_width determines the border line width."""
+				policy_network = PolicyNetwork.load(C_NETWORK_FILE_PATH)
+			else:
+				policy_network = PolicyNetwork.create(
+					TicTacToeGameSpec().board_squares(), 
+					C_NETWORK_HIDDEN_NODES)
+			# Run the network once so the first real move isn't slower
+			policy_network.get_stochastic_network_move(
+				TicTacToeGameSpec().new_board(), 1)
+			# Also look up a move in the perfect play table, which builds it 
+			# the first time the GUI is run
+			from techniques.perfect_play import table_player
+			table_player(TicTacToeGameSpec().new_board(), 1)
+			self.policy_network = policy_network
+		except Exception as ex:
+			self.error = ex
+		finally:
+			self.__ready.set()
+
+	def __connect__(self):
+		"""(Private) Connects to the move server, returns None if it can't 
+		be reached so the network is loaded here instead."""
+		from common.move_server import MoveClient
+		host, port = C_MOVE_SERVER
+		try:
+			move_client = MoveClient(host, port, 
+				timeout=C_MOVE_SERVER_TIMEOUT)
+		except OSError as ex:
+			print("Can't reach the move server, using the network here. " + 
+				str(ex))
+			return None
+		print("getting the AI's moves from the move server")
+		return move_client.player_func(C_MOVE_SERVER_ENGINE)
+
+class AsyncEngine:
+	"""Runs an AI's move function on a background thread, so the Tk event
+	loop never waits for it. Results are passed back through a queue that is
+	polled with widget.after, so callbacks always run on the Tk thread.
+
+	Every request is tagged with the engine's generation, cancel() moves on
+	to a new generation so anything still being worked out for the old one
+	is thrown away when it finishes."""
+
+	def __init__(self, widget, move_func, poll_ms=C_AI_POLL_MS):
+		"""Starts the worker thread. move_func(board_state, side) is only
+		ever called from the worker thread, so it must not touch any
+		widgets."""
+		self.widget = widget
+		self.move_func = move_func
+		self.poll_ms = poll_ms
+		self.generation = 0
+		self.__requests = queue.Queue()
+		self.__results = queue.Queue()
+		# Replies worked out while pondering, keyed by (generation, board)
+		self.__ponder_cache = {}
+		self.__callback = None
+		self.__error_callback = None
+		self.__polling = False
+		self.__thread = threading.Thread(target=self.__run__, daemon=True)
+		self.__thread.start()
+
+	def request_move(self, board_state, side, callback, error_callback=None):
+		"""Starts working out a move for side, callback(move) is called on
+		the Tk thread once it is ready unless cancel() is called first. If 
+		move_func raises, error_callback(exception) is called instead, or 
+		the error is shown in a message box if it is None."""
+		self.__callback = callback
+		self.__error_callback = error_callback
+		move = self.__ponder_cache.get((self.generation, board_state))
+		if move is not None:
+			self.__results.put((self.generation, move))
+		else:
+			self.__requests.put((self.generation, False, board_state, side))
+		if not self.__polling:
+			self.__polling = True
+			self.widget.after(self.poll_ms, self.__poll__)
+
+	def ponder(self, board_state, side):
+		"""Works out side's reply to every move the other side could make
+		on board_state, while the other side is thinking."""
+		self.__requests.put((self.generation, True, board_state, side))
+
+	def cancel(self):
+		"""Forgets every move asked for so far."""
+		self.generation = self.generation + 1
+		self.__callback = None
+		self.__ponder_cache.clear()
+
+	def is_thinking(self):
+		"""Returns True if a move has been asked for and not delivered."""
+		return self.__callback is not None
+
+	def __poll__(self):
+		"""(Private) Delivers finished moves, runs on the Tk thread."""
+		try:
+			while True:
+				generation, move = self.__results.get_nowait()
+				if(generation != self.generation or self.__callback is None):
+					# Cancelled while it was being worked out
+					continue
+				callback = self.__callback
+				error_callback = self.__error_callback
+				self.__callback = None
+				self.__error_callback = None
+				if not isinstance(move, Exception):
+					callback(move)
+				elif error_callback is not None:
+					error_callback(move)
+				else:
+					tkinter.messagebox.showerror("Error", 
+						"The AI couldn't choose a move.\n" + str(move))
+		except queue.Empty:
+			pass
+		finally:
+			# Keep polling even if a callback raised, otherwise no later 
+			# move would ever be delivered
+			if self.__callback is not None:
+				self.widget.after(self.poll_ms, self.__poll__)
+			else:
+				self.__polling = False
+
+	def __run__(self):
+		"""(Private) The worker thread, works through the requests."""
+		while True:
+			generation, is_ponder, board_state, side = self.__requests.get()
+			if(generation != self.generation):
+				# Cancelled before we got to it
+				continue
+			if not is_ponder:
+				try:
+					move = self.move_func(board_state, side)
+				except Exception as ex:
+					move = ex
+				self.__results.put((generation, move))
+				continue
+			for move in available_moves(board_state):
+				# Stop as soon as there is a real move to work out
+				if(generation != self.generation or 
+					not self.__requests.empty()):
+					break
+				next_board_state = apply_move(board_state, move, -side)
+				if(has_winner(next_board_state)[0] != 0 or 
+					not any(available_moves(next_board_state))):
+					continue
+				try:
+					self.__ponder_cache[(generation, next_board_state)] = \
+						self.move_func(next_board_state, side)
+				except Exception:
+					# Leave it to be worked out, and reported, when asked for
+					break
+
+class BoardView:
+	"""Draws a grid_size x grid_size board and the pieces on it. Every 
+	canvas item is created once, moves only change the cells that are 
+	different from the board shown before, by showing or hiding that cell's 
+	X and O, so a move costs the same on any size of board.
+
+	The board is laid out for the window size it was created at and 
+	stretched with the window, the same as BaseScene does for the rest of 
+	the scene. The coordinates for each window size are worked out once."""
+
+	# Every item on the board has this tag, so the scene can leave them out
+	# when it rescales
+	TAG = "board"
+
+	def __init__(self, canvas, grid_size, board_width, on_square_clicked, 
+		board_line_width=4, piece_line_width=4):
+		"""Creates the board, on_square_clicked(index) is called when the 
+		square at index row * grid_size + column is clicked."""
+		self.canvas = canvas
+		self.grid_size = grid_size
+		self.board_width = board_width
+		self.design_width = canvas.width
+		self.design_height = canvas.height
+		self.size = (canvas.width, canvas.height)
+		self.__layouts = {}
+		squares, pieces, lines = self.layout(*self.size)
 
 		# Create squares for the grid board
-		for i in range(0, self.board_grids_power):
-			for j in range(0, self.board_grids_power):
-				self.squares[i+j*3] = self.create_square(
-					(C_WINDOW_WIDTH - self.board_width)/2 + 
-					self.board_width/self.board_grids_power * i + 
-					self.board_width / self.board_grids_power / 2,
-					(C_WINDOW_HEIGHT - self.board_width)/2 + 
-					self.board_width/self.board_grids_power * j + 
-					self.board_width / self.board_grids_power / 2,
-					self.board_width / self.board_grids_power)
-				# Disable those squares to make them unclickable
-		
+		self.squares = []
+		for index, (x0, y0, x1, y1) in enumerate(squares):
+			square = canvas.create_square((x0 + x1)/2, (y0 + y1)/2, x1 - x0)
+			square.command = functools.partial(on_square_clicked, index)
+			canvas.addtag_withtag(self.TAG, square.tag_name)
+			self.squares.append(square)
 
 		# Draw the border lines
-		for i in range(1, self.board_grids_power):
-			# Draw horizontal lines
-			self.create_line((C_WINDOW_WIDTH - self.board_width)/2, 
-				(C_WINDOW_HEIGHT - self.board_width)/2 + 
-				self.board_width/self.board_grids_power * i, 
-				(C_WINDOW_WIDTH + self.board_width)/2, 
-				(C_WINDOW_HEIGHT - self.board_width)/2 + 
-				self.board_width/self.board_grids_power * i, 
-				fill=C_COLOR_BLUE_DARK, width=board_line_width)
-			# Draw vertical lines
-			self.create_line((C_WINDOW_WIDTH - self.board_width)/2 + 
-				self.board_width/self.board_grids_power * i, 
-				(C_WINDOW_HEIGHT - self.board_width)/2, 
-				(C_WINDOW_WIDTH - self.board_width)/2 + 
-				self.board_width/self.board_grids_power * i, 
-				(C_WINDOW_HEIGHT + self.board_width)/2, 
-				fill=C_COLOR_BLUE_DARK, width=board_line_width)
-		
+		self.lines = [canvas.create_line(*line, fill=C_COLOR_BLUE_DARK, 
+			width=board_line_width, tags=(self.TAG)) for line in lines]
+
+		# Create a hidden O and X for every cell, they are only moved into 
+		# place when they are shown
+		self.pieces = []
+		for _ in pieces:
+			o = canvas.create_oval(0, 0, 0, 0, fill="", 
+				outline=C_COLOR_BLUE_DARK, width=piece_line_width, 
+				state=tkinter.HIDDEN, tags=(self.TAG, "board_content"))
+			x = (canvas.create_line(0, 0, 0, 0, fill=C_COLOR_BLUE_DARK, 
+					width=piece_line_width, state=tkinter.HIDDEN, 
+					tags=(self.TAG, "board_content")), 
+				canvas.create_line(0, 0, 0, 0, fill=C_COLOR_BLUE_DARK, 
+					width=piece_line_width, state=tkinter.HIDDEN, 
+					tags=(self.TAG, "board_content")))
+			self.pieces.append((o, x))
+
+		self.shown = self.empty_board()
+
+	def empty_board(self):
+		"""Returns a board with no pieces on it, as a tuple of rows."""
+		return tuple((0,) * self.grid_size for _ in range(self.grid_size))
+
+	def layout(self, width, height):
+		"""Returns the coordinates of every square, piece and border line 
+		for a width x height canvas."""
+		layout = self.__layouts.get((width, height))
+		if layout is None:
+			if(len(self.__layouts) >= C_BOARD_LAYOUT_CACHE_SIZE):
+				self.__layouts.clear()
+			layout = self.__layouts[(width, height)] = \
+				self.__compute_layout__(width, height)
+		return layout
+
+	def __compute_layout__(self, width, height):
+		"""(Private) Works out the layout for a width x height canvas."""
+		wscale = float(width)/self.design_width
+		hscale = float(height)/self.design_height
+		cell = self.board_width/self.grid_size
+		left = (self.design_width - self.board_width)/2
+		top = (self.design_height - self.board_width)/2
+		padding = cell * C_PIECE_PADDING
+
+		squares = []
+		pieces = []
+		for row in range(self.grid_size):
+			for column in range(self.grid_size):
+				x = left + cell * column
+				y = top + cell * row
+				squares.append((x * wscale, y * hscale, 
+					(x + cell) * wscale, (y + cell) * hscale))
+				pieces.append(((x + padding) * wscale, (y + padding) * hscale,
+					(x + cell - padding) * wscale, (y + cell - padding) * hscale))
+
+		lines = []
+		for i in range(1, self.grid_size):
+			# Horizontal line
+			lines.append((left * wscale, (top + cell * i) * hscale, 
+				(left + self.board_width) * wscale, (top + cell * i) * hscale))
+			# Vertical line
+			lines.append(((left + cell * i) * wscale, top * hscale, 
+				(left + cell * i) * wscale, (top + self.board_width) * hscale))
+		return squares, pieces, lines
+
+	def resize(self, width, height):
+		"""Moves the board to fit a width x height canvas."""
+		if((width, height) == self.size):
+			return
+		self.size = (width, height)
+		squares, _, lines = self.layout(width, height)
+		for square, box in zip(self.squares, squares):
+			self.canvas.coords(square.tag_name, *box)
+		for line, coords in zip(self.lines, lines):
+			self.canvas.coords(line, *coords)
+		# Hidden pieces are moved when they are shown
+		for row in range(self.grid_size):
+			for column in range(self.grid_size):
+				if(self.shown[row][column] != 0):
+					self.__place_piece__(row * self.grid_size + column)
+
+	def update(self, board_state):
+		"""Shows board_state, a tuple of rows of 1 for X, -1 for O and 0 
+		for empty."""
+		for row, (new_row, old_row) in enumerate(zip(board_state, 
+			self.shown)):
+			if(new_row == old_row):
+				continue
+			for column, (new, old) in enumerate(zip(new_row, old_row)):
+				if(new != old):
+					self.__set_piece__(row * self.grid_size + column, new)
+		self.shown = tuple(tuple(row) for row in board_state)
+
+	def __set_piece__(self, index, piece):
+		"""(Private) Shows an X if piece is 1, an O if it is -1 or nothing 
+		at index."""
+		o, x = self.pieces[index]
+		if(piece != 0):
+			self.__place_piece__(index)
+		self.canvas.itemconfig(o, 
+			state=tkinter.NORMAL if piece == -1 else tkinter.HIDDEN)
+		for line in x:
+			self.canvas.itemconfig(line, 
+				state=tkinter.NORMAL if piece == 1 else tkinter.HIDDEN)
+
+	def __place_piece__(self, index):
+		"""(Private) Moves the pieces at index to the current layout."""
+		x0, y0, x1, y1 = self.layout(*self.size)[1][index]
+		o, x = self.pieces[index]
+		self.canvas.coords(o, x0, y0, x1, y1)
+		self.canvas.coords(x[0], x0, y0, x1, y1)
+		self.canvas.coords(x[1], x1, y0, x0, y1)
+
+	def highlight(self, indexes, color):
+		"""Changes the color of the squares at indexes until reset."""
+		for index in indexes:
+			self.squares[index].set_temp_color(color)
 
-	def __on_return_clicked__(self):
-		"""(Private) Switches back to the welcome scene when the return 
-		button is clicked."""
-		# Clear screen
-		self.__clear_screen()
-		
-		# Set the client to None so the client thread will stop due to error
-		#self.client.client_socket = None;
-		#self.client = None
-		# Switch to the welcome scene
-		self.pack_forget()
-		self.welcome_scene.pack()
-	def Human(self,i):
-		if(self.board_string[i]=='0'):
-			if(self.player_turn == 1):
-				str =self.board_string[:i]+'1'+self.board_string[i+1:]
-				self.board_string = str
-				#print(self.board_string)
-			elif(self.player_turn == -1):
-				str =self.board_string[:i]+'2'+self.board_string[i+1:]
-				self.board_string = str
-				#print(self.board_string)
-			else:
-				raise EnvironmentError
-			self.board_state = self.Str_to_State(self.board_string)
-			self.update_board_content(self.board_string)
-			self.player_turn = -self.player_turn
-			if(self.checkWinner()==0):
-				self.checkDraw()		
-				self.AI()
-				self.checkWinner()
-				self.checkDraw()	
-			
-	def checkWinner(self):
-		winner,str1 = has_winner(self.board_state)
-		if (winner != 0):
-			for i in range(9):
-				self.squares[i].disable()
-			self.draw_winning_path(str1)
-			self.show_restart()
-			return 1
-		return 0
-	def checkDraw(self):
-		if (not len(list(available_moves(self.board_state)))):
-			self.show_restart()
-	def __on_squares_0_clicked__(self):
-		self.Human(0)
-
-	def __on_squares_1_clicked__(self):
-		self.Human(1)
-
-	def __on_squares_2_clicked__(self):
-		self.Human(2)
-
-	def __on_squares_3_clicked__(self):
-		self.Human(3)
-
-	def __on_squares_4_clicked__(self):
-		self.Human(4)
-
-	def __on_squares_5_clicked__(self):
-		self.Human(5)  
-
-	def __on_squares_6_clicked__(self):
-		self.Human(6)
-
-	def __on_squares_7_clicked__(self):
-		self.Human(7)
-
-	def __on_squares_8_clicked__(self):
-		self.Human(8)
-
-	def update_board_content(self, board_string):
-		"""Redraws the board content with new board_string."""
-		if(len(board_string) != self.board_grids_power ** 2):
-			# If board_string is in valid
-			print("The board string should be " + 
-				str(self.board_grids_power ** 2) + " characters long.")
-			# Throw an error
-			raise Exception
-
-		# Delete everything on the board
-		self.delete("board_content")
-
-		p = 48 # Padding
-
-		# Draw the board content
-		for i in range(0, self.board_grids_power):
-			for j in range(0, self.board_grids_power):
-
-				if(board_string[i+j*3] == "2"):
-					# If this is an "O"
-					self.create_oval(
-						(C_WINDOW_WIDTH - self.board_width)/2 + 
-						self.board_width/self.board_grids_power * i + p,
-						(C_WINDOW_HEIGHT - self.board_width)/2 + 
-						self.board_width/self.board_grids_power * j + p,
-						(C_WINDOW_WIDTH - self.board_width)/2 + 
-						self.board_width/self.board_grids_power * (i + 1) - p,
-						(C_WINDOW_HEIGHT - self.board_width)/2 + 
-						self.board_width/self.board_grids_power * (j + 1) - p,
-						fill="", outline=C_COLOR_BLUE_DARK, width=4,
-						tags="board_content")
-				elif(board_string[i+j*3] == "1"):
-					# If this is an "X"
-					self.create_line(
-						(C_WINDOW_WIDTH - self.board_width)/2 + 
-						self.board_width/self.board_grids_power * i + p,
-						(C_WINDOW_HEIGHT - self.board_width)/2 + 
-						self.board_width/self.board_grids_power * j + p,
-						(C_WINDOW_WIDTH - self.board_width)/2 + 
-						self.board_width/self.board_grids_power * (i + 1) - p,
-						(C_WINDOW_HEIGHT - self.board_width)/2 + 
-						self.board_width/self.board_grids_power * (j + 1) - p,
-						fill=C_COLOR_BLUE_DARK, width=4,
-						tags="board_content")
-					self.create_line(
-						(C_WINDOW_WIDTH - self.board_width)/2 + 
-						self.board_width/self.board_grids_power * (i + 1) - p,
-						(C_WINDOW_HEIGHT - self.board_width)/2 + 
-						self.board_width/self.board_grids_power * j + p,
-						(C_WINDOW_WIDTH - self.board_width)/2 + 
-						self.board_width/self.board_grids_power * i + p,
-						(C_WINDOW_HEIGHT - self.board_width)/2 + 
-						self.board_width/self.board_grids_power * (j + 1) - p,
-						fill=C_COLOR_BLUE_DARK, width=4,
-						tags="board_content")
-
-	def draw_winning_path(self, winning_path):
-		"""Marks on the board the path that leads to the win result."""
-		# Loop through the board
-		for i in range(0, self.board_grids_power ** 2):
-			if str(i) in winning_path: 
-				# If the current item is in the winning path
-
-				self.squares[i].set_temp_color("#db2631")
-
-
-
-	def show_restart(self):
-		"""Creates a restart button for the user to choose to restart a 
-		new game."""
-		self.restart_btn = self.create_button(C_WINDOW_WIDTH/2, C_WINDOW_HEIGHT - 32-32, 
-			"Restart", C_COLOR_BLUE_DARK, C_COLOR_BLUE_LIGHT, C_COLOR_BLUE_LIGHT, 
-			C_COLOR_BLUE_DARK)
-		self.restart_btn.command = self.__on_restart_clicked__
+	def disable(self):
+		"""Stops the squares responding to clicks."""
+		for square in self.squares:
+			square.disable()
 
-	def __clear_screen(self):
-		"""(Private) Clears all the existing content from the old game."""
-		# Clear everything from the past game
-		for i in range(0, self.board_grids_power ** 2):
-			self.squares[i].set_temp_color(C_COLOR_BLUE)
-			self.squares[i].enable()
-		self.update_board_content(" " * self.board_grids_power ** 2)
+	def reset(self):
+		"""Clears the pieces and highlights and enables the squares."""
+		for square in self.squares:
+			square.enable()
+		self.update(self.empty_board())
 
-		# Delete the button from the scene
-		if self.restart_btn is not None:
-			self.restart_btn.delete()
-		self.restart_btn = None
-		self.player_turn = 1
-		self.board_string = "000000000"
-		self.board_state = ((0, 0, 0),
-							(0, 0, 0),
-							(0, 0, 0))
-		self.isHumanFirst = False
-		if bool(random.getrandbits(1)):
-			self.isHumanFirst = True
+class MainGameScene(BaseScene):
+	"""(Abstract) MainGameScene deals with the game logic of a human 
+	playing against the computer, subclasses choose the computer's moves."""
 
-		self.AI()
+	# The computer's name in the game log
+	COMPUTER_NAME = "computer"
 
-	def __on_restart_clicked__(self):
-		"""(Private) Switches back to the welcome scene when the return 
-		button is clicked."""
-		# Clear screen
-		self.__clear_screen()
-
-class MainGameSceneRandom(BaseScene):
-	"""MainGameScene deals with the game logic."""
+	# The board lays itself out when the window is resized
+	RESIZE_TAGS = "!" + BoardView.TAG
 
 	def __init__(self, parent):
 		"""Initializes the main game scene object."""
@@ -703,11 +776,9 @@ class MainGameSceneRandom(BaseScene):
 		# Initialize the base scene
 		super().__init__(parent)
 
-		#create tag for squares
-		self.square_num = -1
 		# Initialize instance variables
 		self.board_grids_power = 3 # Make it a 3x3 grid board
-		self.board_width = 256 + 512 # The board is 256x256 wide
+		self.board_width = 512+256 # The board is 768x768 wide
 
 		# Create a blue arch at the bottom of the canvas
 		self.create_arc((-128, C_WINDOW_HEIGHT - 128, C_WINDOW_WIDTH + 128, 
@@ -715,247 +786,120 @@ class MainGameSceneRandom(BaseScene):
 			outline="")
 
 		# Create the return button
-		return_btn = self.create_button(C_WINDOW_WIDTH - 320, 32+32, "Go back") 
+		return_btn = self.create_button(C_WINDOW_WIDTH - 320, 64, "Go back") 
 		return_btn.command = self.__on_return_clicked__
 
-		self.squares = [None] * self.board_grids_power ** 2
-		
-		self.draw_board()
-		
-
-		self.squares[0].command = self.__on_squares_0_clicked__
-		self.squares[1].command = self.__on_squares_1_clicked__
-		self.squares[2].command = self.__on_squares_2_clicked__
-		self.squares[3].command = self.__on_squares_3_clicked__
-		self.squares[4].command = self.__on_squares_4_clicked__
-		self.squares[5].command = self.__on_squares_5_clicked__
-		self.squares[6].command = self.__on_squares_6_clicked__
-		self.squares[7].command = self.__on_squares_7_clicked__
-		self.squares[8].command = self.__on_squares_8_clicked__
+		self.board_view = BoardView(self, self.board_grids_power, 
+			self.board_width, self.Human)
 		self.player_turn = 1
-		self.board_string = "000000000"
-		self.board_state = ((0, 0, 0),
-							(0, 0, 0),
-							(0, 0, 0))
-		self.isHumanFirst = False
-		if bool(random.getrandbits(1)):
-			self.isHumanFirst = True
-
-		self.Random()
+		self.board_state = self.board_view.empty_board()
+		# The flat index of every move made, and the human's side, for the 
+		# game log
+		self.moves = []
+		self.human_side = 1
+		self.game_recorder = None
+		# The first game starts when the scene is first shown
+		self.game_started = False
+
 		# Set restart button to None so it won't raise AttributeError
 		self.restart_btn = None
 
 		# Tag all of the drawn widgets for later reference
 		self.addtag_all("all")
 
-	def Random(self):
-		if(not self.isHumanFirst):
-			_available_moves = list(available_moves(self.board_state))
-			move = random.choice(_available_moves)
-			self.board_state = apply_move(self.board_state, move, self.player_turn)
-			self.board_string =self.State_to_Str(self.board_state)
-			self.update_board_content(self.board_string)
-			self.player_turn = -self.player_turn
-		self.isHumanFirst = False	
-		
-		
-		
-	def State_to_Str(self,board_state):
-		result = ""
-		for i in range(3):
-			for j in range(3):
-				result+=str(2 if board_state[i][j]==-1 else  board_state[i][j])
-		return result
-	def Str_to_State(self,board_string):
-		s = board_string
-		result = ((-1 if int(s[0]) == 2 else int(s[0]),-1 if int(s[1]) == 2 else int(s[1]),-1 if int(s[2]) == 2 else int(s[2])),
-				  (-1 if int(s[3]) == 2 else int(s[3]),-1 if int(s[4]) == 2 else int(s[4]),-1 if int(s[5]) == 2 else int(s[5])),
-				  (-1 if int(s[6]) == 2 else int(s[6]),-1 if int(s[7]) == 2 else int(s[7]),-1 if int(s[8]) == 2 else int(s[8])))
-		return result
-
 	def pack(self):
-		"""(Override) When the scene packs, start the client thread."""
+		"""(Override) When the scene packs for the first time, start the
+		first game."""
 		super().pack()
-		# Start a new thread to deal with the client communication
+		if(not self.game_started):
+			self.game_started = True
+			self.new_game()
 
+	def __on_resize__(self, event):
+		"""(Override) Moves the board to fit the new size."""
+		super().__on_resize__(event)
+		self.board_view.resize(self.width, self.height)
 
-	def draw_board(self, board_line_width = 4):
-		"""Draws the board at the center of the screen, parameter 
-		board_line_width determines the border line width."""
-		print(C_WINDOW_WIDTH,C_WINDOW_HEIGHT)
-		# Create squares for the grid board
-		for i in range(0, self.board_grids_power):
-			for j in range(0, self.board_grids_power):
-				self.squares[i+j*3] = self.create_square(
-					(C_WINDOW_WIDTH - self.board_width)/2 + 
-					self.board_width/self.board_grids_power * i + 
-					self.board_width / self.board_grids_power / 2,
-					(C_WINDOW_HEIGHT - self.board_width)/2 + 
-					self.board_width/self.board_grids_power * j + 
-					self.board_width / self.board_grids_power / 2,
-					self.board_width / self.board_grids_power)
-		
-		
+	def computer_move(self):
+		"""(Abstract) Chooses the computer's move, which is played with 
+		play_move."""
+		raise NotImplementedError
 
-		# Draw the border lines
-		for i in range(1, self.board_grids_power):
-			# Draw horizontal lines
-			self.create_line((C_WINDOW_WIDTH - self.board_width)/2, 
-				(C_WINDOW_HEIGHT - self.board_width)/2 + 
-				self.board_width/self.board_grids_power * i, 
-				(C_WINDOW_WIDTH + self.board_width)/2, 
-				(C_WINDOW_HEIGHT - self.board_width)/2 + 
-				self.board_width/self.board_grids_power * i, 
-				fill=C_COLOR_BLUE_DARK, width=board_line_width)
-			# Draw vertical lines
-			self.create_line((C_WINDOW_WIDTH - self.board_width)/2 + 
-				self.board_width/self.board_grids_power * i, 
-				(C_WINDOW_HEIGHT - self.board_width)/2, 
-				(C_WINDOW_WIDTH - self.board_width)/2 + 
-				self.board_width/self.board_grids_power * i, 
-				(C_WINDOW_HEIGHT + self.board_width)/2, 
-				fill=C_COLOR_BLUE_DARK, width=board_line_width)
-
-	def update_board_content(self, board_string):
-		"""Redraws the board content with new board_string."""
-		if(len(board_string) != self.board_grids_power ** 2):
-			# If board_string is in valid
-			print("The board string should be " + 
-				str(self.board_grids_power ** 2) + " characters long.")
-			# Throw an error
-			raise Exception
-
-		# Delete everything on the board
-		self.delete("board_content")
-
-		p = 48 # Padding
-
-		# Draw the board content
-		for i in range(0, self.board_grids_power):
-			for j in range(0, self.board_grids_power):
-
-				if(board_string[i+j*3] == "2"):
-					# If this is an "O"
-					self.create_oval(
-						(C_WINDOW_WIDTH - self.board_width)/2 + 
-						self.board_width/self.board_grids_power * i + p,
-						(C_WINDOW_HEIGHT - self.board_width)/2 + 
-						self.board_width/self.board_grids_power * j + p,
-						(C_WINDOW_WIDTH - self.board_width)/2 + 
-						self.board_width/self.board_grids_power * (i + 1) - p,
-						(C_WINDOW_HEIGHT - self.board_width)/2 + 
-						self.board_width/self.board_grids_power * (j + 1) - p,
-						fill="", outline=C_COLOR_BLUE_DARK, width=4,
-						tags="board_content")
-				elif(board_string[i+j*3] == "1"):
-					# If this is an "X"
-					self.create_line(
-						(C_WINDOW_WIDTH - self.board_width)/2 + 
-						self.board_width/self.board_grids_power * i + p,
-						(C_WINDOW_HEIGHT - self.board_width)/2 + 
-						self.board_width/self.board_grids_power * j + p,
-						(C_WINDOW_WIDTH - self.board_width)/2 + 
-						self.board_width/self.board_grids_power * (i + 1) - p,
-						(C_WINDOW_HEIGHT - self.board_width)/2 + 
-						self.board_width/self.board_grids_power * (j + 1) - p,
-						fill=C_COLOR_BLUE_DARK, width=4,
-						tags="board_content")
-					self.create_line(
-						(C_WINDOW_WIDTH - self.board_width)/2 + 
-						self.board_width/self.board_grids_power * (i + 1) - p,
-						(C_WINDOW_HEIGHT - self.board_width)/2 + 
-						self.board_width/self.board_grids_power * j + p,
-						(C_WINDOW_WIDTH - self.board_width)/2 + 
-						self.board_width/self.board_grids_power * i + p,
-						(C_WINDOW_HEIGHT - self.board_width)/2 + 
-						self.board_width/self.board_grids_power * (j + 1) - p,
-						fill=C_COLOR_BLUE_DARK, width=4,
-						tags="board_content")
-		
+	def is_waiting(self):
+		"""Returns True while the human has to wait for the computer."""
+		return False
 
-	def __on_return_clicked__(self):
-		"""(Private) Switches back to the welcome scene when the return 
-		button is clicked."""
-		# Clear screen
-		self.__clear_screen()
-		
-		# Set the client to None so the client thread will stop due to error
-		#self.client.client_socket = None;
-		#self.client = None
-		# Switch to the welcome scene
-		self.pack_forget()
-		self.welcome_scene.pack()
-	def Human(self,i):
-		if(self.board_string[i]=='0'):
-			if(self.player_turn == 1):
-				str =self.board_string[:i]+'1'+self.board_string[i+1:]
-				self.board_string = str
+	def new_game(self):
+		"""Clears the board and starts a new game, the human goes first 
+		half of the time."""
+		self.board_view.reset()
+
+		# Delete the button from the scene
+		if self.restart_btn is not None:
+			self.restart_btn.delete()
+		self.restart_btn = None
+		self.player_turn = 1
+		self.board_state = self.board_view.empty_board()
+		self.moves = []
+		self.human_side = 1
+		if(not random.getrandbits(1)):
+			self.human_side = -1
+			self.computer_move()
+
+	def play_move(self, move):
+		"""Plays move for the side whose turn it is, returns True if the 
+		game carries on."""
+		self.board_state = apply_move(self.board_state, move, self.player_turn)
+		self.moves.append(move[0] * self.board_grids_power + move[1])
+		self.board_view.update(self.board_state)
+		self.player_turn = -self.player_turn
+		if(self.checkWinner() == 0 and not self.checkDraw()):
+			return True
+		self.record_game()
+		return False
 
-			elif(self.player_turn == -1):
-				str =self.board_string[:i]+'2'+self.board_string[i+1:]
-				self.board_string = str
+	def record_game(self):
+		"""Adds the finished game to the game log, if there is one."""
+		if self.game_recorder is None:
+			return
+		if self.human_side == 1:
+			players = ("human", self.COMPUTER_NAME)
+		else:
+			players = (self.COMPUTER_NAME, "human")
+		self.game_recorder.write_game(self.moves, 
+			has_winner(self.board_state)[0], *players)
+		# Keep every game even if the GUI is closed without returning
+		self.game_recorder.flush()
+
+	def Human(self, i):
+		"""Plays the human's move in square i, then the computer's."""
+		if(self.is_waiting()):
+			# Wait for the computer to move
+			return
+		move = divmod(i, self.board_grids_power)
+		if(self.board_state[move[0]][move[1]] != 0):
+			return
+		if(self.play_move(move)):
+			self.computer_move()
 
-			else:
-				raise EnvironmentError
-			self.board_state = self.Str_to_State(self.board_string)
-			self.update_board_content(self.board_string)
-			self.player_turn = -self.player_turn
-			if(self.checkWinner()==0):
-				self.checkDraw()		
-				self.Random()
-				self.checkWinner()
-				self.checkDraw()	
-			
 	def checkWinner(self):
 		winner,str1 = has_winner(self.board_state)
 		if (winner != 0):
-			for i in range(9):
-				self.squares[i].disable()
+			self.board_view.disable()
 			self.draw_winning_path(str1)
 			self.show_restart()
-
 			return 1
 		return 0
+
 	def checkDraw(self):
 		if (not len(list(available_moves(self.board_state)))):
 			self.show_restart()
-	def __on_squares_0_clicked__(self):
-		self.Human(0)
-
-	def __on_squares_1_clicked__(self):
-		self.Human(1)
-
-	def __on_squares_2_clicked__(self):
-		self.Human(2)
-
-	def __on_squares_3_clicked__(self):
-		self.Human(3)
-
-	def __on_squares_4_clicked__(self):
-		self.Human(4)
-
-	def __on_squares_5_clicked__(self):
-		self.Human(5)  
-
-	def __on_squares_6_clicked__(self):
-		self.Human(6)
-
-	def __on_squares_7_clicked__(self):
-		self.Human(7)
-
-	def __on_squares_8_clicked__(self):
-		self.Human(8)
-
-	
+			return 1
+		return 0
 
 	def draw_winning_path(self, winning_path):
 		"""Marks on the board the path that leads to the win result."""
-		# Loop through the board
-		for i in range(0, self.board_grids_power ** 2):
-			if str(i) in winning_path: 
-				# If the current item is in the winning path
-				self.squares[i].set_temp_color("#db2631")
-
+		self.board_view.highlight([int(i) for i in winning_path], "#db2631")
 
 	def show_restart(self):
 		"""Creates a restart button for the user to choose to restart a 
@@ -965,35 +909,89 @@ class MainGameSceneRandom(BaseScene):
 			C_COLOR_BLUE_DARK)
 		self.restart_btn.command = self.__on_restart_clicked__
 
-	def __clear_screen(self):
-		"""(Private) Clears all the existing content from the old game."""
-		# Clear everything from the past game
-		for i in range(0, self.board_grids_power ** 2):
-			self.squares[i].enable()
-			self.squares[i].set_temp_color(C_COLOR_BLUE)
-		self.update_board_content(" " * self.board_grids_power ** 2)
-		self.itemconfig("player_self_text", text="")
-		self.itemconfig("player_match_text", text="")
-		# Delete the button from the scene
-		if self.restart_btn is not None:
-			self.restart_btn.delete()
-			self.restart_btn = None
-		self.player_turn = 1
-		self.board_string = "000000000"
-		self.board_state = ((0, 0, 0),
-							(0, 0, 0),
-							(0, 0, 0))
-		self.isHumanFirst = False
-		if bool(random.getrandbits(1)):
-			self.isHumanFirst = True
-
-		self.Random()
-
-	def __on_restart_clicked__(self):
+	def __on_return_clicked__(self):
 		"""(Private) Switches back to the welcome scene when the return 
 		button is clicked."""
 		# Clear screen
-		self.__clear_screen()
+		self.new_game()
+		# Switch to the welcome scene
+		self.pack_forget()
+		self.welcome_scene.pack()
+
+	def __on_restart_clicked__(self):
+		"""(Private) Starts a new game when the restart button is clicked."""
+		self.new_game()
+
+class MainGameSceneAI(MainGameScene):
+	"""MainGameSceneAI plays against the AI's network."""
+
+	COMPUTER_NAME = "network"
+
+	def __init__(self, parent, engine_loader):
+		"""Initializes the main game scene object, engine_loader is the
+		EngineLoader for the AI's network."""
+		super().__init__(parent)
+
+		# The network is loaded once by engine_loader, every AI move reuses it
+		self.game_spec = TicTacToeGameSpec()
+		self.engine_loader = engine_loader
+		self.engine = AsyncEngine(self, self.get_ai_move)
+
+	def new_game(self):
+		"""(Override) Throws away any move the AI is still working out for 
+		the old game."""
+		self.engine.cancel()
+		super().new_game()
+
+	def is_waiting(self):
+		"""(Override) The human waits while the AI is thinking."""
+		return self.engine.is_thinking()
+
+	def computer_move(self):
+		"""Asks the engine for the AI's move, it is played by __on_ai_move__
+		once it is ready."""
+		self.engine.request_move(self.board_state, self.player_turn, 
+			self.__on_ai_move__, self.__on_ai_error__)
+
+	def get_ai_move(self, board_state, side):
+		"""Chooses the AI's move. This runs on the engine's thread, so it
+		must not touch the canvas."""
+		policy_network = self.engine_loader.wait()
+		if(self.engine_loader.server_player is not None):
+			# The server only ever plays legal moves
+			return self.engine_loader.server_player(board_state, side)
+		move = self.game_spec.flat_move_to_tuple(
+			policy_network.get_stochastic_network_move(
+				board_state, side).argmax())
+		#print(move)
+		if(move not in available_moves(board_state)):
+			# The network chose a square that is taken, play perfectly instead
+			from techniques.perfect_play import table_player
+			move = table_player(board_state, side)
+		return move
+
+	def __on_ai_move__(self, move):
+		"""(Private) Plays the AI's move once the engine has chosen it."""
+		if(self.play_move(move) and C_AI_PONDER):
+			# Think about the replies while the human chooses their move
+			self.engine.ponder(self.board_state, -self.player_turn)
+
+	def __on_ai_error__(self, error):
+		"""(Private) Ends the game if the AI couldn't choose a move, so the 
+		human isn't left waiting for it."""
+		tkinter.messagebox.showerror("Error", 
+			"The AI couldn't choose a move.\n" + str(error))
+		self.board_view.disable()
+		self.show_restart()
+
+class MainGameSceneRandom(MainGameScene):
+	"""MainGameSceneRandom plays against random moves."""
+
+	COMPUTER_NAME = "random"
+
+	def computer_move(self):
+		"""Plays a random move straight away."""
+		self.play_move(random.choice(list(available_moves(self.board_state))))
 
 
 class FullScreenApp(object):
@@ -1043,21 +1041,38 @@ def main():
 		# tkinter.messagebox.showerror("Error", "Can't set the window icon.");
 		print("Can't set the window icon.")
 
+	# The AI's network is loaded in the background
+	engine_loader = EngineLoader()
+
 	# Initialize the welcome scene
 	welcome_scene = WelcomeScene(root)
 	# Initialize the about scene
 	main_game_scene_random = MainGameSceneRandom(root)
 	# Initialize the main game scene
-	main_game_scene_ai = MainGameSceneAI(root)
+	main_game_scene_ai = MainGameSceneAI(root, engine_loader)
+
+	# Both scenes add their games to the same log
+	game_recorder = None
+	if C_GAME_RECORD_PATH:
+		try:
+			game_recorder = GameRecordWriter(C_GAME_RECORD_PATH, 
+				TicTacToeGameSpec())
+		except (OSError, ValueError) as ex:
+			print("Can't open the game log, games won't be kept. " + str(ex))
+	main_game_scene_random.game_recorder = game_recorder
+	main_game_scene_ai.game_recorder = game_recorder
 
 	# Give a reference for switching between scenes
 	welcome_scene.main_game_scene_random = main_game_scene_random
 	welcome_scene.main_game_scene_ai = main_game_scene_ai 
+	welcome_scene.engine_loader = engine_loader
 	main_game_scene_random.welcome_scene = welcome_scene
 	main_game_scene_ai.welcome_scene = welcome_scene
 
 	# Start showing the welcome scene
 	welcome_scene.pack()
+	# Start loading the AI once the welcome scene has been drawn
+	root.after_idle(engine_loader.start)
 	    
 	# Main loop
 	root.mainloop()
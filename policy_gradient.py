@@ -17,6 +17,8 @@ force a draw.
 """
 import functools
 
+from common.game_record import GameRecordWriter
+from common.instrumentation import Instrumentation
 from common.network_helpers import create_network
 from games.tic_tac_toe_for_train import TicTacToeGameSpec
 from techniques.train_policy_gradient import train_policy_gradients
@@ -26,15 +28,28 @@ LEARN_RATE = 1e-4
 PRINT_RESULTS_EVERY_X = 1000  # every how many games to print the results
 NETWORK_FILE_PATH ='current_network1.p'  # path to save the network to
 NUMBER_OF_GAMES_TO_RUN = 10000000
+STATS_FILE_PATH = None  # e.g. 'training_stats.jsonl' to record games/sec and how long each stage of training takes
+GAMES_FILE_PATH = None  # e.g. 'games.log' to keep every game played, see common.game_record
 
-# to play a different game change this to another spec, e.g TicTacToeXGameSpec or ConnectXGameSpec, to get these to run
-# well may require tuning the hyper parameters a bit
+# to play a different game change this to another spec, e.g TicTacToeXGameSpec or ConnectFourGameSpec, to get these to
+# run well may require tuning the hyper parameters a bit
 game_spec = TicTacToeGameSpec()
 
-create_network_func = functools.partial(create_network, game_spec.board_squares(), (100, 100, 100))
+create_network_func = functools.partial(create_network, game_spec.board_squares(), (100, 100, 100),
+                                        output_nodes=game_spec.outputs())
+
+instrumentation = Instrumentation(STATS_FILE_PATH, log=True) if STATS_FILE_PATH else None
+game_recorder = GameRecordWriter(GAMES_FILE_PATH, game_spec) if GAMES_FILE_PATH else None
 
 train_policy_gradients(game_spec, create_network_func, NETWORK_FILE_PATH,
                        number_of_games=NUMBER_OF_GAMES_TO_RUN,
                        batch_size=BATCH_SIZE,
                        learn_rate=LEARN_RATE,
-                       print_results_every=PRINT_RESULTS_EVERY_X)
+                       print_results_every=PRINT_RESULTS_EVERY_X,
+                       instrumentation=instrumentation,
+                       game_recorder=game_recorder)
+
+if instrumentation is not None:
+    instrumentation.close()
+if game_recorder is not None:
+    game_recorder.close()
@@ -20,10 +20,14 @@ from techniques.train_policy_gradient_historic import train_policy_gradients_vs_
 
 HIDDEN_NODES = (100, 100, 100)
 SAVE_HISTORICAL_NETWORK_EVERY = 10000
+NUMBER_OF_WORKERS = 0  # set to the number of cores to play the games in worker processes
 game_spec = TicTacToeGameSpec()
 
 create_network_func = functools.partial(create_network, game_spec.board_squares(), HIDDEN_NODES)
 
-train_policy_gradients_vs_historic(game_spec, create_network_func,
-                                   'current_network.p',
-                                   save_historic_every=SAVE_HISTORICAL_NETWORK_EVERY)
+# the worker processes import this file, so only start training when it is run directly
+if __name__ == '__main__':
+    train_policy_gradients_vs_historic(game_spec, create_network_func,
+                                       'current_network.p',
+                                       save_historic_every=SAVE_HISTORICAL_NETWORK_EVERY,
+                                       number_of_workers=NUMBER_OF_WORKERS)
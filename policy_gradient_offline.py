@@ -0,0 +1,41 @@
+"""
+This is the same as the policy_gradient.py network except that instead of learning from the games it plays as it
+trains, it learns from games that were logged earlier. Set GAMES_FILE_PATH in policy_gradient.py to log the games it
+plays, a log per run makes a set of shards that can all be trained on here.
+
+Only the moves of the network are learnt from by default, with the same rewards as policy_gradient.py gave them when
+the games were played. Set TRAIN_ON_PLAYERS to None to also learn from the moves of the opponent.
+"""
+import functools
+
+from common.instrumentation import Instrumentation
+from common.network_helpers import create_network
+from games.tic_tac_toe_for_train import TicTacToeGameSpec
+from techniques.train_policy_gradient_offline import train_policy_gradients_offline
+
+BATCH_SIZE = 500  # how many moves in each parameter update
+LEARN_RATE = 1e-4
+PRINT_RESULTS_EVERY_X = 10000  # every how many games to print the results
+NETWORK_FILE_PATH = 'current_network1.p'  # path to save the network to
+GAME_LOG_PATHS = 'games*.log'  # the logged games to train on, a glob matching every shard
+TRAIN_ON_PLAYERS = ('network',)  # only learn from the moves of these players, None for every player
+NUMBER_OF_EPOCHS = 1  # how many times to go through the logged games
+STATS_FILE_PATH = None  # e.g. 'training_stats.jsonl' to record how long training waits for mini batches
+
+game_spec = TicTacToeGameSpec()
+
+create_network_func = functools.partial(create_network, game_spec.board_squares(), (100, 100, 100),
+                                        output_nodes=game_spec.outputs())
+
+instrumentation = Instrumentation(STATS_FILE_PATH, log=True) if STATS_FILE_PATH else None
+
+train_policy_gradients_offline(game_spec, create_network_func, NETWORK_FILE_PATH, GAME_LOG_PATHS,
+                               players=TRAIN_ON_PLAYERS,
+                               number_of_epochs=NUMBER_OF_EPOCHS,
+                               print_results_every=PRINT_RESULTS_EVERY_X,
+                               learn_rate=LEARN_RATE,
+                               batch_size=BATCH_SIZE,
+                               instrumentation=instrumentation)
+
+if instrumentation is not None:
+    instrumentation.close()
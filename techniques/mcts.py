@@ -0,0 +1,327 @@
+"""
+Monte Carlo tree search for any BaseGameSpec.
+
+Each simulation walks down the tree picking children by UCT, expands the leaf it reaches and plays a random game from
+there to the end, the result is then added to every node on the path. Given a prior_func, e.g. the output of a network
+made by create_network, children are instead picked with the PUCT formula so moves the network likes are searched
+first.
+
+Leaves are collected in batches, with a virtual loss added along each path so the same leaf is not picked twice in a
+batch. The rollouts for a batch can then be played in a pool of worker processes, so more cores give more simulations in
+the same time. The tree below the move played is kept, so the next search starts with the work already done on the
+position the opponent chose.
+
+Examples:
+    search = MonteCarloTreeSearch(game_spec, number_of_simulations=2000, number_of_workers=4)
+    game_spec.play_game(search.move, random_player)
+    search.close()
+"""
+import math
+import multiprocessing
+import random
+import time
+
+import numpy as np
+
+
+def random_rollout(game_spec, board_state, side):
+    """Play random moves from the board_state until the game is over
+
+    Args:
+        game_spec (BaseGameSpec): The game being played
+        board_state: The board state to play from
+        side (int): The side to move
+
+    Returns:
+        int: 1 if the plus player won, -1 if the minus player won and 0 for a draw
+    """
+    try:
+        board = game_spec.new_mutable_board(board_state)
+    except NotImplementedError:
+        board = None
+
+    if board is not None:
+        # make the moves in place, so nothing is allocated per move
+        available = board.available
+        while available and board.winner == 0:
+            board.push_square(available[int(random.random() * len(available))], side)
+            side = -side
+        return board.winner
+
+    while True:
+        moves = list(game_spec.available_moves(board_state))
+        if not moves:
+            return 0
+        board_state = game_spec.apply_move(board_state, random.choice(moves), side)
+        winner = game_spec.has_winner(board_state)
+        if winner != 0:
+            return winner
+        side = -side
+
+
+def network_prior_func(game_spec, probabilities_func):
+    """Create a prior_func from a policy network, the board is given to the network from the point of view of the side
+    to move, the same way as get_stochastic_network_move.
+
+    Examples:
+        network_prior_func(game_spec, lambda boards: session.run(output_layer, feed_dict={input_layer: boards}))
+        network_prior_func(game_spec, PolicyNetwork.load('current_network.p').probabilities)
+
+    Args:
+        game_spec (BaseGameSpec): The game being played
+        probabilities_func (np.array -> np.array): Given a (number of boards, board_squares) array of boards returns a
+            (number of boards, outputs) array of move probabilities
+
+    Returns:
+        (board_state, side) -> np.array: prior_func for MonteCarloTreeSearch
+    """
+    def prior_func(board_state, side):
+        np_board_state = np.array(board_state, dtype=np.float32).reshape(1, game_spec.board_squares()) * side
+        return probabilities_func(np_board_state)[0]
+
+    return prior_func
+
+
+class _Node(object):
+    __slots__ = ('board_state', 'side', 'move', 'parent', 'children', 'moves', 'winner', 'visits', 'value_sum',
+                 'prior')
+
+    def __init__(self, game_spec, board_state, side, move, parent, prior):
+        self.board_state = board_state
+        # the side to move from this node
+        self.side = side
+        # the move that led to this node
+        self.move = move
+        self.parent = parent
+        # None until the node is expanded
+        self.children = None
+        self.moves = list(game_spec.available_moves(board_state))
+        self.winner = game_spec.has_winner(board_state)
+        self.visits = 0
+        # sum of the results for the side that made self.move
+        self.value_sum = 0.
+        self.prior = prior
+
+    def is_terminal(self):
+        return self.winner != 0 or not self.moves
+
+
+# the game spec and rollout func of a worker process, set once by _init_worker rather than sent with every rollout
+_worker_game_spec = None
+_worker_rollout_func = None
+
+
+def _init_worker(game_spec, rollout_func):
+    global _worker_game_spec, _worker_rollout_func
+    _worker_game_spec = game_spec
+    _worker_rollout_func = rollout_func
+
+
+def _worker_rollout(position):
+    board_state, side = position
+    return _worker_rollout_func(_worker_game_spec, board_state, side)
+
+
+class MonteCarloTreeSearch(object):
+    def __init__(self, game_spec, number_of_simulations=1000, time_budget_ms=None, exploration=1.4, prior_func=None,
+                 rollout_func=random_rollout, number_of_workers=0, batch_size=None, reuse_tree=True):
+        """Monte Carlo tree search player, use move as the player func in play_game
+
+        Args:
+            game_spec (BaseGameSpec): The game being played
+            number_of_simulations (int): How many simulations to run for each move, None for no limit
+            time_budget_ms (float): How long each move may take in milliseconds, None for no limit. At least one of
+                number_of_simulations and time_budget_ms must be set
+            exploration (float): The exploration constant in the UCT/PUCT formula
+            prior_func ((board_state, side) -> np.array): Optional, gives the probability of each flat move, if set
+                children are picked with PUCT, see network_prior_func
+            rollout_func ((game_spec, board_state, side) -> int): Plays the game out and returns the winner, must be a
+                module level function if number_of_workers is used so it can be sent to the workers
+            number_of_workers (int): If more than 0 the rollouts are played in a pool of this many processes
+            batch_size (int): How many leaves to collect before playing their rollouts, defaults to 1 without workers
+                and 8 per worker with them
+            reuse_tree (bool): If True the tree from the last move is kept and used if the next position is in it
+        """
+        if number_of_simulations is None and time_budget_ms is None:
+            raise ValueError("Need a number_of_simulations or a time_budget_ms, otherwise the search never stops")
+
+        self.game_spec = game_spec
+        self.number_of_simulations = number_of_simulations
+        self.time_budget_ms = time_budget_ms
+        self.exploration = exploration
+        self.prior_func = prior_func
+        self.rollout_func = rollout_func
+        self.batch_size = batch_size or max(1, number_of_workers * 8)
+        self.reuse_tree = reuse_tree
+        self.simulations = 0
+        self.seconds = 0.
+
+        self._root = None
+        self._pool = None
+        if number_of_workers > 0:
+            # spawn so the workers don't inherit a TensorFlow session from the parent
+            self._pool = multiprocessing.get_context('spawn').Pool(number_of_workers, initializer=_init_worker,
+                                                                   initargs=(game_spec, rollout_func))
+
+    def close(self):
+        """Stop the worker processes, if any"""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def move(self, board_state, side):
+        """Search the position and choose the most visited move. A player func that can be used in play_game.
+
+        Args:
+            board_state: The current state of the board
+            side (int): The side this player is playing
+
+        Returns:
+            The move we want to play on the current board
+        """
+        root = self.search(board_state, side)
+        best_child = max(root.children, key=lambda child: child.visits)
+        if self.reuse_tree:
+            self._root = best_child
+        return best_child.move
+
+    def move_visits(self, board_state, side):
+        """Search the position and get how often each move was visited, e.g. as a training target for a network
+
+        Returns:
+            {move: visits}
+        """
+        root = self.search(board_state, side)
+        return {child.move: child.visits for child in root.children}
+
+    def search(self, board_state, side):
+        """Run simulations from the position until the budget is used up
+
+        Returns:
+            _Node: The root of the search tree
+        """
+        start_time = time.perf_counter()
+        root = self._find_root(board_state, side)
+        if root.is_terminal():
+            raise ValueError("Can not search a position where the game is already over")
+        if root.children is None:
+            self._expand(root)
+
+        deadline = None if self.time_budget_ms is None else start_time + self.time_budget_ms / 1000.
+        simulations = 0
+        while True:
+            batch_size = self.batch_size
+            if self.number_of_simulations is not None:
+                batch_size = min(batch_size, self.number_of_simulations - simulations)
+            if batch_size <= 0 or (deadline is not None and time.perf_counter() > deadline):
+                break
+            self._run_batch(root, batch_size)
+            simulations += batch_size
+
+        self._root = root
+        self.simulations = simulations
+        self.seconds = time.perf_counter() - start_time
+        return root
+
+    def _find_root(self, board_state, side):
+        # the last move played was into self._root, so the position now is normally one of it's children
+        old_root = self._root
+        if self.reuse_tree and old_root is not None:
+            for node in [old_root] + (old_root.children or []):
+                if node.side == side and node.board_state == board_state:
+                    node.parent = None
+                    return node
+        return _Node(self.game_spec, board_state, side, None, None, 1.)
+
+    def _expand(self, node):
+        priors = None
+        if self.prior_func is not None:
+            probabilities = np.asarray(self.prior_func(node.board_state, node.side), dtype=np.float64)
+            priors = np.array([probabilities[self.game_spec.tuple_move_to_flat(move)] for move in node.moves])
+            total = priors.sum()
+            priors = priors / total if total > 0 else np.full(len(node.moves), 1. / len(node.moves))
+
+        moves = list(node.moves)
+        if priors is None:
+            # so unvisited children are tried in a random order
+            random.shuffle(moves)
+        node.children = [
+            _Node(self.game_spec, self.game_spec.apply_move(node.board_state, move, node.side), -node.side, move, node,
+                  1. if priors is None else priors[i])
+            for i, move in enumerate(moves)]
+
+    def _select_child(self, node):
+        log_visits = math.log(max(node.visits, 1))
+        sqrt_visits = math.sqrt(max(node.visits, 1))
+        best_child, best_score = None, None
+        for child in node.children:
+            if self.prior_func is None:
+                if child.visits == 0:
+                    return child
+                score = child.value_sum / child.visits + self.exploration * math.sqrt(log_visits / child.visits)
+            else:
+                mean = child.value_sum / child.visits if child.visits else 0.
+                score = mean + self.exploration * child.prior * sqrt_visits / (1 + child.visits)
+            if best_score is None or score > best_score:
+                best_child, best_score = child, score
+        return best_child
+
+    def _run_batch(self, root, batch_size):
+        leaves = []
+        for _ in range(batch_size):
+            node = root
+            # virtual loss, counts as a visit that lost until the result is known
+            node.visits += 1
+            node.value_sum -= 1
+            while node.children is not None and not node.is_terminal():
+                node = self._select_child(node)
+                node.visits += 1
+                node.value_sum -= 1
+            if not node.is_terminal():
+                self._expand(node)
+                node = self._select_child(node)
+                node.visits += 1
+                node.value_sum -= 1
+            leaves.append(node)
+
+        rollout_leaves = [leaf for leaf in leaves if not leaf.is_terminal()]
+        positions = [(leaf.board_state, leaf.side) for leaf in rollout_leaves]
+        if self._pool is not None and len(positions) > 1:
+            results = self._pool.map(_worker_rollout, positions)
+        else:
+            results = [self.rollout_func(self.game_spec, board_state, side) for board_state, side in positions]
+        rollout_results = dict(zip(map(id, rollout_leaves), results))
+
+        for leaf in leaves:
+            result = leaf.winner if leaf.is_terminal() else rollout_results[id(leaf)]
+            node = leaf
+            while node is not None:
+                # undo the virtual loss and add the result for the side that made the move into this node
+                node.value_sum += 1 - result * node.side
+                node = node.parent
+
+
+def mcts_player(game_spec, **kwargs):
+    """Create a player func that can be used in the play_game method, choosing moves with MonteCarloTreeSearch. The
+    arguments are the same as MonteCarloTreeSearch.
+
+    Returns:
+        (board_state, side) -> move: The player func
+    """
+    return MonteCarloTreeSearch(game_spec, **kwargs).move
+
+
+if __name__ == '__main__':
+    from games.tic_tac_toe_x import TicTacToeXGameSpec
+
+    # example of MCTS playing 5 in a row on a 9x9 board against a random player
+    example_game_spec = TicTacToeXGameSpec(9, 5)
+    with MonteCarloTreeSearch(example_game_spec, number_of_simulations=None, time_budget_ms=200) as example_search:
+        print(example_game_spec.play_game(example_search.move, example_game_spec.get_random_player_func(), log=True))
@@ -1,4 +1,6 @@
+import collections
 import sys
+import time
 
 
 def _score_line(line):
@@ -36,7 +38,161 @@ def evaluate_tic_tac_toe(board_state):
     return score
 
 
-def min_max(game_spec, board_state, side, max_depth, evaluation_func=None):
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# Each symmetry of a square board is a pair of functions (forward, inverse) on (x, y) coordinates for a board of the
+# given size, forward maps a square to where it ends up once the board has been transformed.
+_SYMMETRIES = (
+    (lambda x, y, n: (x, y), lambda x, y, n: (x, y)),
+    (lambda x, y, n: (y, n - 1 - x), lambda x, y, n: (n - 1 - y, x)),
+    (lambda x, y, n: (n - 1 - x, n - 1 - y), lambda x, y, n: (n - 1 - x, n - 1 - y)),
+    (lambda x, y, n: (n - 1 - y, x), lambda x, y, n: (y, n - 1 - x)),
+    (lambda x, y, n: (n - 1 - x, y), lambda x, y, n: (n - 1 - x, y)),
+    (lambda x, y, n: (x, n - 1 - y), lambda x, y, n: (x, n - 1 - y)),
+    (lambda x, y, n: (y, x), lambda x, y, n: (y, x)),
+    (lambda x, y, n: (n - 1 - y, n - 1 - x), lambda x, y, n: (n - 1 - y, n - 1 - x)),
+)
+
+
+class TranspositionTable(object):
+    def __init__(self, max_size=100000, use_symmetry=True):
+        """Cache of search results that can be passed to min_max and min_max_alpha_beta so positions reached by
+        different move orders are only searched once.
+
+        Positions are keyed on the side to move and the board, with use_symmetry the board is first replaced by the
+        smallest of it's 8 rotations/reflections so symmetric positions also share an entry. Symmetry is only used on
+        square 2d boards and assumes the evaluation function gives the same score for symmetric positions.
+
+        Examples:
+            table = TranspositionTable()
+            score, move = min_max_alpha_beta(game_spec, board_state, 1, 9, transposition_table=table)
+            print(table.hits, table.misses)
+
+        Args:
+            max_size (int): The most positions to keep, once full the oldest entries are dropped first
+            use_symmetry (bool): If True rotations and reflections of a board share a single entry
+        """
+        self.max_size = max_size
+        self.use_symmetry = use_symmetry
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._symmetry_indexes = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        """Remove all entries and reset the hit/miss counters"""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def _get_symmetry_indexes(self, board_size):
+        # for each symmetry the flat index of the square in the original board that ends up at each flat index
+        if board_size not in self._symmetry_indexes:
+            all_indexes = []
+            for _, inverse in _SYMMETRIES:
+                indexes = []
+                for i in range(board_size * board_size):
+                    x, y = inverse(i // board_size, i % board_size, board_size)
+                    indexes.append(x * board_size + y)
+                all_indexes.append(tuple(indexes))
+            self._symmetry_indexes[board_size] = tuple(all_indexes)
+        return self._symmetry_indexes[board_size]
+
+    def key(self, game_spec, board_state, side):
+        """Get the key used to store the board_state in this table
+
+        Args:
+            game_spec (BaseGameSpec): The specification for the game the board is from
+            board_state: The board state we want the key for
+            side (int): The side to move
+
+        Returns:
+            (key, symmetry (int)): symmetry is the index of the transformation used to get from the board_state to the
+                canonical board in the key, pass it to to_canonical_move/from_canonical_move
+        """
+        flat_board = tuple(square for row in board_state for square in row)
+        dimensions = game_spec.board_dimensions()
+        if not self.use_symmetry or len(dimensions) != 2 or dimensions[0] != dimensions[1]:
+            return (side, flat_board), None
+
+        best_board, best_symmetry = flat_board, 0
+        for symmetry, indexes in enumerate(self._get_symmetry_indexes(dimensions[0])):
+            transformed = tuple(flat_board[i] for i in indexes)
+            if transformed < best_board:
+                best_board, best_symmetry = transformed, symmetry
+        return (side, best_board), (best_symmetry, dimensions[0])
+
+    @staticmethod
+    def to_canonical_move(move, symmetry):
+        if symmetry is None or move is None:
+            return move
+        index, board_size = symmetry
+        return _SYMMETRIES[index][0](move[0], move[1], board_size)
+
+    @staticmethod
+    def from_canonical_move(move, symmetry):
+        if symmetry is None or move is None:
+            return move
+        index, board_size = symmetry
+        return _SYMMETRIES[index][1](move[0], move[1], board_size)
+
+    def lookup(self, key, depth):
+        """Get the entry for a key if it was searched to at least the given depth
+
+        Returns:
+            (score, flag, canonical_move) or None
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < depth:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1:]
+
+    def store(self, key, depth, score, flag, canonical_move):
+        if key not in self._entries and len(self._entries) >= self.max_size:
+            self._entries.popitem(last=False)
+        self._entries[key] = (depth, score, flag, canonical_move)
+
+
+class SearchTimeout(Exception):
+    """Raised inside a search when it's SearchLimits deadline has passed"""
+
+
+class SearchLimits(object):
+    def __init__(self, time_budget_ms=None):
+        """Counts the nodes visited by min_max_alpha_beta and stops the search once a time budget is used up, by
+        raising SearchTimeout from the node being searched when the deadline passes.
+
+        Args:
+            time_budget_ms (float): How long the search may take in milliseconds, if None there is no deadline
+        """
+        self.start_time = time.perf_counter()
+        self.deadline = None
+        self.nodes = 0
+        if time_budget_ms is not None:
+            self.deadline = self.start_time + time_budget_ms / 1000.
+
+    def visit(self):
+        self.nodes += 1
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+    def elapsed(self):
+        """Seconds since these limits were created"""
+        return time.perf_counter() - self.start_time
+
+
+SearchResult = collections.namedtuple('SearchResult', ['score', 'move', 'depth', 'nodes', 'seconds',
+                                                       'nodes_per_second'])
+
+
+def min_max(game_spec, board_state, side, max_depth, evaluation_func=None, transposition_table=None):
     """Runs the min_max_algorithm on a given board_sate for a given side, to a given depth in order to find the best
     move
 
@@ -48,10 +204,27 @@ def min_max(game_spec, board_state, side, max_depth, evaluation_func=None):
         side (int): either +1 or -1
         max_depth (int): how deep we want our tree to go before we use the evaluate method to determine how good the
         position is.
+        transposition_table (TranspositionTable): Optional table used to avoid searching the same position twice
 
     Returns:
         (best_score(int), best_score_move((int, int)): the move found to be best and what it's min-max score was
     """
+    if transposition_table is None:
+        return _min_max(game_spec, board_state, side, max_depth, evaluation_func, None)
+
+    key, symmetry = transposition_table.key(game_spec, board_state, side)
+    entry = transposition_table.lookup(key, max_depth)
+    if entry is not None:
+        return entry[0], transposition_table.from_canonical_move(entry[2], symmetry)
+
+    best_score, best_score_move = _min_max(game_spec, board_state, side, max_depth, evaluation_func,
+                                           transposition_table)
+    transposition_table.store(key, max_depth, best_score, EXACT,
+                              transposition_table.to_canonical_move(best_score_move, symmetry))
+    return best_score, best_score_move
+
+
+def _min_max(game_spec, board_state, side, max_depth, evaluation_func, transposition_table):
     best_score = None
     best_score_move = None
     evaluation_func = evaluation_func or game_spec.evaluate
@@ -70,7 +243,8 @@ def min_max(game_spec, board_state, side, max_depth, evaluation_func=None):
             if max_depth <= 1:
                 score = evaluation_func(new_board_state)
             else:
-                score, _ = min_max(game_spec, new_board_state, -side, max_depth - 1, evaluation_func=evaluation_func)
+                score, _ = min_max(game_spec, new_board_state, -side, max_depth - 1, evaluation_func=evaluation_func,
+                                   transposition_table=transposition_table)
             if side > 0:
                 if best_score is None or score > best_score:
                     best_score = score
@@ -83,7 +257,7 @@ def min_max(game_spec, board_state, side, max_depth, evaluation_func=None):
 
 
 def min_max_alpha_beta(game_spec, board_state, side, max_depth, evaluation_func=None, alpha=-sys.float_info.max,
-                       beta=sys.float_info.max):
+                       beta=sys.float_info.max, transposition_table=None, search_limits=None):
     """Runs the min_max_algorithm on a given board_sate for a given side, to a given depth in order to find the best
     move
 
@@ -96,16 +270,66 @@ def min_max_alpha_beta(game_spec, board_state, side, max_depth, evaluation_func=
         position is.
         alpha (float): Used when this is called recursively, normally ignore
         beta (float): Used when this is called recursively, normally ignore
+        transposition_table (TranspositionTable): Optional table used to avoid searching the same position twice, the
+            bound type is stored with each score so cut off results are only reused where they are still valid
+        search_limits (SearchLimits): Optional, counts the nodes searched and raises SearchTimeout once it's deadline
+            has passed
 
     Returns:
         (best_score(int), best_score_move((int, int)): the move found to be best and what it's min-max score was
     """
+    if transposition_table is None:
+        return _min_max_alpha_beta(game_spec, board_state, side, max_depth, evaluation_func, alpha, beta, None, None,
+                                   search_limits)
+
+    key, symmetry = transposition_table.key(game_spec, board_state, side)
+    entry = transposition_table.lookup(key, max_depth)
+    hash_move = None
+    if entry is not None:
+        score, flag, hash_move = entry
+        hash_move = transposition_table.from_canonical_move(hash_move, symmetry)
+        if flag == EXACT:
+            return score, hash_move
+        elif flag == LOWER_BOUND:
+            alpha = max(alpha, score)
+        else:
+            beta = min(beta, score)
+        if alpha >= beta:
+            return alpha if side > 0 else beta, hash_move
+
+    original_alpha, original_beta = alpha, beta
+    best_score, best_score_move = _min_max_alpha_beta(game_spec, board_state, side, max_depth, evaluation_func,
+                                                      alpha, beta, transposition_table, hash_move, search_limits)
+
+    if best_score <= original_alpha:
+        flag = UPPER_BOUND
+    elif best_score >= original_beta:
+        flag = LOWER_BOUND
+    else:
+        flag = EXACT
+    transposition_table.store(key, max_depth, best_score, flag,
+                              transposition_table.to_canonical_move(best_score_move, symmetry))
+    if best_score_move is None:
+        # nothing beat the bounds from the table, the move stored with them is still the best we know of
+        best_score_move = hash_move
+    return best_score, best_score_move
+
+
+def _min_max_alpha_beta(game_spec, board_state, side, max_depth, evaluation_func, alpha, beta, transposition_table,
+                        first_move, search_limits):
+    if search_limits is not None:
+        search_limits.visit()
     evaluation_func = evaluation_func or game_spec.evaluate
     best_score_move = None
     moves = list(game_spec.available_moves(board_state))
     if not moves:
         return 0, None
 
+    if first_move is not None and first_move in moves:
+        # searching the best move from an earlier search first gives more cut offs
+        moves.remove(first_move)
+        moves.insert(0, first_move)
+
     for move in moves:
         new_board_state = game_spec.apply_move(board_state, move, side)
         winner = game_spec.has_winner(new_board_state)
@@ -116,7 +340,7 @@ def min_max_alpha_beta(game_spec, board_state, side, max_depth, evaluation_func=
                 score = evaluation_func(new_board_state)
             else:
                 score, _ = min_max_alpha_beta(game_spec, new_board_state, -side, max_depth - 1, evaluation_func, alpha,
-                                              beta)
+                                              beta, transposition_table, search_limits)
 
         if side > 0:
             if score > alpha:
@@ -132,8 +356,179 @@ def min_max_alpha_beta(game_spec, board_state, side, max_depth, evaluation_func=
     return alpha if side > 0 else beta, best_score_move
 
 
-def min_max_player(board_state, side):
-    return min_max(board_state, side, 5)[1]
+def min_max_alpha_beta_mutable(game_spec, board, side, max_depth, evaluation_func=None, alpha=-sys.float_info.max,
+                               beta=sys.float_info.max, transposition_table=None):
+    """The same search as min_max_alpha_beta, but on a MutableBoard from game_spec.new_mutable_board. Moves are pushed
+    and popped on the one board rather than a new board being made for every node, and the transposition table, if
+    given, is keyed on the board's Zobrist hash.
+
+    Examples:
+        board = game_spec.new_mutable_board(board_state)
+        score, move = min_max_alpha_beta_mutable(game_spec, board, 1, 9, transposition_table=TranspositionTable())
+
+    Args:
+        game_spec (BaseGameSpec): The specification for the game we are evaluating
+        board (MutableBoard): The position to search, it is back in the same state when this returns
+        side (int): either +1 or -1
+        max_depth (int): how deep we want our tree to go before we use the evaluate method to determine how good the
+        position is.
+        evaluation_func (board_state -> int): Function used to evaluate the position for the plus player, it is given
+            the MutableBoard. If None then we will use the evaluation function from the game_spec
+        alpha (float): Lower bound on the score
+        beta (float): Upper bound on the score
+        transposition_table (TranspositionTable): Optional table used to avoid searching the same position twice, it
+            should not be shared with min_max_alpha_beta because the keys and stored moves are different
+
+    Returns:
+        (best_score(int), best_score_move((int, int)): the move found to be best and what it's min-max score was
+    """
+    best_score, best_square = _min_max_alpha_beta_mutable(board, side, max_depth,
+                                                          evaluation_func or game_spec.evaluate, alpha, beta,
+                                                          transposition_table)
+    return best_score, None if best_square is None else board.move_for_square(best_square)
+
+
+def _min_max_alpha_beta_mutable(board, side, max_depth, evaluation_func, alpha, beta, transposition_table):
+    hash_square = None
+    if transposition_table is not None:
+        key = (side, board.hash)
+        entry = transposition_table.lookup(key, max_depth)
+        if entry is not None:
+            score, flag, hash_square = entry
+            if flag == EXACT:
+                return score, hash_square
+            elif flag == LOWER_BOUND:
+                alpha = max(alpha, score)
+            else:
+                beta = min(beta, score)
+            if alpha >= beta:
+                return alpha if side > 0 else beta, hash_square
+        original_alpha, original_beta = alpha, beta
+
+    available = board.available
+    if not available:
+        return 0, None
+
+    best_score = None
+    best_square = None
+    # the list of available squares is in the same order after each push and pop, so it can be walked by index while
+    # moves are being made, the move from the table if there is one is searched first
+    for i in range(-1 if hash_square is not None else 0, len(available)):
+        if i < 0:
+            square = hash_square
+        else:
+            square = available[i]
+            if square == hash_square:
+                continue
+
+        board.push_square(square, side)
+        if board.winner != 0:
+            best_score, best_square = board.winner * 10000, square
+            board.pop()
+            break
+        if max_depth <= 1:
+            score = evaluation_func(board)
+        else:
+            score, _ = _min_max_alpha_beta_mutable(board, -side, max_depth - 1, evaluation_func, alpha, beta,
+                                                   transposition_table)
+        board.pop()
+
+        if side > 0:
+            if score > alpha:
+                alpha = score
+                best_square = square
+        else:
+            if score < beta:
+                beta = score
+                best_square = square
+        if alpha >= beta:
+            break
+
+    if best_score is None:
+        best_score = alpha if side > 0 else beta
+
+    if transposition_table is not None:
+        if best_score <= original_alpha:
+            flag = UPPER_BOUND
+        elif best_score >= original_beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        transposition_table.store(key, max_depth, best_score, flag, best_square)
+        if best_square is None:
+            best_square = hash_square
+    return best_score, best_square
+
+
+def iterative_deepening(game_spec, board_state, side, time_budget_ms, max_depth=None, evaluation_func=None,
+                        transposition_table=None):
+    """Search with min_max_alpha_beta to depth 1, then 2 and so on until the time budget is used up, so the time taken
+    is bounded whatever the size of the board. Each iteration searches the best move from the one before first. When
+    time runs out the unfinished iteration is thrown away and the result of the last complete one is returned, a depth 1
+    search is always completed so there is always a move.
+
+    Examples:
+        result = iterative_deepening(game_spec, board_state, 1, time_budget_ms=100)
+        print(result.move, result.depth, result.nodes_per_second)
+
+    Args:
+        game_spec (BaseGameSpec): The specification for the game we are evaluating
+        board_state: The board state we are evaluating
+        side (int): either +1 or -1
+        time_budget_ms (float): How long the search may take in milliseconds
+        max_depth (int): The deepest iteration to search, if None we keep going until every remaining move is searched
+        evaluation_func (board_state -> int): Function used to evaluate the position for the plus player, If None then
+            we will use the evaluation function from the game_spec
+        transposition_table (TranspositionTable): Optional table, shared by all the iterations
+
+    Returns:
+        SearchResult: score and move are from the deepest complete iteration, depth is how deep that was (0 if there
+            were no moves), nodes is every node visited including the unfinished iteration
+    """
+    search_limits = SearchLimits()
+    moves = list(game_spec.available_moves(board_state))
+    max_depth = min(max_depth or len(moves), len(moves))
+
+    best_score, best_score_move, depth_reached = 0, None, 0
+    for depth in range(1, max_depth + 1):
+        try:
+            score, move = _min_max_alpha_beta(game_spec, board_state, side, depth, evaluation_func,
+                                              -sys.float_info.max, sys.float_info.max, transposition_table,
+                                              best_score_move, search_limits)
+        except SearchTimeout:
+            break
+        best_score, best_score_move, depth_reached = score, move, depth
+
+        if abs(score) >= 10000:
+            # a forced win or loss, searching deeper won't change it
+            break
+        if depth == 1:
+            search_limits.deadline = search_limits.start_time + time_budget_ms / 1000.
+        if search_limits.deadline is not None and time.perf_counter() > search_limits.deadline:
+            break
+
+    seconds = search_limits.elapsed()
+    return SearchResult(best_score, best_score_move, depth_reached, search_limits.nodes, seconds,
+                        search_limits.nodes / seconds if seconds > 0 else 0.)
+
+
+def iterative_deepening_player(game_spec, time_budget_ms, max_depth=None, evaluation_func=None):
+    """Create a player func that can be used in the play_game method, choosing moves with iterative_deepening in at
+    most about time_budget_ms per move.
+
+    Args:
+        game_spec (BaseGameSpec): The game being played
+        time_budget_ms (float): How long each move may take in milliseconds
+        max_depth (int): Optional limit on how deep to search
+        evaluation_func (board_state -> int): Function used to evaluate the position for the plus player
+
+    Returns:
+        (board_state, side) -> move: The player func
+    """
+    def player_func(board_state, side):
+        return iterative_deepening(game_spec, board_state, side, time_budget_ms, max_depth, evaluation_func).move
+
+    return player_func
 
 
 def evaluate(board_state):
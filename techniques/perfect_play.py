@@ -0,0 +1,214 @@
+"""
+Precomputed perfect play for tic-tac-toe.
+
+build_table solves the whole game by searching every position reachable from the empty board and writes the result to
+a small file. Each position gets one 16 bit entry in a flat array indexed by the board read as a base 3 number, with the
+board always seen from the side to move (0 empty, 1 the side to move, 2 the opponent). Bits 0-8 of the entry are a mask
+of the best moves, bits 9-10 the result with perfect play (0 loss, 1 draw, 2 win) and bit 15 is set for every position in
+the table. The file can be memory mapped, so looking up a move is a single array read.
+
+Examples:
+    build_table(TicTacToeGameSpec(), DEFAULT_TABLE_PATH)
+    game_spec.play_game(table_player, random_player)
+"""
+import array
+import mmap
+import os
+import random
+import struct
+import sys
+
+from games.tic_tac_toe_for_train import TicTacToeGameSpec
+from techniques.min_max import min_max_alpha_beta
+
+# next to this file rather than in the current directory, so every script shares the one table
+DEFAULT_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'perfect_play_table.bin')
+
+LOSS = 0
+DRAW = 1
+WIN = 2
+
+_MAGIC = b'TTTP'
+_VERSION = 1
+# magic, version, board squares, 2 bytes padding so the entries are 2 byte aligned
+_HEADER = struct.Struct('<4sBBxx')
+_PRESENT_FLAG = 1 << 15
+_RESULT_SHIFT = 9
+_MOVES_MASK = (1 << _RESULT_SHIFT) - 1
+
+
+def board_index(board_state, side):
+    """The index of a position in the table, the board read as a base 3 number from the point of view of side.
+
+    Args:
+        board_state: The board state, a tuple of rows of ints
+        side (int): The side to move
+
+    Returns:
+        int
+    """
+    index = 0
+    for row in board_state:
+        for square in row:
+            index = index * 3 + (square * side) % 3
+    return index
+
+
+def build_table(game_spec, file_path=DEFAULT_TABLE_PATH):
+    """Solve the game by searching every position reachable from the new board and save the table to file_path.
+
+    Args:
+        game_spec (BaseGameSpec): The game to solve, it's board must have at most 9 squares
+        file_path (str): Where to write the table
+
+    Returns:
+        int: The number of positions in the table
+    """
+    board_squares = game_spec.board_squares()
+    if board_squares > _RESULT_SHIFT:
+        raise ValueError("Can only build tables for boards with at most %s squares, this board has %s"
+                         % (_RESULT_SHIFT, board_squares))
+
+    entries = array.array('H', [0]) * (3 ** board_squares)
+    scores = {}
+    _solve(game_spec, game_spec.new_board(), 1, entries, scores)
+
+    if sys.byteorder == 'big':
+        entries.byteswap()
+    # written to a temporary file first so other processes never see a half written table
+    temporary_path = '%s.%s.tmp' % (file_path, os.getpid())
+    with open(temporary_path, mode='wb') as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, board_squares))
+        entries.tofile(f)
+    os.replace(temporary_path, file_path)
+
+    return len(scores)
+
+
+def _solve(game_spec, board_state, side, entries, scores):
+    """Negamax over every position, score is positive if side can force a win, larger for quicker wins.
+
+    Returns:
+        int: The score for side with perfect play
+    """
+    index = board_index(board_state, side)
+    if index in scores:
+        return scores[index]
+
+    moves = list(game_spec.available_moves(board_state))
+    best_score = None
+    best_moves_mask = 0
+    for move in moves:
+        new_board_state = game_spec.apply_move(board_state, move, side)
+        if game_spec.has_winner(new_board_state) != 0:
+            # win sooner rather than later, the number of empty squares left is how much sooner
+            score = len(moves)
+        elif len(moves) == 1:
+            score = 0
+        else:
+            score = -_solve(game_spec, new_board_state, -side, entries, scores)
+
+        move_bit = 1 << game_spec.tuple_move_to_flat(move)
+        if best_score is None or score > best_score:
+            best_score = score
+            best_moves_mask = move_bit
+        elif score == best_score:
+            best_moves_mask |= move_bit
+
+    best_score = best_score or 0
+    result = WIN if best_score > 0 else LOSS if best_score < 0 else DRAW
+    entries[index] = _PRESENT_FLAG | (result << _RESULT_SHIFT) | best_moves_mask
+    scores[index] = best_score
+    return best_score
+
+
+class PerfectPlayTable(object):
+    def __init__(self, game_spec, file_path=DEFAULT_TABLE_PATH):
+        """Read only view of a table written by build_table, the file is memory mapped rather than read into memory.
+
+        Args:
+            game_spec (BaseGameSpec): The game the table was built for
+            file_path (str): Path to the table
+        """
+        self.game_spec = game_spec
+        with open(file_path, mode='rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, board_squares = _HEADER.unpack_from(self._mmap)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("%s is not a version %s perfect play table" % (file_path, _VERSION))
+        if board_squares != game_spec.board_squares():
+            raise ValueError("Table %s is for a board with %s squares, the game has %s"
+                             % (file_path, board_squares, game_spec.board_squares()))
+
+        payload = memoryview(self._mmap)[_HEADER.size:]
+        if sys.byteorder == 'big':
+            entries = array.array('H', payload)
+            entries.byteswap()
+            self._entries = entries
+        else:
+            self._entries = payload.cast('H')
+
+        # the list of moves for every possible mask of best moves, so lookups don't need to decode the mask
+        self._moves_for_mask = tuple(
+            tuple(game_spec.flat_move_to_tuple(i) for i in range(board_squares) if moves_mask & (1 << i))
+            for moves_mask in range(_MOVES_MASK + 1))
+
+    def lookup(self, board_state, side):
+        """Get the perfect play result and best moves for a position
+
+        Args:
+            board_state: The board state
+            side (int): The side to move
+
+        Returns:
+            (result (int), best moves (tuple of moves)) or None if the position is not in the table, result is one of LOSS, DRAW
+                or WIN for side
+        """
+        entry = self._entries[board_index(board_state, side)]
+        if not entry & _PRESENT_FLAG:
+            return None
+        return entry >> _RESULT_SHIFT & 3, self._moves_for_mask[entry & _MOVES_MASK]
+
+    def move(self, board_state, side):
+        """Choose one of the best moves for a position at random. Positions that can not be reached by playing from
+        the new board, so are not in the table, are searched instead.
+
+        Args:
+            board_state: The board state
+            side (int): The side to move
+
+        Returns:
+            The move to play
+        """
+        entry = self.lookup(board_state, side)
+        if entry is None or not entry[1]:
+            return min_max_alpha_beta(self.game_spec, board_state, side, self.game_spec.board_squares())[1]
+        return random.choice(entry[1])
+
+
+_default_table = None
+
+
+def table_player(board_state, side):
+    """A player func that can be used in the play_game method, it plays tic-tac-toe perfectly by looking the move up
+    in the table at DEFAULT_TABLE_PATH. The table is built the first time this is called if the file does not exist.
+
+    Args:
+        board_state (3x3 tuple of int): The current state of the board
+        side (int): The side this player is playing
+
+    Returns:
+        (int, int): the move we want to play on the current board
+    """
+    global _default_table
+    if _default_table is None:
+        game_spec = TicTacToeGameSpec()
+        if not os.path.isfile(DEFAULT_TABLE_PATH):
+            build_table(game_spec, DEFAULT_TABLE_PATH)
+        _default_table = PerfectPlayTable(game_spec, DEFAULT_TABLE_PATH)
+    return _default_table.move(board_state, side)
+
+
+if __name__ == '__main__':
+    print("positions solved: %s" % build_table(TicTacToeGameSpec(), DEFAULT_TABLE_PATH))
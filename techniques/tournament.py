@@ -0,0 +1,349 @@
+"""
+Round robin tournament between players, for comparing network checkpoints against each other and against the heuristic
+and search players.
+
+Every pair of players plays games_per_pairing games, half with each player going first. The games are split into chunks
+and played by a pool of worker processes, each worker builds it's own copy of every player from it's factory so nothing
+but the results has to be sent between processes. The output is a win/draw/loss matrix, an Elo rating for every player
+fitted to all the results and how many games per second were played.
+
+Players are given as factories, functions that take the game_spec and return a player func. They must be picklable to
+be sent to the workers, so use the factory functions in this module or functools.partial of a module level function.
+
+Examples:
+    results = run_tournament(TicTacToeGameSpec(), {'random': random_player_factory,
+                                                   'min_max_3': min_max_player_factory(3),
+                                                   'checkpoint': network_player_factory('current_network.p')},
+                             games_per_pairing=200, number_of_workers=4, output_path='tournament.json')
+
+    python -m techniques.tournament --player random --player simple --player minmax:3 \\
+        --player net=network:current_network.p --games 200 --workers 4
+"""
+import argparse
+import functools
+import itertools
+import json
+import multiprocessing
+import random
+import time
+
+import numpy as np
+
+WIN = 0
+DRAW = 1
+LOSS = 2
+
+DEFAULT_ELO = 1500.
+
+
+def random_player_factory(game_spec):
+    """Factory for a player choosing moves randomly"""
+    return game_spec.get_random_player_func()
+
+
+def simple_ai_player_factory(_):
+    """Factory for the simpleAI heuristic player, only for 3 by 3 tic-tac-toe"""
+    from games.test import simpleAI
+    return simpleAI
+
+
+def perfect_player_factory(_):
+    """Factory for a player looking moves up in the perfect play table, only for 3 by 3 tic-tac-toe"""
+    from techniques.perfect_play import table_player
+    return table_player
+
+
+def _min_max_player(max_depth, game_spec):
+    from techniques.min_max import min_max_alpha_beta
+
+    def player_func(board_state, side):
+        return min_max_alpha_beta(game_spec, board_state, side, max_depth)[1]
+
+    return player_func
+
+
+def _iterative_deepening_player(time_budget_ms, game_spec):
+    from techniques.min_max import iterative_deepening_player
+    return iterative_deepening_player(game_spec, time_budget_ms)
+
+
+def _mcts_player(number_of_simulations, game_spec):
+    from techniques.mcts import mcts_player
+    return mcts_player(game_spec, number_of_simulations=number_of_simulations)
+
+
+def _network_player(network_file_path, deterministic, valid_only, game_spec):
+    from common.policy_network import PolicyNetwork
+    network = PolicyNetwork.load(network_file_path)
+    if deterministic:
+        get_move = network.get_deterministic_network_move
+    else:
+        get_move = network.get_stochastic_network_move
+
+    def player_func(board_state, side):
+        move = get_move(board_state, side, valid_only=valid_only, game_spec=game_spec)
+        return game_spec.flat_move_to_tuple(move.argmax())
+
+    return player_func
+
+
+def min_max_player_factory(max_depth):
+    """Factory for a player that searches to max_depth with min_max_alpha_beta"""
+    return functools.partial(_min_max_player, max_depth)
+
+
+def iterative_deepening_player_factory(time_budget_ms):
+    """Factory for a player that uses iterative_deepening with time_budget_ms per move"""
+    return functools.partial(_iterative_deepening_player, time_budget_ms)
+
+
+def mcts_player_factory(number_of_simulations):
+    """Factory for a MonteCarloTreeSearch player with number_of_simulations per move"""
+    return functools.partial(_mcts_player, number_of_simulations)
+
+
+def network_player_factory(network_file_path, deterministic=False, valid_only=True):
+    """Factory for a player using the network saved at network_file_path, run with NumPy so the workers don't need
+    TensorFlow.
+
+    Args:
+        network_file_path (str): The saved network
+        deterministic (bool): If True play the highest scoring move, otherwise sample from the network output
+        valid_only (bool): If True only legal moves are chosen
+    """
+    return functools.partial(_network_player, network_file_path, deterministic, valid_only)
+
+
+def parse_player(spec):
+    """Get a player factory from a short description, used for the command line
+
+    Args:
+        spec (str): One of random, simple, perfect, minmax:<depth>, deepening:<ms>, mcts:<simulations>,
+            network:<path> or deterministic_network:<path>
+
+    Returns:
+        factory (game_spec -> player func)
+    """
+    kind, _, argument = spec.partition(':')
+    if kind == 'random':
+        return random_player_factory
+    elif kind == 'simple':
+        return simple_ai_player_factory
+    elif kind == 'perfect':
+        return perfect_player_factory
+    elif kind == 'minmax':
+        return min_max_player_factory(int(argument))
+    elif kind == 'deepening':
+        return iterative_deepening_player_factory(float(argument))
+    elif kind == 'mcts':
+        return mcts_player_factory(int(argument))
+    elif kind == 'network':
+        return network_player_factory(argument)
+    elif kind == 'deterministic_network':
+        return network_player_factory(argument, deterministic=True)
+    raise ValueError("Unknown player %s" % spec)
+
+
+# the game spec and players of a worker process, players are only built the first time they are needed
+_worker_game_spec = None
+_worker_factories = None
+_worker_players = {}
+
+
+def _init_worker(game_spec, factories):
+    global _worker_game_spec, _worker_factories
+    _worker_game_spec = game_spec
+    _worker_factories = factories
+    _worker_players.clear()
+
+
+def _get_worker_player(name):
+    if name not in _worker_players:
+        _worker_players[name] = _worker_factories[name](_worker_game_spec)
+    return _worker_players[name]
+
+
+def _play_chunk(chunk):
+    """Play a chunk of games between two players with player_a going first if a_goes_first
+
+    Returns:
+        (player_a, player_b, [wins, draws, losses] for player_a)
+    """
+    player_a, player_b, a_goes_first, number_of_games, seed = chunk
+    random.seed(seed)
+    np.random.seed(seed)
+    a_func, b_func = _get_worker_player(player_a), _get_worker_player(player_b)
+
+    counts = [0, 0, 0]
+    for _ in range(number_of_games):
+        if a_goes_first:
+            result = _worker_game_spec.play_game(a_func, b_func)
+        else:
+            result = -_worker_game_spec.play_game(b_func, a_func)
+        counts[WIN if result > 0 else LOSS if result < 0 else DRAW] += 1
+    return player_a, player_b, counts
+
+
+def _chunks(names, games_per_pairing, chunk_size, seed):
+    rng = random.Random(seed)
+    for player_a, player_b in itertools.combinations(names, 2):
+        for a_goes_first, games in ((True, (games_per_pairing + 1) // 2), (False, games_per_pairing // 2)):
+            while games > 0:
+                yield player_a, player_b, a_goes_first, min(chunk_size, games), rng.getrandbits(32)
+                games -= chunk_size
+
+
+def elo_ratings(names, matrix, iterations=1000):
+    """Fit Elo ratings to the results with the Bradley-Terry model, counting a draw as half a win for each player. Each
+    pairing also gets one extra virtual draw so players that won or lost every game still get a finite rating.
+
+    Args:
+        names ([str]): The players
+        matrix ({name: {name: [wins, draws, losses]}}): The results for each player against each other player
+        iterations (int): Iterations of the fitting algorithm
+
+    Returns:
+        {name: float}: The ratings, with a mean of DEFAULT_ELO
+    """
+    index = {name: i for i, name in enumerate(names)}
+    games = np.zeros((len(names), len(names)))
+    scores = np.zeros((len(names), len(names)))
+    for player_a in matrix:
+        for player_b, (wins, draws, losses) in matrix[player_a].items():
+            i, j = index[player_a], index[player_b]
+            games[i, j] = wins + draws + losses + 1.
+            scores[i, j] = wins + 0.5 * draws + 0.5
+
+    strengths = np.ones(len(names))
+    total_scores = scores.sum(axis=1)
+    for _ in range(iterations):
+        # minorization-maximization update for the Bradley-Terry model
+        denominators = (games / (strengths[:, None] + strengths[None, :])).sum(axis=1)
+        strengths = np.where(denominators > 0, total_scores / np.maximum(denominators, 1e-12), strengths)
+        strengths /= np.exp(np.mean(np.log(strengths)))
+
+    ratings = 400. * np.log10(strengths)
+    ratings += DEFAULT_ELO - ratings.mean()
+    return {name: float(ratings[index[name]]) for name in names}
+
+
+def run_tournament(game_spec, players, games_per_pairing=100, number_of_workers=None, chunk_size=None, seed=None,
+                   output_path=None, log=True):
+    """Play every player against every other player
+
+    Args:
+        game_spec (BaseGameSpec): The game to play
+        players ({name: factory}): The players, each factory takes the game_spec and returns a player func
+        games_per_pairing (int): How many games each pair of players plays, half with each going first
+        number_of_workers (int): Size of the process pool, if None one per cpu, if 0 the games are played in this
+            process
+        chunk_size (int): How many games a worker plays at a time, by default chosen to give each worker several chunks
+        seed (int): Seed for the games, so a tournament can be repeated
+        output_path (str): Optionally write the results as JSON to this path
+        log (bool): If True print the results table
+
+    Returns:
+        dict: with keys players, matrix ({name: {name: [wins, draws, losses]}}), elo, games, seconds and
+            games_per_second
+    """
+    names = list(players)
+    if len(names) < 2:
+        raise ValueError("A tournament needs at least 2 players")
+    if number_of_workers is None:
+        number_of_workers = multiprocessing.cpu_count()
+    if chunk_size is None:
+        number_of_pairings = len(names) * (len(names) - 1) // 2
+        chunk_size = max(1, games_per_pairing * number_of_pairings // (max(number_of_workers, 1) * 8))
+    if seed is None:
+        seed = random.getrandbits(32)
+
+    chunks = list(_chunks(names, games_per_pairing, chunk_size, seed))
+    matrix = {name: {other: [0, 0, 0] for other in names if other != name} for name in names}
+
+    start_time = time.perf_counter()
+    if number_of_workers > 0:
+        # spawn so the workers don't inherit a TensorFlow session from the parent
+        pool = multiprocessing.get_context('spawn').Pool(number_of_workers, initializer=_init_worker,
+                                                         initargs=(game_spec, players))
+        try:
+            chunk_results = list(pool.imap_unordered(_play_chunk, chunks))
+        finally:
+            pool.terminate()
+            pool.join()
+    else:
+        _init_worker(game_spec, players)
+        chunk_results = [_play_chunk(chunk) for chunk in chunks]
+    seconds = time.perf_counter() - start_time
+
+    for player_a, player_b, (wins, draws, losses) in chunk_results:
+        for i, count in enumerate((wins, draws, losses)):
+            matrix[player_a][player_b][i] += count
+        for i, count in enumerate((losses, draws, wins)):
+            matrix[player_b][player_a][i] += count
+
+    number_of_games = sum(chunk[3] for chunk in chunks)
+    results = {
+        'players': names,
+        'matrix': matrix,
+        'elo': elo_ratings(names, matrix),
+        'games': number_of_games,
+        'seconds': seconds,
+        'games_per_second': number_of_games / seconds if seconds > 0 else 0.,
+        'seed': seed,
+    }
+
+    if output_path:
+        with open(output_path, mode='w') as f:
+            json.dump(results, f, indent=2)
+    if log:
+        print(format_results(results))
+    return results
+
+
+def format_results(results):
+    """Format the results of run_tournament as a table of wins/draws/losses, ordered by Elo
+
+    Returns:
+        str
+    """
+    names = sorted(results['players'], key=lambda name: -results['elo'][name])
+    width = max(max(len(name) for name in names), 11)
+    lines = [' ' * (width + 8) + ''.join('%*s' % (width + 2, name) for name in names)]
+    for name in names:
+        cells = []
+        for other in names:
+            if other == name:
+                cells.append('%*s' % (width + 2, '-'))
+            else:
+                cells.append('%*s' % (width + 2, '%s/%s/%s' % tuple(results['matrix'][name][other])))
+        lines.append('%*s %6.0f ' % (width, name, results['elo'][name]) + ''.join(cells))
+    lines.append("%s games in %.1f seconds, %.1f games/sec" % (results['games'], results['seconds'],
+                                                             results['games_per_second']))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    from games.tic_tac_toe_for_train import TicTacToeGameSpec
+
+    parser = argparse.ArgumentParser(description="Round robin tournament between tic-tac-toe players")
+    parser.add_argument('--player', action='append', required=True,
+                        help="a player as [name=]spec, spec is one of random, simple, perfect, minmax:<depth>, "
+                             "deepening:<ms>, mcts:<simulations>, network:<path>, deterministic_network:<path>")
+    parser.add_argument('--games', type=int, default=100, help="games per pairing, half with each player first")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes, defaults to one per cpu")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--output', default=None, help="write the results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    players = {}
+    for player in args.player:
+        name, separator, spec = player.partition('=')
+        if not separator:
+            spec = name
+        players[name] = parse_player(spec)
+
+    run_tournament(TicTacToeGameSpec(), players, args.games, args.workers, seed=args.seed, output_path=args.output)
+
+
+if __name__ == '__main__':
+    main()
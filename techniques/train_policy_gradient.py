@@ -5,8 +5,12 @@ import random
 import numpy as np
 import tensorflow as tf
 
-from common.network_helpers import load_network, get_stochastic_network_move, save_network
-from test import simpleAI
+from common.instrumentation import NULL_INSTRUMENTATION
+from common.network_helpers import create_policy_gradient_train_step, load_network, get_stochastic_network_move, \
+    normalize_rewards, save_network
+from common.replay_buffer import ReplayBuffer
+from techniques.vectorized_self_play import VectorizedSelfPlay, batch_player_from_func
+from test import simpleAI, simpleAI_batch
 
 
 def train_policy_gradients(game_spec,
@@ -18,14 +22,17 @@ def train_policy_gradients(game_spec,
                            print_results_every=1000,
                            learn_rate=1e-4,
                            batch_size=100,
-                           randomize_first_player=True):
+                           randomize_first_player=True,
+                           vectorized=False,
+                           instrumentation=None,
+                           game_recorder=None):
     """Train a network using policy gradients
 
     Args:
         save_network_file_path (str): Optionally specifiy a path to use for saving the network, if unset then
             the network_file_path param is used.
-        opponent_func (board_state, side) -> move: Function for the opponent, if unset we use an opponent playing
-            randomly
+        opponent_func (board_state, side) -> move: Function for the opponent, if unset we use simpleAI for 3 x 3
+            tic-tac-toe and an opponent playing randomly for any other game
         randomize_first_player (bool): If True we alternate between being the first and second player
         game_spec (games.base_game_spec.BaseGameSpec): The game we are playing
         create_network (->(input_layer : tf.placeholder, output_layer : tf.placeholder, variables : [tf.Variable])):
@@ -35,21 +42,25 @@ def train_policy_gradients(game_spec,
         print_results_every (int): Prints results to std out every x games, also saves the network
         learn_rate (float):
         batch_size (int):
+        vectorized (bool): If True the batch_size games for each update are played at the same time with
+            VectorizedSelfPlay, so the network chooses the moves for all of them in a single session.run per turn
+        instrumentation (common.instrumentation.Instrumentation): If set, time each stage of training and count the
+            games, moves and updates, see common.instrumentation
+        game_recorder (common.game_record.GameRecordWriter): If set every game played is written to it, with the
+            players named network and opponent. Games played with vectorized=True are not recorded.
 
     Returns:
         (variables used in the final network : list, win rate: float)
     """
     save_network_file_path = save_network_file_path or network_file_path
-    #opponent_func = opponent_func or game_spec.get_random_player_func()
-    opponent_func = simpleAI
-    reward_placeholder = tf.placeholder("float", shape=(None,))
-    actual_move_placeholder = tf.placeholder("float", shape=(None, game_spec.outputs()))
+    # simpleAI is a much stronger opponent than random for 3 x 3 tic-tac-toe, but it can't play any other game
+    opponent_func = opponent_func or (simpleAI if game_spec.board_dimensions() == (3, 3)
+                                      else game_spec.get_random_player_func())
+    instrumentation = instrumentation or NULL_INSTRUMENTATION
 
     input_layer, output_layer, variables = create_network()
-
-    policy_gradient = tf.log(
-        tf.reduce_sum(tf.multiply(actual_move_placeholder, output_layer), reduction_indices=1)) * reward_placeholder
-    train_step = tf.train.AdamOptimizer(learn_rate).minimize(-policy_gradient)
+    reward_placeholder, actual_move_placeholder, train_step = create_policy_gradient_train_step(
+        output_layer, game_spec.outputs(), learn_rate)
 
     with tf.Session() as session:
         session.run(tf.global_variables_initializer())
@@ -58,56 +69,88 @@ def train_policy_gradients(game_spec,
             print("loading pre-existing network")
             load_network(session, variables, network_file_path)
 
-        mini_batch_board_states, mini_batch_moves, mini_batch_rewards = [], [], []
+        # a game has at most board_squares moves, so this always fits a whole mini batch
+        mini_batch = ReplayBuffer(batch_size * game_spec.board_squares(), game_spec.board_squares(),
+                                  game_spec.outputs())
         results = collections.deque(maxlen=print_results_every)
 
-        def make_training_move(board_state, side):
-            mini_batch_board_states.append(np.ravel(board_state) * side)
-            move = get_stochastic_network_move(session, input_layer, output_layer, board_state, side)
-            mini_batch_moves.append(move)
-            return game_spec.flat_move_to_tuple(move.argmax())
-
-        for episode_number in range(1, number_of_games):
-            # randomize if going first or second
-            if (not randomize_first_player) or bool(random.getrandbits(1)):
-                reward = game_spec.play_game(make_training_move, opponent_func)
-            else:
-                reward = -game_spec.play_game(opponent_func, make_training_move)
-
-            results.append(reward)
-
-            # we scale here so winning quickly is better winning slowly and loosing slowly better than loosing quick
-            last_game_length = len(mini_batch_board_states) - len(mini_batch_rewards)
-
-            reward /= float(last_game_length)
-
-            mini_batch_rewards += ([reward] * last_game_length)
+        def train_on_mini_batch(board_states, moves, rewards):
+            with instrumentation.timer('batch_assembly'):
+                normalized_rewards = normalize_rewards(rewards)
+                np_mini_batch_board_states = board_states.reshape(len(rewards),
+                                                                  *input_layer.get_shape().as_list()[1:])
+                feed_dict = {input_layer: np_mini_batch_board_states,
+                             reward_placeholder: normalized_rewards,
+                             actual_move_placeholder: moves}
 
-            if episode_number % batch_size == 0:
-                normalized_rewards = mini_batch_rewards - np.mean(mini_batch_rewards)
+            instrumentation.run_session(session, train_step, feed_dict, 'train_step', trace=True)
+            instrumentation.count('updates')
 
-                rewards_std = np.std(normalized_rewards)
-                if rewards_std != 0:
-                    normalized_rewards /= rewards_std
-                else:
-                    print("warning: got mini batch std of 0.")
-
-                np_mini_batch_board_states = np.array(mini_batch_board_states) \
-                    .reshape(len(mini_batch_rewards), *input_layer.get_shape().as_list()[1:])
-
-                session.run(train_step, feed_dict={input_layer: np_mini_batch_board_states,
-                                                   reward_placeholder: normalized_rewards,
-                                                   actual_move_placeholder: mini_batch_moves})
-
-                # clear batches
-                del mini_batch_board_states[:]
-                del mini_batch_moves[:]
-                del mini_batch_rewards[:]
-
-            if episode_number % print_results_every == 0:
-                print("episode: %s win_rate: %s" % (episode_number, _win_rate(print_results_every, results)))
-                if network_file_path:
-                    save_network(session, variables, save_network_file_path)
+        def make_training_move(board_state, side):
+            move = get_stochastic_network_move(session, input_layer, output_layer, board_state, side,
+                                               instrumentation=instrumentation).argmax()
+            mini_batch.append(np.ravel(board_state) * side, move)
+            instrumentation.count('moves')
+            return game_spec.flat_move_to_tuple(move)
+
+        if vectorized:
+            # chosen from the unwrapped opponent, so timing it doesn't swap simpleAI_batch for a slower batch player
+            if opponent_func is simpleAI:
+                opponent_batch_func = simpleAI_batch
+            else:
+                opponent_batch_func = batch_player_from_func(game_spec, opponent_func)
+            opponent_batch_func = instrumentation.wrap('opponent_move', opponent_batch_func)
+            self_play = VectorizedSelfPlay(game_spec, batch_size, opponent_batch_func,
+                                           randomize_first_player=randomize_first_player)
+
+            def policy(board_states):
+                instrumentation.count('moves', len(board_states))
+                return instrumentation.run_session(session, output_layer, {input_layer: board_states}, 'inference')
+
+            for episode_number in range(batch_size, number_of_games, batch_size):
+                with instrumentation.timer('play_games'):
+                    board_states, moves, rewards, game_results = self_play.play_games(policy)
+                results.extend(game_results)
+                train_on_mini_batch(board_states, moves.argmax(axis=1), rewards)
+                instrumentation.episode_finished(len(game_results))
+
+                if episode_number // print_results_every != (episode_number - batch_size) // print_results_every:
+                    print("episode: %s win_rate: %s" % (episode_number, _win_rate(print_results_every, results)))
+                    if network_file_path:
+                        save_network(session, variables, save_network_file_path)
+        else:
+            opponent_func = instrumentation.wrap('opponent_move', opponent_func)
+            network_first_recorder = network_second_recorder = None
+            if game_recorder is not None:
+                network_first_recorder = game_recorder.recorder('network', 'opponent')
+                network_second_recorder = game_recorder.recorder('opponent', 'network')
+
+            for episode_number in range(1, number_of_games):
+                with instrumentation.timer('play_game'):
+                    # randomize if going first or second
+                    if (not randomize_first_player) or bool(random.getrandbits(1)):
+                        reward = game_spec.play_game(make_training_move, opponent_func,
+                                                     recorder=network_first_recorder)
+                    else:
+                        reward = -game_spec.play_game(opponent_func, make_training_move,
+                                                      recorder=network_second_recorder)
+
+                results.append(reward)
+
+                # the reward is scaled by the length of the game so winning quickly is better winning slowly and loosing
+                # slowly better than loosing quick
+                mini_batch.end_episode(reward)
+
+                if episode_number % batch_size == 0:
+                    train_on_mini_batch(*mini_batch.contents())
+                    mini_batch.clear()
+
+                instrumentation.episode_finished()
+
+                if episode_number % print_results_every == 0:
+                    print("episode: %s win_rate: %s" % (episode_number, _win_rate(print_results_every, results)))
+                    if network_file_path:
+                        save_network(session, variables, save_network_file_path)
 
         if network_file_path:
             save_network(session, variables, save_network_file_path)
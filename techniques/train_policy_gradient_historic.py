@@ -1,12 +1,23 @@
 import collections
 import functools
+import multiprocessing
 import os
+import queue
 import random
+import traceback
 
 import numpy as np
 import tensorflow as tf
 
-from common.network_helpers import get_stochastic_network_move, load_network, save_network
+from common.instrumentation import NULL_INSTRUMENTATION
+from common.network_helpers import get_stochastic_network_move, load_network, normalize_rewards, save_network, \
+    set_network_weights
+from common.replay_buffer import ReplayBuffer
+
+# how long the learner waits for games before checking the workers are still running
+WORKER_POLL_SECONDS = 1.
+# most messages of games waiting on the queue for each worker, before the workers wait for the learner
+QUEUED_MESSAGES_PER_WORKER = 2
 
 
 def train_policy_gradients_vs_historic(game_spec, create_network, network_file_path,
@@ -17,7 +28,12 @@ def train_policy_gradients_vs_historic(game_spec, create_network, network_file_p
                                        number_of_games=1000000,
                                        print_results_every=1000,
                                        learn_rate=1e-4,
-                                       batch_size=100):
+                                       batch_size=100,
+                                       number_of_workers=0,
+                                       broadcast_weights_every=1,
+                                       games_per_message=10,
+                                       instrumentation=None,
+                                       game_recorder=None):
     """Train a network against itself and over time store new version of itself to play against.
 
     Args:
@@ -36,27 +52,36 @@ def train_policy_gradients_vs_historic(game_spec, create_network, network_file_p
         print_results_every (int): Prints results to std out every x games, also saves the network
         learn_rate (float):
         batch_size (int):
+        number_of_workers (int): If more than 0 the games are played by this many worker processes, each with it's own
+            copy of the networks, while this process only does the training.
+        broadcast_weights_every (int): When using workers, send them the latest weights every x parameter updates
+        games_per_message (int): When using workers, how many games each worker plays before sending them back
+        instrumentation (common.instrumentation.Instrumentation): If set, time each stage of training and count the
+            games, moves and updates, see common.instrumentation. With workers only the learner is measured.
+        game_recorder (common.game_record.GameRecordWriter): If set every game played is written to it, with the
+            players named network and historic_<slot>. With workers the moves are sent back with the games and written
+            by this process.
 
     Returns:
         [tf.Vaiables] : trained variables used in the final network
     """
-    input_layer, output_layer, variables = create_network()
-
-    reward_placeholder = tf.placeholder("float", shape=(None,))
-    actual_move_placeholder = tf.placeholder("float", shape=(None, game_spec.board_squares()))
-    policy_gradient = tf.reduce_sum(tf.reshape(reward_placeholder, (-1, 1)) * actual_move_placeholder * output_layer)
-    train_step = tf.train.RMSPropOptimizer(learn_rate).minimize(-policy_gradient)
-
-    current_historical_index = 0
-    historical_networks = []
-
-    mini_batch_board_states, mini_batch_moves, mini_batch_rewards = [], [], []
+    instrumentation = instrumentation or NULL_INSTRUMENTATION
+    if number_of_workers > 0:
+        return _train_vs_historic_with_workers(game_spec, create_network, network_file_path, save_network_file_path,
+                                               number_of_historic_networks, save_historic_every,
+                                               historic_network_base_path, number_of_games, print_results_every,
+                                               learn_rate, batch_size, number_of_workers, broadcast_weights_every,
+                                               games_per_message, instrumentation, game_recorder)
+
+    learner = _HistoricLearner(game_spec, create_network, network_file_path, save_network_file_path,
+                               number_of_historic_networks, historic_network_base_path, learn_rate, instrumentation)
+    input_layer, output_layer = learner.input_layer, learner.output_layer
+    historical_networks = learner.historical_networks
+
+    # a game has at most board_squares moves, so this always fits a whole mini batch
+    mini_batch = ReplayBuffer(batch_size * game_spec.board_squares(), game_spec.board_squares(), game_spec.outputs())
     results = collections.deque(maxlen=print_results_every)
 
-    for _ in range(number_of_historic_networks):
-        historical_input_layer, historical_output_layer, historical_variables = create_network()
-        historical_networks.append((historical_input_layer, historical_output_layer, historical_variables))
-
     with tf.Session() as session:
         session.run(tf.global_variables_initializer())
 
@@ -66,83 +91,361 @@ def train_policy_gradients_vs_historic(game_spec, create_network, network_file_p
                                                valid_only=True, game_spec=game_spec)
             return game_spec.flat_move_to_tuple(move.argmax())
 
+        make_move_historical = instrumentation.wrap('opponent_move', make_move_historical)
+
         def make_training_move(board_state, side):
-            mini_batch_board_states.append(np.ravel(board_state) * side)
             move = get_stochastic_network_move(session, input_layer, output_layer, board_state, side,
-                                               valid_only=True, game_spec=game_spec)
-            mini_batch_moves.append(move)
-            return game_spec.flat_move_to_tuple(move.argmax())
-
-        if os.path.isfile(network_file_path):
-            print("loading pre existing weights")
-            load_network(session, variables, network_file_path)
-        else:
-            print("could not find previous weights so initialising randomly")
+                                               valid_only=True, game_spec=game_spec,
+                                               instrumentation=instrumentation).argmax()
+            mini_batch.append(np.ravel(board_state) * side, move)
+            instrumentation.count('moves')
+            return game_spec.flat_move_to_tuple(move)
 
-        for i in range(number_of_historic_networks):
-            if os.path.isfile(historic_network_base_path):
-                load_network(session, historical_networks[i][2], historic_network_base_path)
-            elif os.path.isfile(network_file_path):
-                # if we can't load a historical file use the current network weights
-                load_network(session, historical_networks[i][2], network_file_path)
+        learner.load_networks(session)
 
         for episode_number in range(1, number_of_games):
             opponent_index = random.randint(0, number_of_historic_networks - 1)
             make_move_historical_for_index = functools.partial(make_move_historical, opponent_index)
 
-            # randomize if going first or second
-            if bool(random.getrandbits(1)):
-                reward = game_spec.play_game(make_training_move, make_move_historical_for_index)
-            else:
-                reward = -game_spec.play_game(make_move_historical_for_index, make_training_move)
+            with instrumentation.timer('play_game'):
+                # randomize if going first or second
+                if bool(random.getrandbits(1)):
+                    recorder = None
+                    if game_recorder is not None:
+                        recorder = game_recorder.recorder('network', 'historic_%s' % opponent_index)
+                    reward = game_spec.play_game(make_training_move, make_move_historical_for_index,
+                                                 recorder=recorder)
+                else:
+                    recorder = None
+                    if game_recorder is not None:
+                        recorder = game_recorder.recorder('historic_%s' % opponent_index, 'network')
+                    reward = -game_spec.play_game(make_move_historical_for_index, make_training_move,
+                                                  recorder=recorder)
 
             results.append(reward)
 
-            # we scale here so winning quickly is better winning slowly and loosing slowly better than loosing quick
-            last_game_length = len(mini_batch_board_states) - len(mini_batch_rewards)
-
-            reward /= float(last_game_length)
-
-            mini_batch_rewards += ([reward] * last_game_length)
+            # the reward is scaled by the length of the game so winning quickly is better winning slowly and loosing
+            # slowly better than loosing quick
+            mini_batch.end_episode(reward)
 
             episode_number += 1
 
             if episode_number % batch_size == 0:
-                normalized_rewards = mini_batch_rewards - np.mean(mini_batch_rewards)
-                rewards_std = np.std(normalized_rewards)
-                if rewards_std != 0:
-                    normalized_rewards /= rewards_std
-                else:
-                    print("warning: got mini batch std of 0.")
+                learner.train_on_mini_batch(session, *mini_batch.contents())
+                mini_batch.clear()
 
-                np_mini_batch_board_states = np.array(mini_batch_board_states) \
-                                    .reshape(len(mini_batch_rewards), *input_layer.get_shape().as_list()[1:])
-
-                session.run(train_step, feed_dict={input_layer: np_mini_batch_board_states,
-                                                   reward_placeholder: normalized_rewards,
-                                                   actual_move_placeholder: mini_batch_moves})
-
-                # clear batches
-                del mini_batch_board_states[:]
-                del mini_batch_moves[:]
-                del mini_batch_rewards[:]
+            instrumentation.episode_finished()
 
             if episode_number % print_results_every == 0:
                 print("episode: %s average result: %s" % (episode_number, np.mean(results)))
 
             if episode_number % save_historic_every == 0:
-                print("saving historical network %s", current_historical_index)
-                save_network(session, variables, historic_network_base_path)
-                load_network(session, historical_networks[current_historical_index][2],
-                             historic_network_base_path)
+                learner.save_historic_network(session)
 
-                # also save to the main network file
-                save_network(session, variables, save_network_file_path or network_file_path)
+        # save our final weights
+        learner.save_network(session)
+
+    return learner.variables
+
+
+class _HistoricLearner(object):
+    def __init__(self, game_spec, create_network, network_file_path, save_network_file_path,
+                 number_of_historic_networks, historic_network_base_path, learn_rate, instrumentation):
+        """The network being trained by train_policy_gradients_vs_historic, with it's train_step, and the historic
+        networks it plays against. Used by both the serial and the worker learner, so they train and save the networks
+        the same way.
+        """
+        self.network_file_path = network_file_path
+        self.save_network_file_path = save_network_file_path or network_file_path
+        self.historic_network_base_path = historic_network_base_path
+        self.instrumentation = instrumentation
+
+        self.input_layer, self.output_layer, self.variables = create_network()
+
+        self.reward_placeholder = tf.placeholder("float", shape=(None,))
+        # the flat index of each move made, rather than a 1 hot encoding, so the moves can be fed straight from the
+        # buffer
+        self.actual_move_placeholder = tf.placeholder(tf.int32, shape=(None,))
+        policy_gradient = tf.reduce_sum(tf.reshape(self.reward_placeholder, (-1, 1)) *
+                                        tf.one_hot(self.actual_move_placeholder, game_spec.outputs()) *
+                                        self.output_layer)
+        self.train_step = tf.train.RMSPropOptimizer(learn_rate).minimize(-policy_gradient)
+
+        self.historical_networks = [create_network() for _ in range(number_of_historic_networks)]
+        self.current_historical_index = 0
+
+    def load_networks(self, session):
+        """Load the saved weights of the current network, and of the historic networks"""
+        if os.path.isfile(self.network_file_path):
+            print("loading pre existing weights")
+            load_network(session, self.variables, self.network_file_path)
+        else:
+            print("could not find previous weights so initialising randomly")
 
-                current_historical_index += 1
-                current_historical_index %= number_of_historic_networks
+        for historical_network in self.historical_networks:
+            if os.path.isfile(self.historic_network_base_path):
+                load_network(session, historical_network[2], self.historic_network_base_path)
+            elif os.path.isfile(self.network_file_path):
+                # if we can't load a historical file use the current network weights
+                load_network(session, historical_network[2], self.network_file_path)
+
+    def train_on_mini_batch(self, session, board_states, moves, rewards):
+        """Run train_step on a mini batch, with the rewards normalized to a mean of 0 and standard deviation of 1"""
+        with self.instrumentation.timer('batch_assembly'):
+            normalized_rewards = normalize_rewards(rewards)
+            np_mini_batch_board_states = board_states.reshape(len(rewards),
+                                                              *self.input_layer.get_shape().as_list()[1:])
+            feed_dict = {self.input_layer: np_mini_batch_board_states,
+                         self.reward_placeholder: normalized_rewards,
+                         self.actual_move_placeholder: moves}
+
+        self.instrumentation.run_session(session, self.train_step, feed_dict, 'train_step', trace=True)
+        self.instrumentation.count('updates')
+
+    def save_historic_network(self, session):
+        """Save the current network, and copy it into the next historic network slot"""
+        print("saving historical network %s", self.current_historical_index)
+        save_network(session, self.variables, self.historic_network_base_path)
+        load_network(session, self.historical_networks[self.current_historical_index][2],
+                     self.historic_network_base_path)
+
+        # also save to the main network file
+        self.save_network(session)
+
+        self.current_historical_index += 1
+        self.current_historical_index %= len(self.historical_networks)
+
+    def save_network(self, session):
+        save_network(session, self.variables, self.save_network_file_path)
+
+
+def _train_vs_historic_with_workers(game_spec, create_network, network_file_path, save_network_file_path,
+                                    number_of_historic_networks, save_historic_every, historic_network_base_path,
+                                    number_of_games, print_results_every, learn_rate, batch_size, number_of_workers,
+                                    broadcast_weights_every, games_per_message, instrumentation, game_recorder):
+    """The learner side of train_policy_gradients_vs_historic when the games are played by worker processes.
+
+    Workers are sent snapshots of the weights of the current and historic networks, play games with them and send back
+    the board states, moves and rewards for the current network, and the moves of each game if game_recorder is set.
+    This process owns the only train_step, the saved network files and the game log.
+    """
+    learner = _HistoricLearner(game_spec, create_network, network_file_path, save_network_file_path,
+                               number_of_historic_networks, historic_network_base_path, learn_rate, instrumentation)
+    results = collections.deque(maxlen=print_results_every)
+
+    # TensorFlow is not safe to fork, so the workers start from a fresh interpreter
+    context = multiprocessing.get_context('spawn')
+    trajectory_queue = context.Queue(maxsize=number_of_workers * QUEUED_MESSAGES_PER_WORKER)
+    weights_queues = [context.Queue() for _ in range(number_of_workers)]
+    workers = [context.Process(target=_actor_worker,
+                               args=(game_spec, create_network, number_of_historic_networks, weights_queues[i],
+                                     trajectory_queue, games_per_message, game_recorder is not None,
+                                     random.getrandbits(32)))
+               for i in range(number_of_workers)]
+    for worker in workers:
+        worker.start()
+
+    with tf.Session() as session:
+        session.run(tf.global_variables_initializer())
+        learner.load_networks(session)
+
+        def broadcast_weights():
+            snapshot = session.run((learner.variables, [net[2] for net in learner.historical_networks]))
+            for weights_queue in weights_queues:
+                weights_queue.put(snapshot)
+
+        broadcast_weights()
+
+        # a mini batch can go over batch_size by up to a message of games, each at most board_squares moves long
+        mini_batch = ReplayBuffer((batch_size + games_per_message) * game_spec.board_squares(),
+                                  game_spec.board_squares(), game_spec.outputs())
+        games_in_mini_batch = 0
+        updates = 0
+        episode_number = 0
+
+        try:
+            while episode_number < number_of_games:
+                # time spent waiting on the workers, if this is high the learner is starved of games
+                with instrumentation.timer('queue_wait'):
+                    board_states, moves, rewards, game_results, game_records = _get_games(trajectory_queue, workers)
+                instrumentation.count('moves', len(moves))
+                instrumentation.episode_finished(len(game_results))
+                mini_batch.extend(board_states, moves, rewards)
+                games_in_mini_batch += len(game_results)
+
+                if game_recorder is not None:
+                    for plus_player, minus_player, game_moves, result, flags in game_records:
+                        game_recorder.write_game(game_moves, result, plus_player, minus_player, flags)
+
+                for reward in game_results:
+                    results.append(reward)
+                    episode_number += 1
+
+                    if episode_number % print_results_every == 0:
+                        print("episode: %s average result: %s" % (episode_number, np.mean(results)))
+
+                    if episode_number % save_historic_every == 0:
+                        learner.save_historic_network(session)
+                        broadcast_weights()
+
+                if games_in_mini_batch >= batch_size:
+                    learner.train_on_mini_batch(session, *mini_batch.contents())
+                    mini_batch.clear()
+                    games_in_mini_batch = 0
+
+                    updates += 1
+                    if updates % broadcast_weights_every == 0:
+                        broadcast_weights()
+        finally:
+            _stop_workers(workers, weights_queues, trajectory_queue)
 
         # save our final weights
-        save_network(session, variables, save_network_file_path or network_file_path)
+        learner.save_network(session)
+
+    return learner.variables
+
+
+def _get_games(trajectory_queue, workers):
+    """Wait for the next message of games from the workers. Raises if a worker failed or exited, rather than carrying on
+    without it or waiting forever for games it will never send."""
+    while True:
+        try:
+            item = trajectory_queue.get(timeout=WORKER_POLL_SECONDS)
+        except queue.Empty:
+            item = None
+        if isinstance(item, Exception):
+            raise item
+
+        stopped_workers = [worker for worker in workers if not worker.is_alive()]
+        if stopped_workers:
+            # a worker that failed put it's error on the queue before exiting, it may be behind the games already
+            # queued, but not behind games the other workers send after them
+            for _ in range(len(workers) * QUEUED_MESSAGES_PER_WORKER):
+                try:
+                    item = trajectory_queue.get(timeout=0.1)
+                except queue.Empty:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+            raise RuntimeError("worker processes %s exited with codes %s" %
+                               ([worker.pid for worker in stopped_workers],
+                                [worker.exitcode for worker in stopped_workers]))
+
+        if item is not None:
+            return item
+
+
+def _stop_workers(workers, weights_queues, trajectory_queue):
+    for weights_queue in weights_queues:
+        weights_queue.put(None)
+
+    # workers may be blocked sending games, so keep emptying the queue until they have all seen the stop message
+    while any(worker.is_alive() for worker in workers):
+        try:
+            trajectory_queue.get(timeout=0.1)
+        except queue.Empty:
+            pass
+
+    for worker in workers:
+        worker.join()
+
+    for weights_queue in weights_queues:
+        # weights sent to a worker that stopped early are never read, so don't wait at exit to finish sending them
+        weights_queue.cancel_join_thread()
+
+
+def _actor_worker(game_spec, create_network, number_of_historic_networks, weights_queue, trajectory_queue,
+                  games_per_message, record_games, seed):
+    """Worker process for _train_vs_historic_with_workers. Plays games between the current network and a randomly
+    chosen historic network, using the latest weights sent on weights_queue, until it is sent None. If record_games is
+    True the players, moves, result and flags of each game are sent back too, for the learner to write to it's log. If
+    anything goes wrong the error is put on trajectory_queue for the learner to raise."""
+    try:
+        _play_worker_games(game_spec, create_network, number_of_historic_networks, weights_queue, trajectory_queue,
+                           games_per_message, record_games, seed)
+    except Exception:
+        # sent with the traceback as text, the exception itself may not be picklable
+        trajectory_queue.put(RuntimeError("worker process %s failed:\n%s"
+                                          % (multiprocessing.current_process().pid, traceback.format_exc())))
+
+
+def _play_worker_games(game_spec, create_network, number_of_historic_networks, weights_queue, trajectory_queue,
+                       games_per_message, record_games, seed):
+    random.seed(seed)
+    np.random.seed(seed)
+
+    input_layer, output_layer, variables = create_network()
+    historical_networks = [create_network() for _ in range(number_of_historic_networks)]
 
-    return variables
+    all_variables = variables + [variable for net in historical_networks for variable in net[2]]
+
+    mini_batch = ReplayBuffer(games_per_message * game_spec.board_squares(), game_spec.board_squares(),
+                              game_spec.outputs())
+
+    with tf.Session() as session:
+        session.run(tf.global_variables_initializer())
+
+        def make_move_historical(histoical_network_index, board_state, side):
+            net = historical_networks[histoical_network_index]
+            move = get_stochastic_network_move(session, net[0], net[1], board_state, side,
+                                               valid_only=True, game_spec=game_spec)
+            return game_spec.flat_move_to_tuple(move.argmax())
+
+        def make_training_move(board_state, side):
+            move = get_stochastic_network_move(session, input_layer, output_layer, board_state, side,
+                                               valid_only=True, game_spec=game_spec).argmax()
+            mini_batch.append(np.ravel(board_state) * side, move)
+            return game_spec.flat_move_to_tuple(move)
+
+        snapshot = weights_queue.get()
+        applied_snapshot = None
+        while snapshot is not None:
+            if snapshot is not applied_snapshot:
+                current_weights, historic_weights = snapshot
+                all_weights = current_weights + [weights for net_weights in historic_weights for weights in net_weights]
+                set_network_weights(session, all_variables, all_weights)
+                applied_snapshot = snapshot
+
+            game_results = []
+            game_records = []
+            for _ in range(games_per_message):
+                opponent_index = random.randint(0, number_of_historic_networks - 1)
+                make_move_historical_for_index = functools.partial(make_move_historical, opponent_index)
+
+                # randomize if going first or second
+                if bool(random.getrandbits(1)):
+                    recorder = None
+                    if record_games:
+                        recorder = functools.partial(_record_game, game_records, 'network',
+                                                     'historic_%s' % opponent_index)
+                    reward = game_spec.play_game(make_training_move, make_move_historical_for_index,
+                                                 recorder=recorder)
+                else:
+                    recorder = None
+                    if record_games:
+                        recorder = functools.partial(_record_game, game_records, 'historic_%s' % opponent_index,
+                                                     'network')
+                    reward = -game_spec.play_game(make_move_historical_for_index, make_training_move,
+                                                  recorder=recorder)
+
+                game_results.append(reward)
+
+                # the reward is scaled by the length of the game so winning quickly is better winning slowly and
+                # loosing slowly better than loosing quick
+                mini_batch.end_episode(reward)
+
+            # copied because the queue sends them from a background thread, after the buffer has been reused
+            trajectory_queue.put(tuple(array.copy() for array in mini_batch.contents()) + (game_results, game_records))
+            mini_batch.clear()
+
+            # only use the most recent weights we have been sent
+            try:
+                while snapshot is not None:
+                    snapshot = weights_queue.get_nowait()
+            except queue.Empty:
+                pass
+
+
+def _record_game(game_records, plus_player, minus_player, moves, result, flags):
+    """A recorder for play_game in a worker, keeps the game to send to the learner"""
+    game_records.append((plus_player, minus_player, moves, result, flags))
@@ -0,0 +1,220 @@
+"""
+Trains a network with policy gradients on games that were played earlier and logged with common.game_record, rather
+than on games played as it trains, so how fast it learns is not tied to how fast games can be played.
+
+The logs are read by a background thread that replays each game through the game spec to get back the boards, gives
+each move the same reward train_policy_gradients would (the result of the game for the side that made it, divided by
+how many moves that side made) and puts shuffled mini batches on a bounded queue. The training loop only takes mini
+batches off the queue and runs train_step, so while TensorFlow is busy with one update the next ones are being made.
+"""
+import glob
+import os
+import queue
+import random
+import threading
+
+import numpy as np
+import tensorflow as tf
+
+from common.game_record import FLAG_CUSTOM_START, read_games, replay_game
+from common.instrumentation import NULL_INSTRUMENTATION
+from common.network_helpers import create_policy_gradient_train_step, load_network, normalize_rewards, save_network
+
+# put on the queue by the producer after the last mini batch
+_END_OF_GAMES = None
+
+
+def train_policy_gradients_offline(game_spec,
+                                   create_network,
+                                   network_file_path,
+                                   game_log_paths,
+                                   save_network_file_path=None,
+                                   players=None,
+                                   number_of_epochs=1,
+                                   print_results_every=10000,
+                                   learn_rate=1e-4,
+                                   batch_size=500,
+                                   shuffle_size=50000,
+                                   prefetch_batches=8,
+                                   seed=None,
+                                   instrumentation=None):
+    """Train a network using policy gradients on logged games
+
+    Args:
+        game_spec (games.base_game_spec.BaseGameSpec): The game that was logged
+        create_network (->(input_layer : tf.placeholder, output_layer : tf.placeholder, variables : [tf.Variable])):
+            Method that creates the network we will train.
+        network_file_path (str): path to the file with weights we want to load for this network
+        game_log_paths (str or [str]): The game logs to train on, either a list of paths or a glob pattern matching
+            every shard e.g. 'games/*.log'
+        save_network_file_path (str): Optionally specifiy a path to use for saving the network, if unset then
+            the network_file_path param is used.
+        players ([str]): Only learn from the moves of the players with these names, e.g. ['network'] to learn from the
+            same moves train_policy_gradients did when it logged the games. If None learn from every move.
+        number_of_epochs (int): How many times to go through all the logs
+        print_results_every (int): Prints progress to std out every x games, also saves the network
+        learn_rate (float):
+        batch_size (int): How many moves in each parameter update
+        shuffle_size (int): Moves are shuffled this many at a time, so a mini batch has moves from many games. If less
+            than batch_size, batch_size is used
+        prefetch_batches (int): The most mini batches that are made ahead of train_step
+        seed (int): Seed for the order of the logs and the shuffling, so runs can be repeated
+        instrumentation (common.instrumentation.Instrumentation): If set, time how long training waits for mini
+            batches and each train_step, and count the games, moves and updates, see common.instrumentation
+
+    Returns:
+        [tf.Variable]: trained variables used in the final network
+    """
+    if isinstance(game_log_paths, str):
+        game_log_paths = sorted(glob.glob(game_log_paths))
+    if not game_log_paths:
+        raise ValueError("no game logs to train on")
+    instrumentation = instrumentation or NULL_INSTRUMENTATION
+
+    input_layer, output_layer, variables = create_network()
+    reward_placeholder, actual_move_placeholder, train_step = create_policy_gradient_train_step(
+        output_layer, game_spec.outputs(), learn_rate)
+
+    mini_batch_queue = queue.Queue(maxsize=prefetch_batches)
+    stop = threading.Event()
+    producer = threading.Thread(target=_produce_mini_batches,
+                                args=(game_spec, game_log_paths, players, number_of_epochs, batch_size, shuffle_size,
+                                      random.Random(seed), mini_batch_queue, stop),
+                                daemon=True)
+
+    with tf.Session() as session:
+        session.run(tf.global_variables_initializer())
+
+        if network_file_path and os.path.isfile(network_file_path):
+            print("loading pre-existing network")
+            load_network(session, variables, network_file_path)
+
+        input_shape = input_layer.get_shape().as_list()[1:]
+        games = 0
+        updates = 0
+        producer.start()
+        try:
+            while True:
+                # time spent waiting on the producer, if this is high train_step is starved of mini batches
+                with instrumentation.timer('queue_wait'):
+                    item = mini_batch_queue.get()
+                if item is _END_OF_GAMES:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                board_states, moves, normalized_rewards, games_read = item
+
+                feed_dict = {input_layer: board_states.reshape(len(moves), *input_shape),
+                             reward_placeholder: normalized_rewards,
+                             actual_move_placeholder: moves}
+                instrumentation.run_session(session, train_step, feed_dict, 'train_step', trace=True)
+                instrumentation.count('updates')
+                instrumentation.count('moves', len(moves))
+                instrumentation.episode_finished(games_read - games)
+                updates += 1
+
+                if games_read // print_results_every != games // print_results_every:
+                    print("games: %s updates: %s" % (games_read, updates))
+                    if network_file_path:
+                        save_network(session, variables, save_network_file_path or network_file_path)
+                games = games_read
+        finally:
+            stop.set()
+
+        print("trained on %s games with %s updates" % (games, updates))
+        if network_file_path:
+            save_network(session, variables, save_network_file_path or network_file_path)
+
+    return variables
+
+
+def _put(mini_batch_queue, item, stop):
+    """Put item on the queue, waiting for room unless training stops. Returns False if training stopped."""
+    while not stop.is_set():
+        try:
+            mini_batch_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _produce_mini_batches(game_spec, game_log_paths, players, number_of_epochs, batch_size, shuffle_size, rng,
+                          mini_batch_queue, stop):
+    """The producer thread, reads the logs and puts (board_states, moves, normalized rewards, games read so far) on
+    the queue for each mini batch, then _END_OF_GAMES. If anything goes wrong the exception is put on the queue
+    instead."""
+    try:
+        board_squares = game_spec.board_squares()
+        # moves are put on the queue once there are this many, at least a whole mini batch so there is one to put
+        shuffle_size = max(shuffle_size, batch_size)
+        # room for a whole game past shuffle_size, so a game never has to be split
+        capacity = shuffle_size + board_squares
+        board_states = np.zeros((capacity, board_squares), dtype=np.int8)
+        moves = np.zeros(capacity, dtype=np.uint8 if game_spec.outputs() <= 256 else np.uint16)
+        rewards = np.zeros(capacity, dtype=np.float32)
+        size = 0
+        games_read = 0
+        np_rng = np.random.RandomState(rng.getrandbits(32))
+        players = None if players is None else frozenset(players)
+
+        def put_mini_batches(size, final):
+            """Shuffle the first size moves and put them on the queue as mini batches, returns how many moves are
+            left over at the start of the arrays for the next time"""
+            order = np_rng.permutation(size)
+            number_of_mini_batches = size // batch_size if not final else -(-size // batch_size)
+            for i in range(number_of_mini_batches):
+                indexes = order[i * batch_size:(i + 1) * batch_size]
+                if not _put(mini_batch_queue, (board_states[indexes], moves[indexes].astype(np.int32),
+                                               normalize_rewards(rewards[indexes]), games_read), stop):
+                    return None
+            left_over = order[number_of_mini_batches * batch_size:]
+            board_states[:len(left_over)] = board_states[left_over]
+            moves[:len(left_over)] = moves[left_over]
+            rewards[:len(left_over)] = rewards[left_over]
+            return len(left_over)
+
+        for _ in range(number_of_epochs):
+            game_log_paths = list(game_log_paths)
+            rng.shuffle(game_log_paths)
+            for game_log_path in game_log_paths:
+                for game in read_games(game_log_path):
+                    if game.flags & FLAG_CUSTOM_START:
+                        # we don't know the position it started from, so it can't be replayed
+                        continue
+                    games_read += 1
+
+                    learn_from_plus = players is None or game.plus_player in players
+                    learn_from_minus = players is None or game.minus_player in players
+                    if not (learn_from_plus or learn_from_minus):
+                        continue
+
+                    game_start = size
+                    for board_state, side, move in replay_game(game_spec, game.moves):
+                        if learn_from_plus if side > 0 else learn_from_minus:
+                            board_states[size] = np.ravel(board_state) * side
+                            moves[size] = move
+                            rewards[size] = side
+                            size += 1
+
+                    # the reward is scaled by the length of the game so winning quickly is better winning slowly and
+                    # loosing slowly better than loosing quick
+                    game_rewards = rewards[game_start:size]
+                    plus_mask = game_rewards > 0
+                    plus_moves = int(np.count_nonzero(plus_mask))
+                    minus_moves = len(game_rewards) - plus_moves
+                    game_rewards[plus_mask] = game.result / float(plus_moves or 1)
+                    game_rewards[~plus_mask] = -game.result / float(minus_moves or 1)
+
+                    if size >= shuffle_size:
+                        size = put_mini_batches(size, final=False)
+                        if size is None:
+                            return
+                    if stop.is_set():
+                        return
+
+        if size > 0 and put_mini_batches(size, final=True) is None:
+            return
+        _put(mini_batch_queue, _END_OF_GAMES, stop)
+    except Exception as ex:
+        _put(mini_batch_queue, ex, stop)
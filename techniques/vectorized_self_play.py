@@ -0,0 +1,196 @@
+"""
+Plays many games of a k in a row game (e.g. tic-tac-toe) at the same time using NumPy arrays, so a policy network can
+choose the moves for every game still in progress with a single forward pass rather than one session.run per move.
+
+All the boards are held in one (number_of_games, board_squares) array with 1 for the first player, -1 for the second
+and 0 for an empty square, the same values as the tuple boards used by the game specs. Moves are flat square indexes.
+"""
+import numpy as np
+
+
+def winning_lines(board_dimensions, winning_length):
+    """Get every line of winning_length squares on a 2d board
+
+    Args:
+        board_dimensions ((int, int)): The number of rows and columns of the board
+        winning_length (int): How many in a row is needed to win
+
+    Returns:
+        np.array: Of shape (number of lines, winning_length), each row holds the flat indexes of the squares in a line
+    """
+    rows, columns = board_dimensions
+    lines = []
+    for x in range(rows):
+        for y in range(columns):
+            for dx, dy in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                end_x, end_y = x + dx * (winning_length - 1), y + dy * (winning_length - 1)
+                if 0 <= end_x < rows and 0 <= end_y < columns:
+                    lines.append([(x + dx * i) * columns + y + dy * i for i in range(winning_length)])
+    return np.array(lines, dtype=np.intp)
+
+
+def random_batch_player(board_states, _):
+    """Batch player func that chooses a random empty square on each board
+
+    Args:
+        board_states (np.array): Of shape (number of boards, board_squares)
+        _: the side this player is playing, not used because we are simply choosing the moves randomly
+
+    Returns:
+        np.array of int: The flat move for each board
+    """
+    return (np.random.random(board_states.shape) * (board_states == 0)).argmax(axis=1)
+
+
+def batch_player_from_func(game_spec, player_func):
+    """Wrap a normal player func, (board_state, side) -> move, so it can be used as a batch player func. The player func
+    is still called once per board, so this only makes sense for players that can't be vectorized.
+
+    Args:
+        game_spec (BaseGameSpec): The game being played
+        player_func (board_state, side) -> move: The player func to wrap
+
+    Returns:
+        (board_states (np.array), side (int)) -> np.array of int: the batch player func
+    """
+    board_dimensions = game_spec.board_dimensions()
+
+    def batch_player_func(board_states, side):
+        moves = []
+        for board in board_states.reshape((-1,) + board_dimensions).tolist():
+            board_state = tuple(tuple(row) for row in board)
+            moves.append(game_spec.tuple_move_to_flat(player_func(board_state, side)))
+        return np.array(moves, dtype=np.intp)
+
+    return batch_player_func
+
+
+def sample_moves(probabilities):
+    """Choose a move for each row of probabilities, using the row as a categorical distribution
+
+    Args:
+        probabilities (np.array): Of shape (number of boards, outputs)
+
+    Returns:
+        np.array of int: The index of the move chosen for each row
+    """
+    cumulative = np.cumsum(probabilities, axis=1)
+    # scaling by the total stops rounding errors in the network output choosing past the end of a row
+    thresholds = np.random.random(len(probabilities)) * cumulative[:, -1]
+    moves = (cumulative <= thresholds[:, None]).sum(axis=1)
+    return np.minimum(moves, probabilities.shape[1] - 1)
+
+
+class VectorizedSelfPlay(object):
+    def __init__(self, game_spec, number_of_games, opponent_batch_func=None, winning_length=3,
+                 randomize_first_player=True):
+        """Environment that plays number_of_games games in lockstep between a policy and an opponent
+
+        Examples:
+            self_play = VectorizedSelfPlay(TicTacToeGameSpec(), 100)
+            board_states, moves, rewards, results = self_play.play_games(
+                lambda board_states: session.run(output_layer, feed_dict={input_layer: board_states}))
+
+        Args:
+            game_spec (BaseGameSpec): The game being played, must be a 2d k in a row game where every square is a move
+            number_of_games (int): How many games to play in each call to play_games
+            opponent_batch_func ((board_states (np.array), side (int)) -> np.array of int): Chooses the flat moves
+                for the opponent on a batch of boards, if unset we use an opponent playing randomly
+            winning_length (int): How many in a row is needed to win
+            randomize_first_player (bool): If True the policy plays first in a random half of the games, otherwise it
+                always goes first
+        """
+        if game_spec.outputs() != game_spec.board_squares():
+            raise ValueError("VectorizedSelfPlay needs a game where the moves are the squares of the board")
+
+        self.game_spec = game_spec
+        self.number_of_games = number_of_games
+        self.opponent_batch_func = opponent_batch_func or random_batch_player
+        self.randomize_first_player = randomize_first_player
+        self.lines = winning_lines(game_spec.board_dimensions(), winning_length)
+
+    def play_games(self, policy_func):
+        """Play a game to the end on every board
+
+        Args:
+            policy_func (np.array -> np.array): Given a (number of boards, board_squares) float32 array of boards from
+                the point of view of the player to move, returns the probability of playing each move for every board
+
+        Returns:
+            (board_states (np.array), moves (np.array), rewards (np.array), results (np.array)):
+                board_states is (policy moves, board_squares) and holds the board the policy saw for every move it
+                made, moves is the 1 hot encoding of each of those moves and rewards has the result of the game for
+                that move divided by how many moves the policy made in that game, as used by train_policy_gradients.
+                results is the result of each game for the policy, 1 win, -1 loss and 0 for a draw
+        """
+        number_of_games = self.number_of_games
+        board_states = np.zeros((number_of_games, self.game_spec.board_squares()), dtype=np.int8)
+        if self.randomize_first_player:
+            policy_side = np.where(np.random.randint(2, size=number_of_games), 1, -1).astype(np.int8)
+        else:
+            policy_side = np.ones(number_of_games, dtype=np.int8)
+        results = np.zeros(number_of_games)
+        live = np.ones(number_of_games, dtype=bool)
+
+        played_games, played_board_states, played_moves = [], [], []
+        side = 1
+
+        while True:
+            # games with no moves left are draws
+            live &= (board_states == 0).any(axis=1)
+            if not live.any():
+                break
+
+            moved = []
+            policy_games = np.flatnonzero(live & (policy_side == side))
+            if len(policy_games):
+                policy_board_states = (board_states[policy_games] * side).astype(np.float32)
+                moves = sample_moves(policy_func(policy_board_states))
+                played_games.append(policy_games)
+                played_board_states.append(policy_board_states)
+                played_moves.append(moves)
+                moved.append(self._apply_moves(board_states, results, live, policy_games, moves, side, -1))
+
+            opponent_games = np.flatnonzero(live & (policy_side != side))
+            if len(opponent_games):
+                moves = np.asarray(self.opponent_batch_func(board_states[opponent_games], side))
+                moved.append(self._apply_moves(board_states, results, live, opponent_games, moves, side, 1))
+
+            moved = np.concatenate(moved)
+            won = (board_states[moved][:, self.lines] == side).all(axis=2).any(axis=1)
+            winners = moved[won]
+            results[winners] = side * policy_side[winners]
+            live[winners] = False
+
+            side = -side
+
+        if not played_games:
+            # the opponent lost every game before the policy had a turn
+            return (np.zeros((0, self.game_spec.board_squares()), dtype=np.float32),
+                    np.zeros((0, self.game_spec.outputs()), dtype=np.float32), np.zeros(0), results)
+
+        played_games = np.concatenate(played_games)
+        moves = np.concatenate(played_moves)
+        one_hot_moves = np.zeros((len(moves), self.game_spec.outputs()), dtype=np.float32)
+        one_hot_moves[np.arange(len(moves)), moves] = 1.
+
+        # we scale here so winning quickly is better winning slowly and loosing slowly better than loosing quick
+        game_lengths = np.bincount(played_games, minlength=number_of_games)
+        rewards = (results / np.maximum(game_lengths, 1))[played_games]
+
+        return np.concatenate(played_board_states), one_hot_moves, rewards, results
+
+    @staticmethod
+    def _apply_moves(board_states, results, live, games, moves, side, illegal_move_result):
+        """Play the moves on the boards of the given games, a player making an illegal move loses that game.
+
+        Returns:
+            np.array: The games where a legal move was made
+        """
+        illegal = board_states[games, moves] != 0
+        if illegal.any():
+            results[games[illegal]] = illegal_move_result
+            live[games[illegal]] = False
+            games, moves = games[~illegal], moves[~illegal]
+        board_states[games, moves] = side
+        return games